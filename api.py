@@ -1,25 +1,45 @@
+import asyncio
 import os
-from tempfile import NamedTemporaryFile
+import threading
+import time
+from contextlib import asynccontextmanager, nullcontext
+from datetime import datetime
+from typing import Annotated, Literal
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
-import uvicorn
-from sqlalchemy import Column, String, Integer
-from api_models import VideoAnalysisRequest, DownloadAndAnalyseRequest
-from api_utils import convert_to_json_data
-from db.database import Database
-from db.models import BaseModel
-from spider import download_video
-from video_analyser import analyse_video
-
-app = FastAPI()
-
-
-class VaJson(BaseModel):
-    __tablename__ = "fa_tuiguang_video_analyse"
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    json = Column(String)
-
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from loguru import logger
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from api_models import (
+    VideoAnalysisRequest,
+    DownloadAndAnalyseRequest,
+    UploadAndAnalyseQuery,
+    UploadAndAnalyseRequest,
+    BatchDownloadAndAnalyseRequest,
+    ResegmentRequest,
+    default_api_key,
+)
+from api_utils import (
+    FastJSONResponse,
+    check_admission,
+    convert_to_json_data,
+    json_line,
+)
+from jobs import ACTIVE_STATUSES, JobRegistry, QueueWorker
+from video_analyser.cancellation import JobCancelled, run_cancellable
+from video_analyser.metrics import QUEUE_DEPTH, UPLOAD_BYTES, UPLOADS, stage_timer
+from video_analyser.profiling import artifact_path, profile_job
+from video_analyser.resources import configure, get_budget, install_executor, job_slot
+from video_analyser.utils import check_ffmpeg
+from video_analyser.workspace import (
+    is_valid_job_id,
+    job_dir,
+    new_job_id,
+    remove_job_dir,
+    remove_stale_job_dirs,
+    signal_dir,
+)
 
 # db_name = "http://43.139.41.57:888/phpmyadmin_1d3f62990ac1beb6/index.php?lang=zh_cn"
 host = "localhost"
@@ -28,56 +48,728 @@ database_name = "weike"  # 这里替换为你要连接的具体数据库名称
 user_name = "root"
 password = "root"
 
-connection_string = f"mysql://{user_name}:{password}@{host}:{port}/{database_name}"
-# db = Database(connection_string)
-# db.create_tables()
+connection_string = os.getenv(
+    "DATABASE_URL",
+    f"mysql://{user_name}:{password}@{host}:{port}/{database_name}",
+)
+db = None
+db_writer = None
+search_index = None
+# 数据库初始化完成前保存的结果先暂存，初始化成功后交给后台写入
+pending_results = []
+db_initialised = False
+db_lock = threading.Lock()
+# 多节点部署时各节点从数据库任务队列领取任务，0表示本节点只接收不执行
+QUEUE_WORKERS = int(os.getenv("VA_QUEUE_WORKERS", "0"))
+job_queue = None
+queue_worker = None
+# 任务的最长执行时间（秒，包括排队和下载），超过后取消，0表示不限
+JOB_TIMEOUT = float(os.getenv("VA_JOB_TIMEOUT", "0"))
+# 同步接口检查客户端是否断开的间隔（秒）
+DISCONNECT_POLL_SECONDS = 1.0
+job_registry = JobRegistry(float(os.getenv("VA_JOB_TTL", "3600")), JOB_TIMEOUT)
 
 
-@app.post("/analyse-video")
-async def analyse_video_endpoint(request: VideoAnalysisRequest):
+def init_database():
+    """连接数据库并启动后台写入，写入初始化期间暂存的结果；失败时不保存分析结果"""
+    global db, db_writer, search_index, job_queue, pending_results, db_initialised
+    from db.database import Database
+    from db.queue import JobQueue
+    from db.search import SearchIndex
+    from db.writer import WriteBehindWriter
+
     try:
-        csv_path, transcript_path = await analyse_video(
-            video_path=request.video_path,
-            csv_path=request.csv_path,
-            transcript_path=request.transcript_path,
-            api_key=request.api_key,
-            base_url=request.base_url,
-            min_scene_duration_seconds=request.min_scene_duration_seconds,
-            max_duration_seconds=request.max_duration_seconds,
-            debug=request.debug,
+        database = Database(connection_string)
+        database.create_tables()
+        index = SearchIndex()
+        writer = WriteBehindWriter(database, on_flush=index.add_videos)
+        writer.start()
+        QUEUE_DEPTH.labels("db_write").set_function(lambda: writer.pending)
+        job_queue = JobQueue(
+            database,
+            lease_seconds=float(os.getenv("VA_QUEUE_LEASE_SECONDS", "60")),
+            max_attempts=int(os.getenv("VA_QUEUE_MAX_ATTEMPTS", "3")),
         )
-        json_result = convert_to_json_data(csv_path, transcript_path)
-        return json_result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        with db_lock:
+            dropped, pending_results = len(pending_results), []
+            db_initialised = True
+        logger.error(
+            f"数据库初始化失败，分析结果将不会保存（已丢弃{dropped}条）：{str(e)}"
+        )
+        return
+    with db_lock:
+        db, db_writer, search_index = database, writer, index
+        for video in pending_results:
+            writer.submit(video)
+        if pending_results:
+            logger.info(f"写入数据库初始化期间的分析结果：{len(pending_results)}条")
+        pending_results = []
+        db_initialised = True
+    # 补建服务停止期间或索引建立之前写入的记录
+    try:
+        index.sync(database)
+    except Exception as e:
+        logger.error(f"全文索引补建失败：{str(e)}")
 
 
-@app.post("/download-and-analyse")
-async def download_and_analyse_endpoint(request: DownloadAndAnalyseRequest):
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    load_dotenv()
+    # 按CPU预算设置各线程池大小，需在加载模型前完成
+    configure()
+    install_executor()
+    # 只在启动时检查一次FFmpeg，之后任务使用缓存结果
+    if check_ffmpeg():
+        logger.info("FFmpeg可用")
+    # 失败任务的工作目录保留供重试，超过保留时间后清理
+    removed = remove_stale_job_dirs(float(os.getenv("VA_WORKSPACE_TTL", "86400")))
+    if removed:
+        logger.info(f"清理过期任务目录：{removed}个")
+    if os.getenv("VA_WARMUP", "").lower() in ("1", "true", "yes"):
+        from video_analyser import warmup
+
+        await asyncio.to_thread(warmup)
+    # 数据库在后台初始化，不阻塞服务启动
+    db_task = asyncio.create_task(asyncio.to_thread(init_database))
+    worker_task = asyncio.create_task(start_queue_worker(db_task))
+    yield
+    await worker_task
+    if queue_worker is not None:
+        await queue_worker.stop()
+    await job_registry.shutdown()
+    await db_task
+    if db_writer is not None:
+        db_writer.stop()
+
+
+async def start_queue_worker(db_task: asyncio.Task):
+    """数据库初始化完成后启动任务队列工作器"""
+    global queue_worker
+    await db_task
+    if job_queue is None or QUEUE_WORKERS <= 0:
+        return
+    queue_worker = QueueWorker(
+        job_queue,
+        {"download_and_analyse": run_queued_download},
+        concurrency=QUEUE_WORKERS,
+        ttl_seconds=float(os.getenv("VA_WORKSPACE_TTL", "86400")),
+    )
+    queue_worker.start()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+
+def save_result(json_result: dict, url: str = None):
+    """将分析结果放入后台写入队列，数据库仍在初始化时先暂存"""
+    from db.models import Video
+    from spider import get_platform
+
+    with db_lock:
+        if db_initialised and db_writer is None:
+            logger.warning("数据库不可用，分析结果未保存")
+            return
+        video = Video.from_result(json_result, get_platform(url or ""))
+        if db_writer is not None:
+            db_writer.submit(video)
+        else:
+            pending_results.append(video)
+
+
+def job_profiler(request, job_id: str):
+    """请求开启profile时剖析整个任务，否则不做任何处理"""
+    return profile_job(job_id) if request.profile else nullcontext()
+
+
+def request_job_id(request) -> str:
+    """使用请求指定的任务ID（用于重试时从检查点继续），否则生成新ID"""
+    if request.job_id is None:
+        return new_job_id()
+    if not is_valid_job_id(request.job_id):
+        raise HTTPException(status_code=400, detail="job_id不合法")
+    return request.job_id
+
+
+def job_failed(job_id: str, e: Exception) -> HTTPException:
+    """任务失败时在响应头中返回任务ID，客户端可用它重试"""
+    logger.error(f"任务{job_id}失败，检查点已保留：{str(e)}")
+    return HTTPException(status_code=500, detail=str(e), headers={"X-Job-Id": job_id})
+
+
+async def analysis_rejected(video_path: str, max_duration_seconds) -> Exception:
+    """analyse_video返回None时的错误：时长超过限制时返回422，否则为FFmpeg不可用"""
+    from video_analyser.utils import probe_video
+
+    video_info = await asyncio.to_thread(probe_video, video_path)
+    reason = check_admission(video_info, max_duration_seconds)
+    if reason is not None:
+        return HTTPException(status_code=422, detail=reason)
+    return RuntimeError("FFmpeg不可用")
+
+
+def remaining_deadline(request, started_at: float):
+    """扣除排队和下载已用时间后的分析期限，请求未指定期限时返回None"""
+    if request.deadline_seconds is None:
+        return None
+    return max(0.0, request.deadline_seconds - (time.monotonic() - started_at))
+
+
+def job_signal_dir(request, job_id: str):
+    """请求keep_signal时返回差异信号缓存目录，否则返回None"""
+    return signal_dir(job_id) if request.keep_signal else None
+
+
+async def run_job(work, job_id: str, http_request: Request | None = None):
+    """带取消令牌执行任务：超过VA_JOB_TIMEOUT或客户端断开时停止各阶段
+
+    指定http_request时定期检查客户端是否断开，断开后不再下载、识别和描述。
+    超时返回504；客户端断开时返回499（客户端已收不到，仅用于日志）。与其他
+    失败一样在X-Job-Id响应头中返回任务ID，用于重试或查看剖析产物。
+    """
+    try:
+        return await run_cancellable(
+            work,
+            JOB_TIMEOUT or None,
+            http_request.is_disconnected if http_request is not None else None,
+            DISCONNECT_POLL_SECONDS,
+        )
+    except JobCancelled as e:
+        headers = {"X-Job-Id": job_id}
+        if e.reason == "timeout":
+            raise HTTPException(
+                status_code=504,
+                detail=f"任务超过{JOB_TIMEOUT:g}秒未完成，已取消",
+                headers=headers,
+            )
+        raise HTTPException(
+            status_code=499, detail="客户端已断开，任务已取消", headers=headers
+        )
+
+
+@app.post("/analyse-video")
+async def analyse_video_endpoint(request: VideoAnalysisRequest, http_request: Request):
+    job_id = request_job_id(request)
+    return await run_job(analyse_local_video(request, job_id), job_id, http_request)
+
+
+async def analyse_local_video(request: VideoAnalysisRequest, job_id: str):
+    from video_analyser import analyse_video
+
+    started_at = time.monotonic()
+    fidelity = {}
     try:
-        video_path, video_id = download_video(request.url)
-        temp_csv = NamedTemporaryFile(suffix=".csv", dir="temp").name
-        temp_txt = NamedTemporaryFile(suffix=".txt", dir="temp").name
-        await analyse_video(
+        async with job_slot():
+            with job_profiler(request, job_id):
+                paths = await analyse_video(
+                    video_path=request.video_path,
+                    csv_path=request.csv_path,
+                    transcript_path=request.transcript_path,
+                    api_key=request.api_key,
+                    base_url=request.base_url,
+                    min_scene_duration_seconds=request.min_scene_duration_seconds,
+                    detect_mode=request.detect_mode,
+                    max_duration_seconds=request.max_duration_seconds,
+                    debug=request.debug,
+                    signal_dir=job_signal_dir(request, job_id),
+                    job_id=job_id,
+                    deadline_seconds=remaining_deadline(request, started_at),
+                    fidelity=fidelity,
+                )
+        if paths is None:
+            raise await analysis_rejected(
+                request.video_path, request.max_duration_seconds
+            )
+        json_result = convert_to_json_data(*paths)
+        if fidelity:
+            json_result["fidelity"] = fidelity
+        if request.profile or request.keep_signal:
+            json_result["job_id"] = job_id
+        return json_result
+    except HTTPException:
+        # 请求本身不合法（如时长超过限制），重试也无法完成，不保留检查点
+        remove_job_dir(job_id)
+        raise
+    except Exception as e:
+        raise job_failed(job_id, e)
+
+
+async def analyse_in_workspace(
+    request,
+    job_id: str,
+    video_path: str,
+    video_id: str | None,
+    video_key: str | None,
+    started_at: float,
+    content_hash: str | None = None,
+) -> dict:
+    """分析任务工作目录中已下载或上传的视频，返回分析结果
+
+    request.dedup时先按内容哈希、再按视频指纹查重，命中则直接复用已有结果；
+    否则完整分析，保存结果并加入去重索引。计算指纹时保存的差异信号供分镜检测
+    复用，查重不会让视频多解码一遍。
+    """
+    from video_analyser import analyse_video
+    from video_analyser.fingerprint import (
+        compute_fingerprint,
+        find_duplicate,
+        get_fingerprint_index,
+        reuse_result,
+    )
+
+    work_dir = job_dir(job_id)
+    temp_csv = os.path.join(work_dir, "scenes.csv")
+    temp_txt = os.path.join(work_dir, "transcript.txt")
+    temp_srt = os.path.join(work_dir, "subtitle.srt")
+    fidelity = {}
+    detect_signal = job_signal_dir(request, job_id)
+    async with job_slot():
+        fingerprint = None
+        if request.dedup:
+            detect_signal = detect_signal or os.path.join(work_dir, "signal")
+            fingerprint = await asyncio.to_thread(
+                compute_fingerprint, video_path, request.detect_mode, detect_signal
+            )
+            match = await asyncio.to_thread(find_duplicate, fingerprint)
+            if match is not None:
+                return reuse_result(match, video_id)
+        paths = await analyse_video(
             video_path,
             csv_path=temp_csv,
             transcript_path=temp_txt,
             api_key=request.api_key,
             base_url=request.base_url,
             min_scene_duration_seconds=request.min_scene_duration_seconds,
+            detect_mode=request.detect_mode,
             max_duration_seconds=request.max_duration_seconds,
             debug=request.debug,
+            work_dir=work_dir,
+            signal_dir=detect_signal,
+            deadline_seconds=remaining_deadline(request, started_at),
+            fidelity=fidelity,
+        )
+    if paths is None:
+        raise await analysis_rejected(video_path, request.max_duration_seconds)
+    json_result = convert_to_json_data(temp_csv, temp_txt, video_id, temp_srt)
+    save_result(json_result, video_key)
+    # 降级的结果不进入去重索引，以免之后不限时的请求复用不完整的结果
+    if fingerprint is not None and not fidelity.get("degraded"):
+        await asyncio.to_thread(
+            get_fingerprint_index().add,
+            fingerprint,
+            json_result,
+            video_key,
+            content_hash,
         )
-        json_result = convert_to_json_data(temp_csv, temp_txt, video_id)
-        for file in [video_path, temp_csv, temp_txt]:
-            if os.path.exists(file):
-                os.remove(file)
-        json_to_insert = VaJson(json=json_result)
-        db.insert_one(json_to_insert)
+    if fidelity:
+        json_result["fidelity"] = fidelity
+    if request.profile or request.keep_signal:
+        json_result["job_id"] = job_id
+    return json_result
+
+
+async def download_and_analyse(request: DownloadAndAnalyseRequest, job_id: str):
+    """下载并分析视频，返回分析结果，失败时抛出HTTPException"""
+    from spider import download_video, get_video_info
+    from video_analyser.checkpoint import JobCheckpoint
+
+    work_dir = job_dir(job_id)
+    checkpoint = JobCheckpoint(work_dir)
+    started_at = time.monotonic()
+    cleanup = False
+    try:
+        # 重试时已下载的视频直接复用
+        download = checkpoint.load("download", {"url": request.url})
+        if download is not None and os.path.exists(download["video_path"]):
+            video_path, video_id = download["video_path"], download["video_id"]
+        else:
+            video_info = await asyncio.to_thread(get_video_info, request.url)
+            if video_info is None:
+                raise HTTPException(status_code=400, detail="不支持的链接")
+            reason = check_admission(
+                video_info, request.max_duration_seconds, request.max_size_mb
+            )
+            if reason is not None:
+                raise HTTPException(status_code=422, detail=reason)
+            video_path, video_id = None, None
+
+        with job_profiler(request, job_id):
+            if video_path is None:
+                with stage_timer("download"):
+                    video_path, video_id = await asyncio.to_thread(
+                        download_video,
+                        request.url,
+                        os.path.join(work_dir, "video.mp4"),
+                        video_info,
+                    )
+                checkpoint.save(
+                    "download",
+                    {"url": request.url},
+                    {"video_path": video_path, "video_id": video_id},
+                )
+            json_result = await analyse_in_workspace(
+                request, job_id, video_path, video_id, request.url, started_at
+            )
+        cleanup = True
         return json_result
+    except HTTPException:
+        cleanup = True
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise job_failed(job_id, e)
+    finally:
+        # 成功或请求本身不合法时删除工作目录，其他失败保留检查点供重试
+        if cleanup:
+            remove_job_dir(job_id)
+
+
+async def analyse_upload(
+    request: UploadAndAnalyseRequest, job_id: str, upload, started_at: float
+):
+    """分析已上传到任务工作目录的视频，失败时保留工作目录供同一job_id重新上传后重试"""
+    cleanup = False
+    try:
+        with job_profiler(request, job_id):
+            json_result = await analyse_in_workspace(
+                request,
+                job_id,
+                upload.path,
+                upload.sha256,
+                f"upload:{upload.sha256}",
+                started_at,
+                upload.sha256,
+            )
+        cleanup = True
+        return json_result
+    except HTTPException:
+        cleanup = True
+        raise
+    except Exception as e:
+        raise job_failed(job_id, e)
+    finally:
+        if cleanup:
+            remove_job_dir(job_id)
+
+
+@app.post("/download-and-analyse")
+async def download_and_analyse_endpoint(
+    request: DownloadAndAnalyseRequest, http_request: Request
+):
+    job_id = request_job_id(request)
+    return await run_job(download_and_analyse(request, job_id), job_id, http_request)
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: DownloadAndAnalyseRequest, response: Response):
+    """提交下载分析任务，立即返回job_id，结果通过GET /jobs/{job_id}获取"""
+    job_id = request_job_id(request)
+    job = job_registry.submit(job_id, download_and_analyse(request, job_id))
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return job
+
+
+@app.post("/upload-and-analyse")
+async def upload_and_analyse(
+    http_request: Request,
+    query: Annotated[UploadAndAnalyseQuery, Query()],
+    response: Response,
+    x_api_key: Annotated[str | None, Header()] = None,
+):
+    """上传视频并分析
+
+    请求体为multipart/form-data（file字段）或视频本身，边接收边写入任务工作目录
+    并计算sha256。内容与已分析的视频相同时直接返回结果；否则上传完成即提交
+    后台任务，返回202和job_id，结果通过GET /jobs/{job_id}获取。
+    API密钥由X-Api-Key请求头传递，未传时使用服务端默认密钥。
+    """
+    from uploads import (
+        UPLOAD_MAX_MB,
+        UploadError,
+        UploadTooLarge,
+        receive_upload,
+    )
+    from video_analyser.fingerprint import get_fingerprint_index, reuse_result
+
+    key = {"api_key": x_api_key} if x_api_key else {}
+    request = UploadAndAnalyseRequest(**query.model_dump(), **key)
+    job_id = request_job_id(request)
+    existing = job_registry.get(job_id)
+    if existing is not None and existing["status"] in ACTIVE_STATUSES:
+        raise HTTPException(status_code=409, detail="同一job_id的任务正在执行")
+    max_mb = min(UPLOAD_MAX_MB, request.max_size_mb or UPLOAD_MAX_MB)
+    started_at = time.monotonic()
+    try:
+        upload = await receive_upload(
+            http_request, job_dir(job_id), int(max_mb * 1024 * 1024)
+        )
+    except UploadTooLarge:
+        remove_job_dir(job_id)
+        UPLOADS.labels("too_large").inc()
+        raise HTTPException(status_code=413, detail=f"视频超过{max_mb:g}MB")
+    except UploadError as e:
+        remove_job_dir(job_id)
+        UPLOADS.labels("invalid").inc()
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        # 客户端断开等情况下不保留不完整的文件
+        remove_job_dir(job_id)
+        raise
+    UPLOAD_BYTES.inc(upload.size)
+    logger.info(
+        f"接收上传：{upload.filename or '-'}，{upload.size / 1024 / 1024:.1f}MB，"
+        f"sha256={upload.sha256[:12]}，用时{time.monotonic() - started_at:.2f}秒"
+    )
+
+    if request.dedup:
+        match = await asyncio.to_thread(
+            get_fingerprint_index().lookup_hash, upload.sha256
+        )
+        if match is not None:
+            remove_job_dir(job_id)
+            UPLOADS.labels("cached").inc()
+            return reuse_result(match, upload.sha256)
+
+    UPLOADS.labels("queued").inc()
+    job = job_registry.submit(
+        job_id, analyse_upload(request, job_id, upload, started_at)
+    )
+    response.status_code = 202
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return {**job, "sha256": upload.sha256, "size": upload.size}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_registry.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+
+async def run_queued_download(job_id: str, payload: dict) -> dict:
+    """执行从数据库任务队列领取的下载分析任务"""
+    return await run_job(
+        download_and_analyse(DownloadAndAnalyseRequest(**payload), job_id), job_id
+    )
+
+
+def get_job_queue():
+    if job_queue is None:
+        raise HTTPException(status_code=503, detail="任务队列不可用")
+    return job_queue
+
+
+def queued_job_view(job: dict) -> dict:
+    """与GET /jobs/{job_id}一致的任务状态，另外给出执行次数和执行节点"""
+    view = {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "worker": job["lease_owner"],
+        "created_at": job["created_at"].timestamp(),
+        "updated_at": job["updated_at"].timestamp(),
+    }
+    if job["status"] == "succeeded" and job["result"] is not None:
+        from video_analyser import result_codec
+
+        view["result"] = result_codec.decode(job["result"])
+    elif job["error"] is not None:
+        # 重新排队等待重试的任务也带上最近一次的错误
+        view.update(error=job["error"], status_code=job["status_code"])
+    return view
+
+
+@app.post("/queue/jobs", status_code=202)
+async def enqueue_job(request: DownloadAndAnalyseRequest, response: Response):
+    """提交到数据库任务队列，由任一节点的工作器执行，结果通过GET /queue/jobs/{job_id}获取
+
+    请求中的API密钥与本节点默认密钥相同时不写入队列，执行节点使用自己的默认密钥。
+    """
+    queue = get_job_queue()
+    job_id = request_job_id(request)
+    exclude = {"job_id"}
+    if request.api_key == default_api_key():
+        exclude.add("api_key")
+    job = await asyncio.to_thread(
+        queue.enqueue,
+        job_id,
+        "download_and_analyse",
+        request.model_dump(exclude=exclude),
+    )
+    response.headers["Location"] = f"/queue/jobs/{job_id}"
+    return queued_job_view(job)
+
+
+@app.get("/queue/jobs/{job_id}")
+def get_queued_job(job_id: str):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return queued_job_view(job)
+
+
+@app.post("/batch-download-and-analyse")
+async def batch_download_and_analyse_endpoint(
+    request: BatchDownloadAndAnalyseRequest,
+):
+    from pipeline import BatchPipeline, StageLimits
+    from spider import download_video, get_video_info
+
+    pipeline = BatchPipeline(
+        resolve=get_video_info,
+        fetch=download_video,
+        api_key=request.api_key,
+        base_url=request.base_url,
+        min_scene_duration_seconds=request.min_scene_duration_seconds,
+        detect_mode=request.detect_mode,
+        max_duration_seconds=request.max_duration_seconds,
+        max_size_mb=request.max_size_mb,
+        limits=StageLimits(
+            download=request.download_concurrency,
+            detect=request.detect_concurrency or get_budget().jobs,
+            asr=request.asr_concurrency or get_budget().jobs,
+            describe=request.describe_concurrency,
+        ),
+        debug=request.debug,
+    )
+
+    async def stream_results():
+        # 每个URL完成后立即以一行JSON返回
+        async for item in pipeline.run(request.urls):
+            if "result" in item:
+                save_result(item["result"], item["url"])
+            yield json_line(item)
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@app.post("/resegment")
+def resegment_endpoint(request: ResegmentRequest):
+    """用任务保存的差异信号按新参数重新分镜，不重新解码视频"""
+    from video_analyser.scene_detector import load_signal, resegment
+
+    path = signal_dir(request.job_id)
+    if path is None or not os.path.exists(os.path.join(path, "meta.json")):
+        raise HTTPException(status_code=404, detail="差异信号不存在")
+    scene_starts = resegment(
+        path,
+        threshold=request.threshold,
+        min_scene_duration=request.min_scene_duration_seconds,
+        window_size=request.window_size,
+    )
+    meta = load_signal(path)[2]
+    fps = meta["fps"]
+    scene_ends = scene_starts[1:] + [meta["total_frames"]]
+    return {
+        "job_id": request.job_id,
+        "scenes": [
+            {
+                "scene_number": f"分镜 {i}",
+                "start": round(start / fps, 2),
+                "duration": round((end - start) / fps, 2),
+            }
+            for i, (start, end) in enumerate(zip(scene_starts, scene_ends), start=1)
+        ],
+    }
+
+
+@app.get("/profiles/{job_id}")
+def get_profile_summary(job_id: str):
+    """剖析摘要，等同于/profiles/{job_id}/summary.json"""
+    return get_profile_artifact(job_id, "summary.json")
+
+
+@app.get("/profiles/{job_id}/{artifact}")
+def get_profile_artifact(job_id: str, artifact: str):
+    path = artifact_path(job_id, artifact)
+    if path is None:
+        raise HTTPException(status_code=404, detail="剖析结果不存在")
+    return FileResponse(path, filename=f"{job_id}-{artifact}")
+
+
+@app.get("/metrics")
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def get_db():
+    if db is None:
+        raise HTTPException(status_code=503, detail="数据库不可用")
+    return db
+
+
+def video_load_options():
+    """查询视频时一并加载分镜和字幕片段"""
+    from db.models import Video
+    from sqlalchemy.orm import selectinload
+
+    return (selectinload(Video.scenes), selectinload(Video.segments))
+
+
+@app.get("/analyses")
+def list_analyses(
+    platform: str = None,
+    video_id: str = None,
+    start_time: datetime = None,
+    end_time: datetime = None,
+    after_id: int = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    from db.models import Video
+
+    rows, next_cursor = get_db().get_page(
+        Video,
+        after_id=after_id,
+        limit=limit,
+        options=video_load_options(),
+        platform=platform,
+        video_id=video_id,
+        start_time=start_time,
+        end_time=end_time,
+    )
+    return {"items": [row.to_dict() for row in rows], "next_cursor": next_cursor}
+
+
+@app.get("/analyses/export")
+def export_analyses(
+    platform: str = None,
+    video_id: str = None,
+    start_time: datetime = None,
+    end_time: datetime = None,
+):
+    from db.models import Video
+
+    rows = get_db().iter_all(
+        Video,
+        options=video_load_options(),
+        platform=platform,
+        video_id=video_id,
+        start_time=start_time,
+        end_time=end_time,
+    )
+    # 同步生成器在线程池中逐行读取并输出，内存占用恒定
+    lines = (json_line(row.to_dict()) for row in rows)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+@app.get("/search")
+def search(
+    q: str,
+    platform: str = None,
+    field: Literal["text", "description", "transcript"] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    """全文搜索分镜文案、画面描述和字幕，按相关度返回命中位置（毫秒）"""
+    if search_index is None:
+        raise HTTPException(status_code=503, detail="搜索索引不可用")
+    hits = search_index.search(
+        q, limit=limit, offset=offset, platform=platform, field=field
+    )
+    return {"query": q, "hits": hits}
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,12 +1,12 @@
 import os
-from typing import Optional
+from typing import List, Literal, Optional
 
-from dotenv import load_dotenv
-from pydantic import BaseModel
-from fastapi import Request
+from pydantic import BaseModel, Field
 
-load_dotenv()
-API_KEY = os.getenv("KEY")
+
+def default_api_key():
+    """默认API密钥，在请求时读取环境变量（.env由服务启动时加载）"""
+    return os.getenv("KEY")
 
 
 class VideoAnalysisRequest(BaseModel):
@@ -16,14 +16,80 @@ class VideoAnalysisRequest(BaseModel):
     api_key: str
     base_url: str = "https://api.bltcy.ai/v1"
     min_scene_duration_seconds: Optional[float] = 3.0
+    detect_mode: Literal["dense", "keyframe"] = "dense"
     max_duration_seconds: Optional[int] = 300
     debug: Optional[bool] = True
+    # 剖析任务，摘要通过GET /profiles/{job_id}获取；其中pstats统计整个进程，
+    # 包括同时执行的其他任务
+    profile: Optional[bool] = False
+    keep_signal: Optional[bool] = False
+    job_id: Optional[str] = None
+    # 分析期限（秒），指定时按需降级并在结果中返回fidelity报告
+    deadline_seconds: Optional[float] = Field(default=None, gt=0)
 
 
 class DownloadAndAnalyseRequest(BaseModel):
     url: str
-    api_key: str = API_KEY
+    api_key: str = Field(default_factory=default_api_key)
+    base_url: str = "https://api.bltcy.ai/v1"
+    min_scene_duration_seconds: Optional[float] = 3.0
+    detect_mode: Literal["dense", "keyframe"] = "dense"
+    max_duration_seconds: Optional[int] = 300
+    max_size_mb: Optional[float] = None
+    debug: Optional[bool] = True
+    profile: Optional[bool] = False
+    keep_signal: Optional[bool] = False
+    job_id: Optional[str] = None
+    # 与已分析视频近重复（转码、裁剪、加水印）时直接返回已有结果
+    dedup: Optional[bool] = True
+    # 分析期限（秒，从收到请求开始计时，包括下载），指定时按需降级
+    deadline_seconds: Optional[float] = Field(default=None, gt=0)
+
+
+class UploadAndAnalyseQuery(BaseModel):
+    """上传分析的参数，通过查询字符串传递（请求体是视频本身）
+
+    API密钥不放在查询字符串中（会被记入访问日志），由X-Api-Key请求头传递。
+    """
+
     base_url: str = "https://api.bltcy.ai/v1"
     min_scene_duration_seconds: Optional[float] = 3.0
+    detect_mode: Literal["dense", "keyframe"] = "dense"
     max_duration_seconds: Optional[int] = 300
+    max_size_mb: Optional[float] = Field(default=None, gt=0)
     debug: Optional[bool] = True
+    profile: Optional[bool] = False
+    keep_signal: Optional[bool] = False
+    job_id: Optional[str] = None
+    # 内容相同（哈希）或近重复时直接返回已有结果
+    dedup: Optional[bool] = True
+    deadline_seconds: Optional[float] = Field(default=None, gt=0)
+
+
+class UploadAndAnalyseRequest(UploadAndAnalyseQuery):
+    """上传分析任务的完整参数：查询字符串参数加请求头中的API密钥"""
+
+    api_key: str = Field(default_factory=default_api_key)
+
+
+class BatchDownloadAndAnalyseRequest(BaseModel):
+    urls: List[str]
+    api_key: str = Field(default_factory=default_api_key)
+    base_url: str = "https://api.bltcy.ai/v1"
+    min_scene_duration_seconds: Optional[float] = 3.0
+    detect_mode: Literal["dense", "keyframe"] = "dense"
+    max_duration_seconds: Optional[int] = 300
+    max_size_mb: Optional[float] = None
+    debug: Optional[bool] = False
+    download_concurrency: int = 4
+    # 为空时使用线程预算中的并发任务数
+    detect_concurrency: Optional[int] = None
+    asr_concurrency: Optional[int] = None
+    describe_concurrency: int = 4
+
+
+class ResegmentRequest(BaseModel):
+    job_id: str
+    threshold: float = Field(default=2.0, ge=0)
+    min_scene_duration_seconds: float = Field(default=3.0, ge=0)
+    window_size: int = Field(default=5, ge=1)
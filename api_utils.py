@@ -1,7 +1,26 @@
 import csv
+import json
+import os
 
+from fastapi.responses import JSONResponse
 
-def convert_to_json_data(csv_path, transcript_path, video_id=None):
+# orjson是项目依赖；未同步依赖的开发环境回退到标准库json
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    orjson = None
+    FastJSONResponse = JSONResponse
+
+
+def json_line(item) -> bytes:
+    """NDJSON的一行，用orjson编码，比标准库快数倍"""
+    if orjson is not None:
+        return orjson.dumps(item) + b"\n"
+    return (json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def convert_to_json_data(csv_path, transcript_path, video_id=None, srt_path=None):
     # 读取CSV文件
     scenes = []
     with open(csv_path, "r", encoding="utf-8") as f:
@@ -22,4 +41,33 @@ def convert_to_json_data(csv_path, transcript_path, video_id=None):
     # 构建最终的JSON结构
     result = {"video_id": video_id, "scenes": scenes, "transcript": transcript}
 
+    # 读取校对后的字幕片段
+    if srt_path is not None and os.path.exists(srt_path):
+        import pysrt
+
+        result["segments"] = [
+            {
+                "start": sub.start.ordinal / 1000,
+                "end": sub.end.ordinal / 1000,
+                "text": sub.text,
+            }
+            for sub in pysrt.open(srt_path)
+        ]
+
     return result
+
+
+def check_admission(video_info, max_duration_seconds=None, max_size_mb=None):
+    """根据平台返回的元数据在下载前决定是否接收任务
+
+    返回拒绝原因，可以接收时返回None。元数据缺失时放行，由下载后的检查兜底。
+    """
+    duration = video_info.get("duration")
+    if max_duration_seconds and duration and duration > max_duration_seconds:
+        return f"视频时长({duration:.2f}秒)超过限制({max_duration_seconds}秒)"
+
+    size = video_info.get("size")
+    if max_size_mb and size and size > max_size_mb * 1024 * 1024:
+        return f"视频大小({size / 1024 / 1024:.2f} MB)超过限制({max_size_mb} MB)"
+
+    return None
@@ -0,0 +1,176 @@
+"""线程预算自动调优
+
+在给定核数下枚举"并发任务数 × 每任务线程数"的组合。每种组合在独立子进程中
+按该预算并发处理合成视频（分镜检测与语音识别并发），比较吞吐量并给出最佳配置。
+OpenCV和识别器的线程数是进程级设置，因此每种组合都需要新进程。
+
+用法:
+    python -m benchmarks.autotune
+    python -m benchmarks.autotune --cores 16 --videos 8 --asr-share 0.25 0.5 0.75
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.run import ASR_MODEL, ASR_TOKENS, VAD_MODEL
+from benchmarks.synthetic import DEFAULT_CORPUS, make_video
+from video_analyser.resources import ThreadBudget, available_cores, configure
+
+
+def candidate_jobs(cores: int) -> list:
+    """候选并发任务数：1、2、4……直到核数，以及核数本身"""
+    jobs, n = [], 1
+    while n < cores:
+        jobs.append(n)
+        n *= 2
+    return jobs + [cores]
+
+
+def run_job(video_path: str, recognizer, out_dir: str) -> None:
+    """与analyse_video相同：分镜检测和语音识别并发执行"""
+    from video_analyser.scene_detector import SceneDetector
+    from video_analyser.transcriber import generate_subtitles
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    def detect():
+        SceneDetector(video_path, debug=False).detect_scenes(
+            csv_path=os.path.join(out_dir, "scenes.csv"),
+            frames_dir=os.path.join(out_dir, "frames"),
+        )
+
+    with ThreadPoolExecutor(2) as pool:
+        futures = [pool.submit(detect)]
+        if recognizer is not None:
+            futures.append(
+                pool.submit(
+                    generate_subtitles,
+                    video_path,
+                    recognizer,
+                    VAD_MODEL,
+                    srt_path=os.path.join(out_dir, "subtitle.srt"),
+                )
+            )
+        for future in futures:
+            future.result()
+
+
+def worker(args) -> dict:
+    """子进程：按指定预算并发处理videos个视频，返回吞吐量"""
+    budget = configure(ThreadBudget(args.cores, args.jobs, args.asr_share[0]))
+    recognizer = None
+    if all(os.path.exists(p) for p in (ASR_MODEL, ASR_TOKENS, VAD_MODEL)):
+        from video_analyser.transcriber import create_recognizer
+
+        recognizer = create_recognizer(ASR_MODEL, ASR_TOKENS, budget.asr_threads)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(budget.jobs) as pool:
+        futures = [
+            pool.submit(
+                run_job,
+                args.video,
+                recognizer,
+                os.path.join(args.work_dir, f"job-{i}"),
+            )
+            for i in range(args.videos)
+        ]
+        for future in futures:
+            future.result()
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": round(seconds, 3),
+        "videos_per_minute": round(args.videos * 60 / seconds, 2),
+        "asr": recognizer is not None,
+    }
+
+
+def measure(video: str, cores: int, jobs: int, asr_share: float, videos: int) -> dict:
+    with tempfile.TemporaryDirectory(prefix="va-autotune-") as work_dir:
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.autotune",
+                "--worker",
+                "--video",
+                video,
+                "--work-dir",
+                work_dir,
+                "--cores",
+                str(cores),
+                "--jobs",
+                str(jobs),
+                "--asr-share",
+                str(asr_share),
+                "--videos",
+                str(videos),
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="线程预算自动调优")
+    parser.add_argument("--cores", type=int, default=available_cores())
+    parser.add_argument("--videos", type=int, default=None, help="每种组合处理的视频数")
+    parser.add_argument("--asr-share", type=float, nargs="+", default=[0.5])
+    parser.add_argument("--corpus", default="720p30_fade", help="使用的合成视频")
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--video", help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--jobs", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(worker(args)))
+        return 0
+
+    spec = next(s for s in DEFAULT_CORPUS if s.name == args.corpus)
+    video = make_video(spec, os.path.join(tempfile.gettempdir(), "va-autotune"))
+    results = []
+    for jobs in candidate_jobs(args.cores):
+        # 视频数取并发数的整数倍，保证每种组合都跑满
+        videos = args.videos or max(jobs * 2, 4)
+        for asr_share in args.asr_share:
+            budget = ThreadBudget(args.cores, jobs, asr_share)
+            result = measure(video, args.cores, jobs, asr_share, videos)
+            result.update(
+                jobs=jobs,
+                asr_share=asr_share,
+                asr_threads=budget.asr_threads,
+                opencv_threads=budget.opencv_threads,
+            )
+            results.append(result)
+            print(
+                f"jobs={jobs:<3} asr_threads={budget.asr_threads:<3} "
+                f"opencv_threads={budget.opencv_threads:<3} "
+                f"{result['videos_per_minute']:>8.2f} videos/min"
+            )
+
+    best = max(results, key=lambda r: r["videos_per_minute"])
+    print("\n最佳配置：")
+    print(f"  VA_CPU_BUDGET={args.cores}")
+    print(f"  VA_MAX_JOBS={best['jobs']}")
+    print(f"  VA_ASR_SHARE={best['asr_share']}")
+    if not best["asr"]:
+        print("未找到ASR模型，结果只包含分镜检测", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"best": best, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""分析结果存储格式基准
+
+用合成的分析结果比较各种格式的体积和编解码耗时：格式化JSON（main.py和旧版
+存储使用的格式）、紧凑JSON、orjson（已安装时）以及紧凑二进制格式
+（不压缩/zlib）。紧凑格式另外计时只解码分镜列表的耗时。
+
+用法:
+    python -m benchmarks.bench_codec
+    python -m benchmarks.bench_codec --results 2000 --output codec.json
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+from benchmarks.run import SAMPLE_TEXT
+from video_analyser import result_codec
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DESCRIPTIONS = [
+    "一位年轻女性站在窗边，手持手机自拍，自然光从左侧照入，背景是简约的白色房间。",
+    "产品特写镜头，白色瓶身放在木质桌面上，旁边摆放绿色植物，画面温暖明亮。",
+    "户外街景，行人来来往往，镜头缓慢向右平移，远处可以看到高楼和蓝天。",
+    "厨房场景，一双手正在切菜，案板上有番茄和黄瓜，画面色调偏暖。",
+    "屏幕上显示大字标题“限时优惠”，红色背景，下方有价格和购买按钮。",
+]
+
+
+def make_result(rng: random.Random, index: int) -> dict:
+    """生成与convert_to_json_data结构相同的分析结果"""
+    sentences = [s + "。" for s in SAMPLE_TEXT.split("。") if s]
+    segments, scenes, start = [], [], 0.0
+    for i in range(rng.randint(4, 12)):
+        duration = round(rng.uniform(1.5, 8.0), 2)
+        texts = rng.sample(sentences, rng.randint(1, 2))
+        seg_start = start
+        for text in texts:
+            seg_end = round(seg_start + duration / len(texts), 3)
+            segments.append(
+                {"start": round(seg_start, 3), "end": seg_end, "text": text}
+            )
+            seg_start = seg_end
+        scenes.append(
+            {
+                "scene_number": f"分镜 {i + 1}",
+                "duration": duration,
+                "text": "".join(texts),
+                "description": rng.choice(DESCRIPTIONS),
+            }
+        )
+        start += duration
+    return {
+        "video_id": f"7{index:018d}",
+        "scenes": scenes,
+        "transcript": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+    }
+
+
+def _formats() -> dict:
+    """格式名 -> (编码函数, 解码函数, 只解码分镜的函数)"""
+    formats = {
+        "json_pretty": (
+            lambda r: json.dumps(r, ensure_ascii=False, indent=4).encode("utf-8"),
+            json.loads,
+            None,
+        ),
+        "json_compact": (
+            lambda r: json.dumps(r, ensure_ascii=False, separators=(",", ":")).encode(
+                "utf-8"
+            ),
+            json.loads,
+            None,
+        ),
+    }
+    if orjson is not None:
+        formats["orjson"] = (orjson.dumps, orjson.loads, None)
+
+    def codec(compression):
+        return (
+            lambda r: result_codec.encode(r, compression),
+            result_codec.decode,
+            lambda b: result_codec.decode(b, ("scenes",)),
+        )
+
+    formats["codec_raw"] = codec(result_codec.COMPRESSION_NONE)
+    formats["codec_zlib"] = codec(result_codec.COMPRESSION_ZLIB)
+    return formats
+
+
+def _per_item_us(fn, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def run_benchmarks(count: int, repeat: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    results = [make_result(rng, i) for i in range(count)]
+
+    report = {}
+    for name, (encode, decode, decode_scenes) in _formats().items():
+        encoded = [encode(r) for r in results]
+        decoded = decode(encoded[0])
+        if decoded["scenes"] != results[0]["scenes"]:
+            raise AssertionError(f"{name}解码结果与原结果不一致")
+        entry = {
+            "bytes_per_result": round(statistics.mean(map(len, encoded)), 1),
+            "encode_us": round(
+                min(_per_item_us(encode, results) for _ in range(repeat)), 2
+            ),
+            "decode_us": round(
+                min(_per_item_us(decode, encoded) for _ in range(repeat)), 2
+            ),
+        }
+        if decode_scenes is not None:
+            entry["decode_scenes_us"] = round(
+                min(_per_item_us(decode_scenes, encoded) for _ in range(repeat)), 2
+            )
+        report[name] = entry
+
+    base = report["json_pretty"]["bytes_per_result"]
+    for entry in report.values():
+        entry["size_ratio"] = round(entry["bytes_per_result"] / base, 3)
+    return report
+
+
+def print_table(report: dict) -> None:
+    print(
+        f"{'format':<18}{'bytes':>10}{'ratio':>8}{'encode_us':>12}"
+        f"{'decode_us':>12}{'scenes_us':>12}"
+    )
+    for name, entry in report.items():
+        scenes = entry.get("decode_scenes_us")
+        print(
+            f"{name:<18}{entry['bytes_per_result']:>10.1f}{entry['size_ratio']:>8.3f}"
+            f"{entry['encode_us']:>12.2f}{entry['decode_us']:>12.2f}"
+            f"{scenes if scenes is not None else '-':>12}"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="分析结果存储格式基准")
+    parser.add_argument("--results", type=int, default=1000, help="合成结果数量")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.results, args.repeat)
+    print_table(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""冷启动基准
+
+在全新子进程中测量模块导入耗时，以及API服务从启动到可以响应请求的耗时，
+并与基线结果比较，超过容差即以非零状态退出。
+
+用法:
+    python -m benchmarks.bench_import --save-baseline benchmarks/import_baseline.json
+    python -m benchmarks.bench_import --baseline benchmarks/import_baseline.json
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+MODULES = ("api", "main", "video_analyser", "spider")
+# 导入后不应被加载的重依赖，出现即说明某处又变成了急切导入
+HEAVY_MODULES = ("cv2", "sherpa_onnx", "openai", "sqlalchemy", "requests", "pysrt")
+
+# 低于该绝对差值的变化视为噪声（秒）
+MIN_DELTA = 0.02
+
+
+def import_time(module: str) -> dict:
+    """在新解释器中导入模块，返回耗时和被连带导入的重依赖"""
+    code = (
+        "import sys, time, json\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "seconds = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'seconds': seconds, 'heavy': heavy}))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_ready_time(timeout: float = 60.0) -> float:
+    """启动uvicorn，返回直到/metrics返回200的耗时"""
+    port = _free_port()
+    with tempfile.TemporaryDirectory(prefix="va-coldstart-") as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/va.db", VA_WARMUP="")
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            while time.perf_counter() - start < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f"服务启动失败，退出码 {server.returncode}")
+                try:
+                    url = f"http://127.0.0.1:{port}/metrics"
+                    with urllib.request.urlopen(url, timeout=1) as response:
+                        if response.status == 200:
+                            return time.perf_counter() - start
+                except OSError:
+                    time.sleep(0.02)
+            raise TimeoutError(f"服务在{timeout}秒内未就绪")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def run_benchmarks(repeat: int, serve: bool) -> dict:
+    results = {}
+    for module in MODULES:
+        runs = [import_time(module) for _ in range(repeat)]
+        results[f"import/{module}"] = {
+            "seconds": round(statistics.median(r["seconds"] for r in runs), 4),
+            "heavy": runs[-1]["heavy"],
+        }
+    if serve:
+        timings = [server_ready_time() for _ in range(repeat)]
+        results["serve/api"] = {"seconds": round(statistics.median(timings), 4)}
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """返回超过容差的回归项，以及新出现的重依赖"""
+    regressions = []
+    for key, base in baseline.items():
+        current = results.get(key)
+        if current is None:
+            continue
+        delta = current["seconds"] - base["seconds"]
+        if delta > MIN_DELTA and delta > base["seconds"] * tolerance:
+            regressions.append(
+                f"{key} seconds: {base['seconds']:.3f} -> {current['seconds']:.3f}"
+            )
+        added = set(current.get("heavy", [])) - set(base.get("heavy", []))
+        if added:
+            regressions.append(f"{key} 急切导入了: {', '.join(sorted(added))}")
+    return regressions
+
+
+def print_table(results: dict) -> None:
+    print(f"{'target':<28}{'seconds':>10}  heavy imports")
+    for key, result in results.items():
+        heavy = ", ".join(result.get("heavy", [])) or "-"
+        print(f"{key:<28}{result['seconds']:>10.3f}  {heavy}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="冷启动基准")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-serve", action="store_true", help="不测量服务就绪耗时")
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    parser.add_argument("--baseline", help="与该基线JSON比较")
+    parser.add_argument("--save-baseline", help="将结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.repeat, serve=not args.no_serve)
+    print_table(results)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("冷启动回归：", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""画面描述全局调度基准
+
+多个任务同时向限速的桩服务描述关键帧（一个帧多的任务和若干帧少的任务），
+比较各任务自行并发（不经调度器）与经全局调度器两种方式：总耗时、429次数、
+重试用尽失败的帧数、桩服务观察到的最大并发，以及帧少的任务的完成时间（公平性）。
+
+桩服务按window秒的窗口限速；调度器的每分钟限额换算为同样保证任意window秒内
+不超过限额的速率。
+
+用法:
+    python -m benchmarks.bench_vision
+    python -m benchmarks.bench_vision --jobs 6 --rpm 20 --window 5 --max-concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.stub_server import StubVisionServer
+from video_analyser.frame_describer import FrameDescriber
+from video_analyser.resources import install_executor
+from video_analyser.vision_scheduler import KeyScheduler
+
+
+def make_frame(path: str) -> str:
+    image = np.random.default_rng(0).integers(0, 255, (180, 320, 3), dtype=np.uint8)
+    cv2.imwrite(path, image)
+    return path
+
+
+async def run_jobs(describers: list, frame_counts: list, frame: str, per_job: int):
+    # 与服务相同的线程池大小，默认线程池会把并发限制在核数+4
+    install_executor()
+    start = time.perf_counter()
+
+    async def job(describer, count):
+        results = await asyncio.gather(
+            *(_describe(describer, frame, i, per_job) for i in range(count)),
+        )
+        return time.perf_counter() - start, sum(r is None for r in results)
+
+    finished = await asyncio.gather(
+        *(job(d, count) for d, count in zip(describers, frame_counts))
+    )
+    return time.perf_counter() - start, finished
+
+
+_semaphores = {}
+
+
+async def _describe(describer, frame, index, per_job):
+    # 与describe_images_concurrent相同的单任务并发上限，但失败的帧不中断整个任务
+    semaphore = _semaphores.setdefault(describer, asyncio.Semaphore(per_job))
+    async with semaphore:
+        try:
+            return await describer.describe_image(frame)
+        except Exception:
+            return None
+
+
+def run_mode(mode: str, args, frame: str) -> dict:
+    stub = StubVisionServer(
+        latency=args.latency,
+        rpm=args.rpm,
+        max_concurrency=args.max_concurrency,
+        congestion=args.congestion,
+        window=args.window,
+    )
+    base_url = stub.start()
+    frame_counts = [args.big_job] + [args.small_job] * (args.jobs - 1)
+    scheduler = None
+    if mode == "scheduler":
+        burst = 1.0
+        scheduler = KeyScheduler(
+            "bench",
+            rpm=args.rpm * (60 + burst) / (args.window + burst),
+            burst_seconds=burst,
+        )
+    describers = []
+    for _ in frame_counts:
+        describer = FrameDescriber("stub", base_url, use_scheduler=False)
+        describer.scheduler = scheduler
+        describers.append(describer)
+    _semaphores.clear()
+    try:
+        elapsed, finished = asyncio.run(
+            run_jobs(describers, frame_counts, frame, args.per_job)
+        )
+    finally:
+        stub.stop()
+    small = [seconds for seconds, _ in finished[1:]]
+    return {
+        "elapsed": round(elapsed, 2),
+        "frames": sum(frame_counts),
+        "failed": sum(failed for _, failed in finished),
+        "http_429": stub.rate_limited,
+        "max_in_flight": stub.max_in_flight,
+        "big_job_seconds": round(finished[0][0], 2),
+        "small_job_max_seconds": round(max(small), 2) if small else None,
+        "final_limit": round(scheduler.limit, 2) if scheduler else None,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="画面描述全局调度基准")
+    parser.add_argument("--jobs", type=int, default=5)
+    parser.add_argument("--big-job", type=int, default=40, help="第一个任务的帧数")
+    parser.add_argument("--small-job", type=int, default=5, help="其余任务的帧数")
+    parser.add_argument("--per-job", type=int, default=8, help="每个任务的并发上限")
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--congestion", type=float, default=0.02)
+    parser.add_argument("--rpm", type=int, default=30, help="桩服务每个窗口的请求数")
+    parser.add_argument("--window", type=float, default=5.0)
+    parser.add_argument("--max-concurrency", type=int, default=10)
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        frame = make_frame(os.path.join(tmp, "frame.jpg"))
+        report = {
+            mode: run_mode(mode, args, frame) for mode in ("per_job", "scheduler")
+        }
+
+    print(
+        f"{'mode':<12}{'elapsed':>9}{'failed':>8}{'429':>6}{'max_inflight':>14}"
+        f"{'big_job':>9}{'small_max':>11}"
+    )
+    for mode, entry in report.items():
+        print(
+            f"{mode:<12}{entry['elapsed']:>9.2f}{entry['failed']:>8}"
+            f"{entry['http_429']:>6}{entry['max_in_flight']:>14}"
+            f"{entry['big_job_seconds']:>9.2f}{entry['small_job_max_seconds']:>11}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
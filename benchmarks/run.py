@@ -0,0 +1,375 @@
+"""分阶段性能基准
+
+用合成视频（已知切点）分别计时各个处理阶段，记录吞吐量和峰值内存，
+并与基线结果比较，超过容差即以非零状态退出。
+
+用法:
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --tolerance 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import replace
+
+import pysrt
+
+from benchmarks.stub_server import StubVisionServer
+from benchmarks.synthetic import DEFAULT_CORPUS, QUICK_CORPUS, make_video
+from video_analyser.fingerprint import (
+    MIN_CORRELATION,
+    MIN_CUT_SCORE,
+    compute_fingerprint,
+    correlation,
+    cut_score,
+)
+from video_analyser.frame_describer import FrameDescriber
+from video_analyser.scene_detector import SceneDetector
+from video_analyser.transcriber import create_recognizer, generate_subtitles, load_audio
+from video_analyser.utils import (
+    Segment,
+    calculate_scene_times,
+    correct_srt_with_transcript,
+    organize_subtitles_by_scene,
+    read_csv_rows,
+)
+
+# 指纹查重：同一视频按这些关键帧间隔重新编码后应互相命中
+FINGERPRINT_GOPS = (250, 40)
+
+ASR_MODEL = "weights/asr/sensevoice.onnx"
+ASR_TOKENS = "weights/asr/tokens.txt"
+VAD_MODEL = "weights/asr/silero_vad.onnx"
+
+SAMPLE_TEXT = (
+    "今天给大家分享一个非常实用的拍摄技巧，只需要一部手机就能拍出电影感。"
+    "首先找到合适的光线，然后调整构图，让主体位于画面三分之一的位置。"
+    "接下来放慢运镜速度，最后在剪辑时加上合适的音乐，效果立刻就不一样了！"
+)
+
+
+def _current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        # 非Linux平台退化为进程历史峰值
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextmanager
+def peak_rss():
+    """采样期间的峰值常驻内存（MB）"""
+    result = {"peak_rss_mb": _current_rss_mb()}
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(0.01):
+            result["peak_rss_mb"] = max(result["peak_rss_mb"], _current_rss_mb())
+
+    thread = threading.Thread(target=sample, daemon=True)
+    thread.start()
+    try:
+        yield result
+    finally:
+        stop.set()
+        thread.join()
+        result["peak_rss_mb"] = max(result["peak_rss_mb"], _current_rss_mb())
+
+
+def time_stage(fn, repeat: int) -> dict:
+    """重复执行并返回耗时中位数、峰值内存和最后一次的返回值"""
+    timings = []
+    with peak_rss() as memory:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            value = fn()
+            timings.append(time.perf_counter() - start)
+    return {
+        "seconds": statistics.median(timings),
+        "peak_rss_mb": round(memory["peak_rss_mb"], 1),
+        "value": value,
+    }
+
+
+def cut_accuracy(detected: list, expected: list, tolerance: int) -> dict:
+    """按帧容差计算切点的准确率和召回率（不含第0帧）"""
+    detected, expected = detected[1:], expected[1:]
+    matched = sum(
+        1 for cut in expected if any(abs(cut - d) <= tolerance for d in detected)
+    )
+    precision = (
+        sum(1 for d in detected if any(abs(cut - d) <= tolerance for cut in expected))
+        / len(detected)
+        if detected
+        else 1.0
+    )
+    recall = matched / len(expected) if expected else 1.0
+    return {"precision": round(precision, 3), "recall": round(recall, 3)}
+
+
+def synthetic_subtitles(duration: float, srt_path: str) -> str:
+    """按时长生成模拟字幕，返回与之对应的转录文本"""
+    segments = []
+    # 起止时间避开整秒，Segment的时间格式要求带毫秒
+    pos, t = 0, 0.25
+    while t < duration:
+        text = SAMPLE_TEXT[pos % len(SAMPLE_TEXT) : pos % len(SAMPLE_TEXT) + 12]
+        segments.append(Segment(start=t, duration=1.8, text=text))
+        pos += 12
+        t += 2.05
+    with open(srt_path, "w", encoding="utf-8") as f:
+        for counter, seg in enumerate(segments, start=1):
+            print(counter, file=f)
+            print(seg, file=f)
+            print("", file=f)
+    transcript = "".join(seg.text for seg in segments)
+    # 模拟两次识别结果的轻微差异
+    return transcript.replace("的", "得", 3)
+
+
+def fingerprint_across_gops(spec, video_path: str, work_dir: str, repeat: int):
+    """关键帧模式计算指纹，检查按FINGERPRINT_GOPS重新编码的同一视频能否命中"""
+    stage = time_stage(lambda: compute_fingerprint(video_path, "keyframe"), repeat)
+    fingerprint = stage.pop("value")
+    scores = []
+    for gop in FINGERPRINT_GOPS:
+        variant = replace(spec, name=f"{spec.name}_g{gop}", gop=gop)
+        other = compute_fingerprint(
+            make_video(variant, os.path.join(work_dir, "corpus")), "keyframe"
+        )
+        scores.append(
+            (
+                correlation(fingerprint["vector"], other["vector"]),
+                cut_score(fingerprint["durations"], other["durations"]),
+                abs(fingerprint["duration"] - other["duration"]),
+            )
+        )
+    min_corr = min(corr for corr, _, _ in scores)
+    min_cuts = min(cuts for _, cuts, _ in scores)
+    stage.update(
+        throughput=round(spec.total_frames / stage["seconds"], 1),
+        unit="frames/s",
+        correlation=round(min_corr, 4),
+        cut_score=round(min_cuts, 4),
+        duration_error=round(max(error for _, _, error in scores), 3),
+        matched=float(min_corr >= MIN_CORRELATION and min_cuts >= MIN_CUT_SCORE),
+    )
+    return stage
+
+
+def run_benchmarks(corpus, work_dir: str, repeat: int, vision_latency: float):
+    results = {}
+    recognizer = None
+    if all(os.path.exists(p) for p in (ASR_MODEL, ASR_TOKENS, VAD_MODEL)):
+        recognizer = create_recognizer(ASR_MODEL, ASR_TOKENS, 8)
+    else:
+        print("未找到ASR模型，跳过generate_subtitles基准", file=sys.stderr)
+
+    stub = StubVisionServer(latency=vision_latency)
+    base_url = stub.start()
+    try:
+        for spec in corpus:
+            video_path = make_video(spec, os.path.join(work_dir, "corpus"))
+            case_dir = os.path.join(work_dir, spec.name)
+            csv_path = os.path.join(case_dir, "scenes.csv")
+            os.makedirs(case_dir, exist_ok=True)
+
+            def detect():
+                detector = SceneDetector(video_path, debug=False)
+                cuts = detector.detect_scenes(
+                    min_scene_duration=1.0,
+                    csv_path=csv_path,
+                    frames_dir=os.path.join(case_dir, "frames"),
+                )
+                return cuts, detector.saved_frames
+
+            stage = time_stage(detect, repeat)
+            cuts, frames = stage.pop("value")
+            stage.update(
+                throughput=round(spec.total_frames / stage["seconds"], 1),
+                unit="frames/s",
+                **cut_accuracy(cuts, spec.cut_frames, spec.fade_frames + 2),
+            )
+            results[f"detect_scenes/{spec.name}"] = stage
+
+            def detect_keyframe():
+                detector = SceneDetector(video_path, debug=False)
+                cuts = detector.detect_scenes(
+                    min_scene_duration=1.0,
+                    csv_path=csv_path,
+                    save_frames=False,
+                    frames_dir=os.path.join(case_dir, "frames"),
+                    mode="keyframe",
+                )
+                return cuts, detector.frames_decoded
+
+            stage = time_stage(detect_keyframe, repeat)
+            cuts, frames_decoded = stage.pop("value")
+            stage.update(
+                throughput=round(spec.total_frames / stage["seconds"], 1),
+                unit="frames/s",
+                decoded_ratio=round(frames_decoded / spec.total_frames, 3),
+                **cut_accuracy(cuts, spec.cut_frames, spec.fade_frames + 2),
+            )
+            results[f"detect_scenes_keyframe/{spec.name}"] = stage
+
+            if spec.gop:
+                results[f"fingerprint_gop/{spec.name}"] = fingerprint_across_gops(
+                    spec, video_path, work_dir, repeat
+                )
+
+            stage = time_stage(lambda: load_audio(video_path), repeat)
+            samples, sample_rate = stage.pop("value")
+            audio_seconds = len(samples) / sample_rate
+            stage.update(
+                throughput=round(audio_seconds / stage["seconds"], 1),
+                unit="audio s/s",
+            )
+            results[f"load_audio/{spec.name}"] = stage
+
+            if recognizer is not None:
+                srt_path = os.path.join(case_dir, "subtitle.srt")
+                stage = time_stage(
+                    lambda: generate_subtitles(
+                        video_path, recognizer, VAD_MODEL, srt_path=srt_path
+                    ),
+                    repeat,
+                )
+                stage.pop("value")
+                stage.update(
+                    throughput=round(audio_seconds / stage["seconds"], 1),
+                    unit="audio s/s",
+                )
+                results[f"generate_subtitles/{spec.name}"] = stage
+
+            srt_path = os.path.join(case_dir, "synthetic.srt")
+            transcript = synthetic_subtitles(spec.duration, srt_path)
+            stage = time_stage(
+                lambda: correct_srt_with_transcript(srt_path, transcript), repeat
+            )
+            stage.pop("value")
+            subs = pysrt.open(srt_path)
+            stage.update(
+                throughput=round(len(subs) / stage["seconds"], 1), unit="subs/s"
+            )
+            results[f"correct_srt_with_transcript/{spec.name}"] = stage
+
+            scene_times = calculate_scene_times(read_csv_rows(csv_path))
+            stage = time_stage(
+                lambda: organize_subtitles_by_scene(subs, scene_times), repeat
+            )
+            stage.pop("value")
+            stage.update(
+                throughput=round(len(subs) / stage["seconds"], 1), unit="subs/s"
+            )
+            results[f"organize_subtitles_by_scene/{spec.name}"] = stage
+
+            describer = FrameDescriber("stub-key", base_url, debug=False)
+            stage = time_stage(
+                lambda: asyncio.run(describer.describe_images_concurrent(frames)),
+                repeat,
+            )
+            stage.pop("value")
+            stage.update(
+                throughput=round(len(frames) / stage["seconds"], 1), unit="frames/s"
+            )
+            results[f"frame_describer/{spec.name}"] = stage
+    finally:
+        stub.stop()
+    return results
+
+
+# 低于该绝对差值的变化视为噪声（秒、MB）
+MIN_DELTA = {"seconds": 0.005, "peak_rss_mb": 5.0}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """返回超过容差的回归项"""
+    regressions = []
+    for key, base in baseline.items():
+        current = results.get(key)
+        if current is None:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            delta = current[metric] - base[metric]
+            if delta > MIN_DELTA[metric] and delta > base[metric] * tolerance:
+                regressions.append(
+                    f"{key} {metric}: {base[metric]:.3f} -> {current[metric]:.3f}"
+                )
+        for metric in ("precision", "recall", "matched"):
+            if metric in base and current[metric] < base[metric]:
+                regressions.append(
+                    f"{key} {metric}: {base[metric]:.3f} -> {current[metric]:.3f}"
+                )
+    return regressions
+
+
+def print_table(results: dict) -> None:
+    print(f"{'stage':<48}{'seconds':>10}{'throughput':>22}{'peak MB':>10}")
+    for key, stage in results.items():
+        throughput = f"{stage['throughput']} {stage['unit']}"
+        print(
+            f"{key:<48}{stage['seconds']:>10.3f}{throughput:>22}"
+            f"{stage['peak_rss_mb']:>10.1f}"
+        )
+        if "recall" in stage:
+            print(f"{'':<48}precision={stage['precision']} recall={stage['recall']}")
+        if "decoded_ratio" in stage:
+            print(f"{'':<48}decoded_ratio={stage['decoded_ratio']}")
+        if "matched" in stage:
+            print(
+                f"{'':<48}matched={stage['matched']} "
+                f"correlation={stage['correlation']} cut_score={stage['cut_score']} "
+                f"duration_error={stage['duration_error']}"
+            )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="分阶段性能基准")
+    parser.add_argument(
+        "--quick", action="store_true", help="只运行小视频（含长GOP平移镜头）"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--vision-latency", type=float, default=0.2)
+    parser.add_argument("--work-dir", default=None)
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    parser.add_argument("--baseline", help="与该基线JSON比较")
+    parser.add_argument("--save-baseline", help="将结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    corpus = QUICK_CORPUS if args.quick else DEFAULT_CORPUS
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="va-bench-")
+    results = run_benchmarks(corpus, work_dir, args.repeat, args.vision_latency)
+    print_table(results)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("性能回归：", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+from aiohttp import web
+
+
+class StubVisionServer:
+    """本地OpenAI兼容的chat.completions桩服务，用于在不消耗配额的情况下测试画面描述
+
+    可以像服务商一样限速：每window秒最多rpm个请求、tpm个token、max_concurrency个
+    并发请求，超出时返回429和Retry-After。congestion为每个在途请求增加的延迟，
+    模拟服务端过载时变慢。
+    """
+
+    USAGE_TOKENS = 110
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        rpm: int | None = None,
+        tpm: int | None = None,
+        max_concurrency: int | None = None,
+        congestion: float = 0.0,
+        window: float = 60.0,
+    ):
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.congestion = congestion
+        self.window = window
+        self.requests = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.bytes_received = 0
+        self._accepted = deque()
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def _retry_after(self) -> float | None:
+        """超出限额时返回需等待的秒数，否则记录本次请求并返回None"""
+        now = time.monotonic()
+        while self._accepted and self._accepted[0] <= now - self.window:
+            self._accepted.popleft()
+        if self.max_concurrency is not None and self.in_flight >= self.max_concurrency:
+            return self.latency
+        over_rpm = self.rpm is not None and len(self._accepted) >= self.rpm
+        over_tpm = (
+            self.tpm is not None
+            and (len(self._accepted) + 1) * self.USAGE_TOKENS > self.tpm
+        )
+        if over_rpm or over_tpm:
+            return max(0.01, self._accepted[0] + self.window - now)
+        self._accepted.append(now)
+        return None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        self.requests += 1
+        self.bytes_received += len(body)
+        retry_after = self._retry_after()
+        if retry_after is not None:
+            self.rate_limited += 1
+            return web.json_response(
+                {
+                    "error": {
+                        "message": "Rate limit exceeded",
+                        "type": "rate_limit_exceeded",
+                    }
+                },
+                status=429,
+                headers={"Retry-After": f"{retry_after:.3f}"},
+            )
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency + self.congestion * (self.in_flight - 1))
+        finally:
+            self.in_flight -= 1
+        return web.json_response(
+            {
+                "id": f"stub-{self.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "stub",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "桩服务描述"},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": self.USAGE_TOKENS - 10,
+                    "completion_tokens": 10,
+                    "total_tokens": self.USAGE_TOKENS,
+                },
+            }
+        )
+
+    async def _start(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/v1/chat/completions", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def start(self) -> str:
+        """在后台线程启动服务，返回base_url"""
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self.base_url
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
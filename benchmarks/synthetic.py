@@ -0,0 +1,225 @@
+import os
+import subprocess
+import wave
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class SyntheticSpec:
+    """合成视频参数：分镜切点、淡入淡出、分辨率、帧率、是否带语音、视频编码"""
+
+    name: str
+    width: int = 640
+    height: int = 360
+    fps: float = 25.0
+    duration: float = 12.0
+    cut_times: List[float] = field(default_factory=lambda: [3.0, 6.5, 9.0])
+    fade_frames: int = 0
+    speech: bool = True
+    # mp4v为OpenCV直接写出（固定GOP），h264用libx264重新编码（切点处插入I帧）
+    codec: str = "mp4v"
+    # h264的关键帧间隔（帧），None为x264默认值
+    gop: int | None = None
+    # 分镜内镜头匀速平移（画面整体缓慢变化），否则为静止背景上运动的图形
+    pan: bool = False
+
+    @property
+    def total_frames(self) -> int:
+        return int(round(self.duration * self.fps))
+
+    @property
+    def cut_frames(self) -> List[int]:
+        """已知的分镜起始帧（含第0帧）"""
+        return [0] + [int(round(t * self.fps)) for t in self.cut_times]
+
+
+DEFAULT_CORPUS = [
+    SyntheticSpec("360p25_hard", 640, 360, 25.0, 12.0, [3.0, 6.5, 9.0]),
+    SyntheticSpec("720p30_fade", 1280, 720, 30.0, 12.0, [4.0, 8.0], fade_frames=12),
+    SyntheticSpec("1080p60_hard", 1920, 1080, 60.0, 8.0, [2.5, 5.0]),
+    SyntheticSpec("540p24_silent", 960, 540, 24.0, 10.0, [5.0], speech=False),
+    SyntheticSpec(
+        "720p30_h264",
+        1280,
+        720,
+        30.0,
+        30.0,
+        [2.5, 5.0, 9.0, 12.5, 17.0, 21.0, 26.5],
+        codec="h264",
+    ),
+    # 关键帧间隔4秒（小于关键帧模式逐帧解码的5秒上限）的无切点平移镜头，
+    # 关键帧模式会跳过GOP中的帧，检验跨间隔比较不会产生假切点
+    SyntheticSpec(
+        "360p25_pan_gop100",
+        640,
+        360,
+        25.0,
+        20.0,
+        [],
+        speech=False,
+        codec="h264",
+        gop=100,
+        pan=True,
+    ),
+]
+
+QUICK_CORPUS = [DEFAULT_CORPUS[0], DEFAULT_CORPUS[-1]]
+
+
+def _scene_frame(scene: int, frame_in_scene: int, width: int, height: int):
+    """生成某个分镜中的一帧：每个分镜底色、纹理不同，带运动的图形"""
+    rng = np.random.default_rng(scene)
+    base = rng.integers(20, 235, size=3)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = base
+    # 分镜内的固定纹理，保证边缘直方图在分镜间有差异
+    step = 8 + scene * 6
+    frame[::step, :] = 255 - base
+    frame[:, ::step] = 255 - base
+    radius = max(8, height // 8)
+    x = int((frame_in_scene * 4 + scene * 97) % max(1, width - 2 * radius)) + radius
+    cv2.circle(frame, (x, height // 2), radius, (255, 255, 255), -1)
+    return frame
+
+
+@lru_cache(maxsize=4)
+def _pan_canvas(scene: int, width: int, height: int) -> np.ndarray:
+    """平移镜头的画布：1.8倍画面宽的渐变加小色块"""
+    rng = np.random.default_rng(scene)
+    canvas_width = int(width * 1.8)
+    x = np.linspace(0, 1, canvas_width)
+    gradient = np.stack(
+        [x * 200 + 20, (1 - x) * 180 + 40, np.abs(np.sin(x * 6)) * 200 + 30], -1
+    )
+    canvas = np.repeat(gradient.astype(np.uint8)[None], height, axis=0)
+    for _ in range(2000):
+        cx, cy = int(rng.integers(0, canvas_width)), int(rng.integers(0, height))
+        size = rng.integers(4, 12, size=2)
+        color = rng.integers(0, 255, size=3).tolist()
+        cv2.rectangle(canvas, (cx, cy), (cx + size[0], cy + size[1]), color, -1)
+    return canvas
+
+
+def _pan_frame(scene: int, progress: float, width: int, height: int):
+    """平移镜头的一帧：按进度在画布上取景"""
+    canvas = _pan_canvas(scene, width, height)
+    offset = int(progress * (canvas.shape[1] - width))
+    return np.ascontiguousarray(canvas[:, offset : offset + width])
+
+
+def _write_frames(spec: SyntheticSpec, path: str) -> None:
+    writer = cv2.VideoWriter(
+        path, cv2.VideoWriter_fourcc(*"mp4v"), spec.fps, (spec.width, spec.height)
+    )
+    starts = spec.cut_frames + [spec.total_frames]
+    for scene in range(len(starts) - 1):
+        scene_frames = starts[scene + 1] - starts[scene]
+        for frame_num in range(starts[scene], starts[scene + 1]):
+            if spec.pan:
+                frame = _pan_frame(
+                    scene,
+                    (frame_num - starts[scene]) / scene_frames,
+                    spec.width,
+                    spec.height,
+                )
+            else:
+                frame = _scene_frame(
+                    scene, frame_num - starts[scene], spec.width, spec.height
+                )
+            # 淡入淡出：切点前fade_frames帧与下一分镜交叉混合
+            to_next = starts[scene + 1] - frame_num
+            if spec.fade_frames and scene < len(starts) - 2:
+                if to_next <= spec.fade_frames:
+                    alpha = 1 - to_next / (spec.fade_frames + 1)
+                    next_frame = _scene_frame(scene + 1, 0, spec.width, spec.height)
+                    frame = cv2.addWeighted(frame, 1 - alpha, next_frame, alpha, 0)
+            writer.write(frame)
+    writer.release()
+
+
+def synthesize_speech(duration: float, sample_rate: int = 16000, seed: int = 0):
+    """合成类语音音频：带基频起伏的谐波音节，音节间和词间有停顿"""
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(duration * sample_rate), dtype=np.float32)
+    t = 0.3
+    while t < duration - 0.5:
+        word_syllables = rng.integers(2, 6)
+        for _ in range(word_syllables):
+            length = rng.uniform(0.12, 0.25)
+            n = int(length * sample_rate)
+            start = int(t * sample_rate)
+            if start + n >= len(audio):
+                break
+            times = np.arange(n) / sample_rate
+            f0 = rng.uniform(110, 220) * (1 + 0.1 * np.sin(2 * np.pi * 3 * times))
+            phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+            syllable = sum(np.sin(k * phase) / k for k in range(1, 8))
+            envelope = np.sin(np.pi * np.arange(n) / n) ** 2
+            audio[start : start + n] += 0.3 * syllable * envelope
+            t += length + rng.uniform(0.02, 0.06)
+        t += rng.uniform(0.3, 0.8)
+    return audio
+
+
+def _write_wav(path: str, audio: np.ndarray, sample_rate: int) -> None:
+    pcm = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+
+
+def make_video(spec: SyntheticSpec, out_dir: str, sample_rate: int = 16000) -> str:
+    """生成合成视频，返回文件路径"""
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{spec.name}.mp4")
+    if os.path.exists(path):
+        return path
+
+    silent_path = os.path.join(out_dir, f"{spec.name}.video.mp4")
+    wav_path = os.path.join(out_dir, f"{spec.name}.wav")
+    _write_frames(spec, silent_path)
+    if spec.speech:
+        audio = synthesize_speech(spec.duration, sample_rate)
+    else:
+        audio = np.zeros(int(spec.duration * sample_rate), dtype=np.float32)
+    _write_wav(wav_path, audio, sample_rate)
+
+    if spec.codec == "h264":
+        video_codec = ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p"]
+        if spec.gop:
+            video_codec += ["-g", str(spec.gop)]
+    else:
+        video_codec = ["-c:v", "copy"]
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-y",
+            "-loglevel",
+            "error",
+            "-i",
+            silent_path,
+            "-i",
+            wav_path,
+            *video_codec,
+            "-c:a",
+            "aac",
+            "-shortest",
+            path,
+        ],
+        check=True,
+    )
+    os.remove(silent_path)
+    os.remove(wav_path)
+    return path
+
+
+def make_corpus(specs: List[SyntheticSpec], out_dir: str) -> dict:
+    """生成整套合成视频，返回{名称: 路径}"""
+    return {spec.name: make_video(spec, out_dir) for spec in specs}
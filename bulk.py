@@ -0,0 +1,357 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import time
+from dataclasses import dataclass
+
+from loguru import logger
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".webm", ".flv", ".avi", ".m4v")
+
+
+@dataclass(frozen=True)
+class BulkOptions:
+    """批量分析参数，按值传给各工作进程"""
+
+    api_key: str
+    base_url: str = "https://api.bltcy.ai/v1"
+    min_scene_duration_seconds: float = 3.0
+    max_duration_seconds: int = 300
+    max_concurrent: int = 8
+    detect_mode: str = "dense"
+    threads_per_worker: int = 1
+
+
+def list_videos(source: str) -> list:
+    """列出目录下（递归）的视频文件，或读取清单文件（每行一个路径，#开头为注释）
+
+    清单中的相对路径相对于清单文件所在目录。返回按路径排序的绝对路径。
+    """
+    if os.path.isdir(source):
+        paths = [
+            os.path.join(root, name)
+            for root, _, names in os.walk(source)
+            for name in names
+            if name.lower().endswith(VIDEO_EXTENSIONS)
+        ]
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, encoding="utf-8") as f:
+            paths = [
+                os.path.join(base, line.strip())
+                for line in f
+                if line.strip() and not line.startswith("#")
+            ]
+    return sorted({os.path.abspath(path) for path in paths})
+
+
+class Manifest:
+    """只追加的完成记录（JSONL），每行记录一个视频的处理结果
+
+    结果写入输出文件并落盘之后才追加记录，中断后续跑时跳过已完成的视频。
+    最后一行可能因中断而不完整，读取时忽略无法解析的行。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def load(self) -> dict:
+        """返回{视频路径: 最后一条记录}"""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["path"]] = record
+        return records
+
+    def append(self, records: list) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def is_done(record: dict, options: BulkOptions) -> bool:
+    """续跑时是否跳过该视频：成功的跳过，失败的重新分析
+
+    超出时长限制的视频记录了当时的限制，放宽--max-duration后重新分析。
+    """
+    if record["status"] == "ok":
+        return True
+    limit = record.get("max_duration_seconds")
+    return (
+        record["status"] == "skipped"
+        and limit is not None
+        and limit >= options.max_duration_seconds
+    )
+
+
+async def _analyse_one(path: str, options: BulkOptions) -> dict:
+    """分析单个视频（时长已检查），返回结果"""
+    from api_utils import convert_to_json_data
+    from video_analyser import analyse_video
+    from video_analyser.workspace import job_dir, new_job_id, remove_job_dir
+
+    job_id = new_job_id()
+    work_dir = job_dir(job_id)
+    csv_path = os.path.join(work_dir, "scenes.csv")
+    transcript_path = os.path.join(work_dir, "transcript.txt")
+    try:
+        result = await analyse_video(
+            path,
+            csv_path=csv_path,
+            transcript_path=transcript_path,
+            api_key=options.api_key,
+            base_url=options.base_url,
+            min_scene_duration_seconds=options.min_scene_duration_seconds,
+            max_duration_seconds=options.max_duration_seconds,
+            max_concurrent=options.max_concurrent,
+            debug=False,
+            work_dir=work_dir,
+            detect_mode=options.detect_mode,
+        )
+        # 时长已在调用前检查，未返回结果只可能是FFmpeg不可用
+        if result is None:
+            raise RuntimeError("FFmpeg不可用")
+        video_id = os.path.splitext(os.path.basename(path))[0]
+        return convert_to_json_data(
+            csv_path,
+            transcript_path,
+            video_id,
+            os.path.join(work_dir, "subtitle.srt"),
+        )
+    finally:
+        remove_job_dir(job_id)
+
+
+async def _run_worker(worker: int, tasks, options: BulkOptions, results):
+    from video_analyser import warmup
+    from video_analyser.resources import install_executor
+    from video_analyser.utils import probe_video
+
+    install_executor()
+    try:
+        await asyncio.to_thread(warmup)
+    except Exception as e:
+        logger.warning(f"工作进程{worker}未能加载识别模型：{e}")
+    # 所有视频在同一个事件循环中处理，识别器和线程池在视频之间复用
+    while True:
+        path = await asyncio.to_thread(tasks.get)
+        if path is None:
+            break
+        results.put(("start", worker, path))
+        start = time.perf_counter()
+        record = {"path": path, "worker": worker}
+        result = None
+        try:
+            duration = probe_video(path)["duration"]
+            record["audio_seconds"] = duration
+            if duration > options.max_duration_seconds:
+                record["status"] = "skipped"
+                record["max_duration_seconds"] = options.max_duration_seconds
+            else:
+                result = await _analyse_one(path, options)
+                record["status"] = "ok"
+        except Exception as e:
+            logger.error(f"分析失败：{path}：{e}")
+            record["status"], record["error"] = "failed", str(e)
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        results.put(("result", record, result))
+
+
+def _worker(worker: int, tasks, options: BulkOptions, results) -> None:
+    """工作进程入口：按预算配置线程后从任务队列领取视频，直到取到None"""
+    from video_analyser.resources import ThreadBudget, configure
+
+    configure(ThreadBudget(cores=options.threads_per_worker))
+    try:
+        asyncio.run(_run_worker(worker, tasks, options, results))
+    finally:
+        results.put(("done", worker, None))
+
+
+class _Writer:
+    """汇总各工作进程的结果，成批写入输出文件后追加完成记录"""
+
+    def __init__(self, output_path: str, manifest: Manifest, batch_size: int):
+        self.output = open(output_path, "a", encoding="utf-8")
+        self.manifest = manifest
+        self.batch_size = batch_size
+        self.lines, self.records = [], []
+        self.flushed_at = time.monotonic()
+
+    def add(self, record: dict, result: dict | None, flush_interval: float) -> None:
+        if result is not None:
+            self.lines.append(
+                json.dumps(
+                    {"path": record["path"], **result},
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                )
+            )
+        self.records.append(record)
+        if (
+            len(self.records) >= self.batch_size
+            or time.monotonic() - self.flushed_at >= flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        if self.lines:
+            self.output.write("\n".join(self.lines) + "\n")
+            self.output.flush()
+            os.fsync(self.output.fileno())
+        # 结果落盘后再记录完成，中断时最多重复分析最后一批
+        if self.records:
+            self.manifest.append(self.records)
+        self.lines, self.records = [], []
+        self.flushed_at = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+        self.output.close()
+        self.manifest.close()
+
+
+def run_bulk(
+    source: str,
+    output_path: str,
+    options: BulkOptions,
+    workers: int = 1,
+    manifest_path: str | None = None,
+    batch_size: int = 50,
+    flush_interval: float = 30.0,
+) -> dict:
+    """批量分析目录或清单中的视频，结果追加写入JSONL，返回吞吐统计
+
+    待分析的视频放入共享任务队列，workers个工作进程分析完一个再领取下一个，
+    每个进程只加载一次模型；某个进程异常退出时，其余视频由其他进程继续分析。
+    完成记录默认写在输出文件旁（output_path + ".manifest"），重新运行同一命令即可续跑。
+    """
+    manifest = Manifest(manifest_path or output_path + ".manifest")
+    done = {
+        path for path, record in manifest.load().items() if is_done(record, options)
+    }
+    paths = list_videos(source)
+    pending = [path for path in paths if path not in done]
+    logger.info(
+        f"共{len(paths)}个视频，已完成{len(paths) - len(pending)}个，"
+        f"待分析{len(pending)}个"
+    )
+    stats = {
+        "total": len(paths),
+        "resumed": len(paths) - len(pending),
+        "ok": 0,
+        "skipped": 0,
+        "failed": 0,
+        "audio_seconds": 0.0,
+        "busy_seconds": 0.0,
+    }
+    if not pending:
+        return stats
+
+    workers = max(1, min(workers, len(pending)))
+    context = multiprocessing.get_context("spawn")
+    tasks, results = context.Queue(), context.Queue()
+    for path in pending:
+        tasks.put(path)
+    for _ in range(workers):
+        tasks.put(None)
+    processes = [
+        context.Process(
+            target=_worker, args=(worker, tasks, options, results), daemon=True
+        )
+        for worker in range(workers)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+
+    writer = _Writer(output_path, manifest, batch_size)
+    running = set(range(workers))
+    # 各工作进程正在分析的视频，进程异常退出时记为失败
+    current = {}
+    try:
+        while running:
+            try:
+                kind, payload, result = results.get(timeout=1.0)
+            except queue.Empty:
+                # 工作进程异常退出时不会发送结束消息
+                for worker in list(running):
+                    if not processes[worker].is_alive():
+                        exitcode = processes[worker].exitcode
+                        logger.error(f"工作进程{worker}异常退出：exitcode={exitcode}")
+                        running.discard(worker)
+                        path = current.pop(worker, None)
+                        if path is not None:
+                            stats["failed"] += 1
+                            writer.add(
+                                {
+                                    "path": path,
+                                    "worker": worker,
+                                    "status": "failed",
+                                    "error": f"工作进程异常退出：exitcode={exitcode}",
+                                },
+                                None,
+                                flush_interval,
+                            )
+                if time.monotonic() - writer.flushed_at >= flush_interval:
+                    writer.flush()
+                continue
+            if kind == "start":
+                current[payload] = result
+                continue
+            if kind == "done":
+                running.discard(payload)
+                continue
+            current.pop(payload["worker"], None)
+            stats[payload["status"]] += 1
+            stats["busy_seconds"] += payload["seconds"]
+            if payload["status"] == "ok":
+                stats["audio_seconds"] += payload.get("audio_seconds") or 0.0
+            writer.add(payload, result, flush_interval)
+            finished = stats["ok"] + stats["skipped"] + stats["failed"]
+            logger.info(
+                f"[{finished}/{len(pending)}] {payload['status']} "
+                f"{payload['path']}（{payload['seconds']:.1f}秒）"
+            )
+    finally:
+        writer.close()
+        # 所有进程都已退出时队列中可能还有视频，不等待它们写入管道
+        tasks.cancel_join_thread()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    elapsed = time.perf_counter() - start
+    stats["workers"] = workers
+    stats["elapsed_seconds"] = round(elapsed, 3)
+    stats["videos_per_hour"] = round(stats["ok"] / elapsed * 3600, 1)
+    # 整体实时率：墙钟时间 / 成功分析的音频总时长
+    stats["audio_rtf"] = (
+        round(elapsed / stats["audio_seconds"], 4) if stats["audio_seconds"] else None
+    )
+    stats["audio_seconds"] = round(stats["audio_seconds"], 3)
+    stats["busy_seconds"] = round(stats["busy_seconds"], 3)
+    logger.info(
+        f"批量分析完成：成功{stats['ok']}个，跳过{stats['skipped']}个，"
+        f"失败{stats['failed']}个，用时{elapsed:.1f}秒，"
+        f"{stats['videos_per_hour']}个视频/小时，音频实时率{stats['audio_rtf']}"
+    )
+    return stats
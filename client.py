@@ -0,0 +1,334 @@
+"""视频分析服务的Python客户端
+
+提供同步（VideoAnalyserClient）和异步（AsyncVideoAnalyserClient）两个版本，
+复用keep-alive连接池，遇到429/503时按Retry-After或指数退避重试。
+
+用法:
+    with VideoAnalyserClient("http://localhost:8000", api_key=KEY) as client:
+        result = client.analyse(url)                 # 同步等待分析结果
+        job = client.submit(url)                     # 提交后台任务
+        result = client.wait(job["job_id"])          # 轮询任务直到完成
+        for item in client.batch(urls):              # 服务端流式返回每个URL的结果
+            print(item)
+        for item in client.analyse_many(urls, max_in_flight=4):
+            print(item)
+
+    async with AsyncVideoAnalyserClient("http://localhost:8000") as client:
+        async for item in client.analyse_many(urls):
+            print(item)
+
+测试时可直接连接进程内的FastAPI应用，不经过网络:
+    client = VideoAnalyserClient.from_app(app)
+"""
+
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import AsyncIterator, Iterator, List
+
+import httpx
+
+RETRY_STATUS = (429, 503)
+# 同步分析一个视频可能需要数分钟，读超时放宽
+DEFAULT_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+DEFAULT_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+DONE_STATUSES = ("succeeded", "failed")
+
+
+class ClientError(Exception):
+    """服务端返回错误；失败任务的job_id可用于重试时从检查点继续"""
+
+    def __init__(self, status_code: int, detail, job_id: str | None = None):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+        self.job_id = job_id
+
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is not None:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return min(2**attempt, 30) + random.uniform(0, 0.5)
+
+
+def _check(response: httpx.Response) -> dict:
+    if response.is_success:
+        return response.json()
+    try:
+        detail = response.json().get("detail")
+    except ValueError:
+        detail = response.text
+    raise ClientError(response.status_code, detail, response.headers.get("X-Job-Id"))
+
+
+def _job_result(job: dict) -> dict:
+    if job["status"] == "succeeded":
+        return job["result"]
+    raise ClientError(job.get("status_code", 500), job.get("error"), job["job_id"])
+
+
+class VideoAnalyserClient:
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        api_key: str | None = None,
+        timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+        limits: httpx.Limits = DEFAULT_LIMITS,
+        max_retries: int = 5,
+        http_client: httpx.Client | None = None,
+    ):
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self._client = http_client or httpx.Client(
+            base_url=base_url, timeout=timeout, limits=limits
+        )
+        self._app_context = None
+
+    @classmethod
+    def from_app(cls, app, **kwargs) -> "VideoAnalyserClient":
+        """连接进程内的FastAPI应用"""
+        from fastapi.testclient import TestClient
+
+        test_client = TestClient(app)
+        # 保持应用的事件循环运行，后台任务才能在请求之间继续执行
+        test_client.__enter__()
+        client = cls(http_client=test_client, **kwargs)
+        client._app_context = test_client
+        return client
+
+    def _payload(self, url: str, options: dict) -> dict:
+        if self.api_key is not None:
+            options.setdefault("api_key", self.api_key)
+        return {"url": url, **options}
+
+    def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            response = self._client.request(method, path, **kwargs)
+            if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                return response
+            time.sleep(_retry_delay(response, attempt))
+
+    def analyse(self, url: str, **options) -> dict:
+        """下载并分析视频，阻塞直到返回结果"""
+        return _check(
+            self._request(
+                "POST", "/download-and-analyse", json=self._payload(url, options)
+            )
+        )
+
+    def submit(self, url: str, **options) -> dict:
+        """提交后台任务，返回包含job_id和status的任务记录"""
+        return _check(self._request("POST", "/jobs", json=self._payload(url, options)))
+
+    def get_job(self, job_id: str) -> dict:
+        return _check(self._request("GET", f"/jobs/{job_id}"))
+
+    def wait(
+        self,
+        job_id: str,
+        poll_interval: float = 1.0,
+        max_poll_interval: float = 15.0,
+        timeout: float | None = None,
+    ) -> dict:
+        """轮询任务直到结束，返回分析结果；轮询间隔逐步增大"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get_job(job_id)
+            if job["status"] in DONE_STATUSES:
+                return _job_result(job)
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"任务{job_id}在{timeout}秒内未完成")
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 1.5, max_poll_interval)
+
+    def batch(self, urls: List[str], **options) -> Iterator[dict]:
+        """提交批量分析，按完成顺序逐个产出服务端流式返回的结果"""
+        if self.api_key is not None:
+            options.setdefault("api_key", self.api_key)
+        payload = {"urls": urls, **options}
+        for attempt in range(self.max_retries + 1):
+            with self._client.stream(
+                "POST", "/batch-download-and-analyse", json=payload
+            ) as response:
+                if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                    delay = _retry_delay(response, attempt)
+                else:
+                    if not response.is_success:
+                        response.read()
+                        _check(response)
+                    for line in response.iter_lines():
+                        if line:
+                            yield json.loads(line)
+                    return
+            time.sleep(delay)
+
+    def analyse_many(
+        self, urls: List[str], max_in_flight: int = 4, **options
+    ) -> Iterator[dict]:
+        """以后台任务方式分析多个URL，同时最多max_in_flight个，按完成顺序产出
+
+        产出格式与batch相同：{"index", "url", "result"}或{"index", "url", "error"}。
+        """
+
+        def run(url):
+            job = self.submit(url, **options)
+            return self.wait(job["job_id"])
+
+        with ThreadPoolExecutor(max_in_flight) as pool:
+            futures = {pool.submit(run, url): i for i, url in enumerate(urls)}
+            for future in as_completed(futures):
+                index = futures[future]
+                item = {"index": index, "url": urls[index]}
+                try:
+                    item["result"] = future.result()
+                except (ClientError, httpx.HTTPError, TimeoutError) as e:
+                    item["error"] = str(e)
+                yield item
+
+    def close(self) -> None:
+        if self._app_context is not None:
+            self._app_context.__exit__(None, None, None)
+        else:
+            self._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncVideoAnalyserClient:
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        api_key: str | None = None,
+        timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+        limits: httpx.Limits = DEFAULT_LIMITS,
+        max_retries: int = 5,
+        http_client: httpx.AsyncClient | None = None,
+    ):
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self._client = http_client or httpx.AsyncClient(
+            base_url=base_url, timeout=timeout, limits=limits
+        )
+
+    @classmethod
+    def from_app(cls, app, **kwargs) -> "AsyncVideoAnalyserClient":
+        """连接进程内的FastAPI应用（在调用方的事件循环中执行）"""
+        transport = httpx.ASGITransport(app=app)
+        http_client = httpx.AsyncClient(
+            transport=transport, base_url="http://testserver", timeout=DEFAULT_TIMEOUT
+        )
+        return cls(http_client=http_client, **kwargs)
+
+    def _payload(self, url: str, options: dict) -> dict:
+        if self.api_key is not None:
+            options.setdefault("api_key", self.api_key)
+        return {"url": url, **options}
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            response = await self._client.request(method, path, **kwargs)
+            if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                return response
+            await asyncio.sleep(_retry_delay(response, attempt))
+
+    async def analyse(self, url: str, **options) -> dict:
+        """下载并分析视频，等待返回结果"""
+        return _check(
+            await self._request(
+                "POST", "/download-and-analyse", json=self._payload(url, options)
+            )
+        )
+
+    async def submit(self, url: str, **options) -> dict:
+        """提交后台任务，返回包含job_id和status的任务记录"""
+        return _check(
+            await self._request("POST", "/jobs", json=self._payload(url, options))
+        )
+
+    async def get_job(self, job_id: str) -> dict:
+        return _check(await self._request("GET", f"/jobs/{job_id}"))
+
+    async def wait(
+        self,
+        job_id: str,
+        poll_interval: float = 1.0,
+        max_poll_interval: float = 15.0,
+        timeout: float | None = None,
+    ) -> dict:
+        """轮询任务直到结束，返回分析结果；轮询间隔逐步增大"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = await self.get_job(job_id)
+            if job["status"] in DONE_STATUSES:
+                return _job_result(job)
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"任务{job_id}在{timeout}秒内未完成")
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(poll_interval * 1.5, max_poll_interval)
+
+    async def batch(self, urls: List[str], **options) -> AsyncIterator[dict]:
+        """提交批量分析，按完成顺序逐个产出服务端流式返回的结果"""
+        if self.api_key is not None:
+            options.setdefault("api_key", self.api_key)
+        payload = {"urls": urls, **options}
+        for attempt in range(self.max_retries + 1):
+            async with self._client.stream(
+                "POST", "/batch-download-and-analyse", json=payload
+            ) as response:
+                if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                    delay = _retry_delay(response, attempt)
+                else:
+                    if not response.is_success:
+                        await response.aread()
+                        _check(response)
+                    async for line in response.aiter_lines():
+                        if line:
+                            yield json.loads(line)
+                    return
+            await asyncio.sleep(delay)
+
+    async def analyse_many(
+        self, urls: List[str], max_in_flight: int = 4, **options
+    ) -> AsyncIterator[dict]:
+        """以后台任务方式分析多个URL，同时最多max_in_flight个，按完成顺序产出
+
+        产出格式与batch相同：{"index", "url", "result"}或{"index", "url", "error"}。
+        """
+        semaphore = asyncio.Semaphore(max_in_flight)
+
+        async def run(index, url):
+            item = {"index": index, "url": url}
+            async with semaphore:
+                try:
+                    job = await self.submit(url, **options)
+                    item["result"] = await self.wait(job["job_id"])
+                except (ClientError, httpx.HTTPError, TimeoutError) as e:
+                    item["error"] = str(e)
+            return item
+
+        tasks = [asyncio.create_task(run(i, url)) for i, url in enumerate(urls)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
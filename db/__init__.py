@@ -29,10 +29,33 @@ db.insert_many(users)
 user = db.get_by_id(User, 1)
 all_users = db.get_all(User)
 
+# 游标分页与流式读取
+videos, next_cursor = db.get_page(Video, after_id=None, limit=100, platform="douyin")
+for video in db.iter_all(Video, batch_size=1000, start_time=datetime(2025, 1, 1)):
+    ...
+
 # 更新
 user.name = "John Smith"
 db.update(user)
 
 # 删除
 db.delete(user)
+
+# 后台批量写入（不阻塞请求），写入后更新全文索引
+index = SearchIndex("search.db")
+index.sync(db)
+writer = WriteBehindWriter(db, batch_size=100, flush_interval=1.0, on_flush=index.add_videos)
+writer.start()
+writer.submit(Video.from_result(result, platform="douyin"))
+writer.stop()
+
+# 全文搜索（中文按二元组匹配），命中结果带分镜或字幕的起止毫秒
+hits = index.search("护肤 nice", limit=20, platform="douyin")
+
+# 多节点任务队列：各节点领取任务并持有租约，执行期间续约，节点失联后任务重新排队
+queue = JobQueue(db, lease_seconds=60, max_attempts=3)
+queue.enqueue("job-1", "download_and_analyse", {"url": url})
+for job in queue.claim(owner="node-a", limit=2):
+    queue.heartbeat(job["job_id"], "node-a")
+    queue.complete(job["job_id"], "node-a", result_codec.encode(result))
 """
@@ -1,12 +1,26 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, select
 from sqlalchemy.orm import sessionmaker
 from contextlib import contextmanager
 
 
 class Database:
-    def __init__(self, connection_string):
-        self.engine = create_engine(connection_string)
-        self.Session = sessionmaker(bind=self.engine)
+    def __init__(
+        self,
+        connection_string,
+        pool_size=10,
+        max_overflow=20,
+        pool_recycle=3600,
+    ):
+        engine_options = {"pool_pre_ping": True}
+        if not connection_string.startswith("sqlite"):
+            # 连接池复用连接，避免每次请求重新建立连接
+            engine_options.update(
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_recycle=pool_recycle,
+            )
+        self.engine = create_engine(connection_string, **engine_options)
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
 
     def create_tables(self):
         """创建所有表"""
@@ -40,13 +54,57 @@ class Database:
     def get_by_id(self, model_class, id):
         """根据ID查询"""
         with self.session_scope() as session:
-            return session.query(model_class).get(id)
+            return session.get(model_class, id)
 
     def get_all(self, model_class):
         """获取所有记录"""
         with self.session_scope() as session:
             return session.query(model_class).all()
 
+    def get_page(self, model_class, after_id=None, limit=100, options=(), **filters):
+        """按主键游标分页查询，返回(记录列表, 下一页游标)"""
+        if limit < 1:
+            raise ValueError(f"分页大小必须大于0：{limit}")
+        stmt = self._filtered_select(model_class, filters).options(*options)
+        if after_id is not None:
+            stmt = stmt.where(model_class.id > after_id)
+        stmt = stmt.order_by(model_class.id).limit(limit)
+        with self.session_scope() as session:
+            rows = session.scalars(stmt).all()
+        next_cursor = rows[-1].id if rows and len(rows) == limit else None
+        return rows, next_cursor
+
+    def iter_all(self, model_class, batch_size=1000, options=(), **filters):
+        """使用服务端游标逐批流式读取记录，内存占用与总行数无关"""
+        stmt = (
+            self._filtered_select(model_class, filters)
+            .options(*options)
+            .order_by(model_class.id)
+            .execution_options(stream_results=True, yield_per=batch_size)
+        )
+        with self.session_scope() as session:
+            for row in session.scalars(stmt):
+                yield row
+
+    @staticmethod
+    def _filtered_select(model_class, filters):
+        """按平台、视频ID、创建时间范围和主键下限过滤，值为None的条件忽略"""
+        stmt = select(model_class)
+        for name, value in filters.items():
+            if value is None:
+                continue
+            if name == "start_time":
+                stmt = stmt.where(model_class.created_at >= value)
+            elif name == "end_time":
+                stmt = stmt.where(model_class.created_at < value)
+            elif name == "after_id":
+                stmt = stmt.where(model_class.id > value)
+            elif name in ("platform", "video_id"):
+                stmt = stmt.where(getattr(model_class, name) == value)
+            else:
+                raise ValueError(f"不支持的过滤条件：{name}")
+        return stmt
+
     def update(self, model_instance):
         """更新记录"""
         with self.session_scope() as session:
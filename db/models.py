@@ -1,4 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    Float,
+    Text,
+    ForeignKey,
+    Index,
+    LargeBinary,
+)
+from sqlalchemy.orm import relationship
 from datetime import datetime
 from .base import Base
 
@@ -11,3 +22,145 @@ class BaseModel(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+class Video(BaseModel):
+    """视频分析结果"""
+
+    __tablename__ = "va_videos"
+    __table_args__ = (
+        Index("ix_va_videos_platform_video_id", "platform", "video_id"),
+        Index("ix_va_videos_created_at", "created_at"),
+    )
+
+    platform = Column(String(32))
+    video_id = Column(String(64))
+    transcript = Column(Text)
+
+    scenes = relationship(
+        "Scene",
+        back_populates="video",
+        cascade="all, delete-orphan",
+        order_by="Scene.scene_index",
+    )
+    segments = relationship(
+        "Segment",
+        back_populates="video",
+        cascade="all, delete-orphan",
+        order_by="Segment.start",
+    )
+
+    @classmethod
+    def from_result(cls, result: dict, platform: str = None) -> "Video":
+        """由convert_to_json_data的结果构建模型"""
+        video = cls(
+            platform=platform,
+            video_id=result.get("video_id"),
+            transcript=result.get("transcript", ""),
+        )
+        start = 0.0
+        for index, scene in enumerate(result.get("scenes", []), start=1):
+            video.scenes.append(
+                Scene(
+                    scene_index=index,
+                    start=round(start, 2),
+                    duration=scene["duration"],
+                    text=scene["text"],
+                    description=scene["description"],
+                )
+            )
+            start += scene["duration"]
+        for segment in result.get("segments", []):
+            video.segments.append(
+                Segment(
+                    start=segment["start"],
+                    end=segment["end"],
+                    text=segment["text"],
+                )
+            )
+        return video
+
+    def to_dict(self) -> dict:
+        """还原为与接口返回一致的结构"""
+        return {
+            "id": self.id,
+            "platform": self.platform,
+            "video_id": self.video_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "scenes": [
+                {
+                    "scene_number": f"分镜 {scene.scene_index}",
+                    "duration": scene.duration,
+                    "text": scene.text,
+                    "description": scene.description,
+                }
+                for scene in self.scenes
+            ],
+            "segments": [
+                {"start": seg.start, "end": seg.end, "text": seg.text}
+                for seg in self.segments
+            ],
+            "transcript": self.transcript,
+        }
+
+
+class Scene(BaseModel):
+    """分镜"""
+
+    __tablename__ = "va_scenes"
+
+    video_pk = Column(
+        Integer, ForeignKey("va_videos.id", ondelete="CASCADE"), index=True
+    )
+    scene_index = Column(Integer)
+    start = Column(Float)
+    duration = Column(Float)
+    text = Column(Text)
+    description = Column(Text)
+
+    video = relationship("Video", back_populates="scenes")
+
+
+class Segment(BaseModel):
+    """字幕片段"""
+
+    __tablename__ = "va_segments"
+
+    video_pk = Column(
+        Integer, ForeignKey("va_videos.id", ondelete="CASCADE"), index=True
+    )
+    start = Column(Float)
+    end = Column(Float)
+    text = Column(Text)
+
+    video = relationship("Video", back_populates="segments")
+
+
+class QueuedJob(BaseModel):
+    """分布式任务队列中的任务，由db.queue.JobQueue读写
+
+    status为queued/running/succeeded/failed；running的任务由lease_owner持有到
+    lease_expires_at，持有者定期续约，租约过期的任务重新排队由其他节点领取。
+    """
+
+    __tablename__ = "va_jobs"
+    __table_args__ = (
+        Index("ix_va_jobs_status_available_at", "status", "available_at"),
+        Index("ix_va_jobs_status_lease_expires_at", "status", "lease_expires_at"),
+    )
+
+    job_id = Column(String(64), unique=True, nullable=False)
+    kind = Column(String(32), nullable=False)
+    payload = Column(Text)
+    status = Column(String(16), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    # 失败重试时推迟到该时间之后才能再次领取
+    available_at = Column(DateTime, default=datetime.now)
+    lease_owner = Column(String(64))
+    lease_expires_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    # 分析结果按result_codec编码存储
+    result = Column(LargeBinary)
+    error = Column(Text)
+    status_code = Column(Integer)
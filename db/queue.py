@@ -0,0 +1,270 @@
+import json
+from datetime import datetime, timedelta
+
+from loguru import logger
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .models import QueuedJob
+
+FINISHED_STATUSES = ("succeeded", "failed")
+# 支持SELECT ... FOR UPDATE SKIP LOCKED的数据库
+SKIP_LOCKED_DIALECTS = ("mysql", "mariadb", "postgresql")
+# 不支持SKIP LOCKED时多取一些候选，被其他节点抢先的跳过
+CLAIM_OVERSCAN = 4
+
+
+class JobQueue:
+    """基于数据库表的持久任务队列，多个节点共享同一张表分配任务
+
+    节点用claim领取任务并获得lease_seconds秒的租约，执行期间用heartbeat续约，
+    结束时用complete或fail提交结果。所有状态变更都以(job_id, 持有者, running)
+    为条件，租约已被收回的节点无法覆盖新持有者的结果。节点崩溃后租约过期，
+    requeue_expired（每次claim前执行）将任务重新排队，超过max_attempts次后
+    标记为失败。
+
+    MySQL 8/PostgreSQL上领取时用SELECT ... FOR UPDATE SKIP LOCKED，各节点
+    不会互相等待；SQLite等不支持的数据库用带条件的UPDATE逐个抢占（按影响行数
+    判断是否抢到），本地开发和测试可直接使用SQLite。租约时间取各节点的本地
+    时间，节点之间需要同步时钟。
+    """
+
+    def __init__(
+        self,
+        database,
+        lease_seconds: float = 60.0,
+        max_attempts: int = 3,
+        retry_delay: float = 10.0,
+        skip_locked: bool | None = None,
+    ):
+        self.database = database
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        if skip_locked is None:
+            skip_locked = database.engine.dialect.name in SKIP_LOCKED_DIALECTS
+        self.skip_locked = skip_locked
+
+    def enqueue(self, job_id: str, kind: str, payload: dict, max_attempts=None) -> dict:
+        """加入队列；同一job_id的任务未结束时返回已有记录，已结束时重新排队"""
+        values = {
+            "kind": kind,
+            "payload": json.dumps(payload, ensure_ascii=False),
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": max_attempts or self.max_attempts,
+            "available_at": datetime.now(),
+        }
+        try:
+            self.database.insert_one(QueuedJob(job_id=job_id, **values))
+        except IntegrityError:
+            with self.database.session_scope() as session:
+                session.execute(
+                    update(QueuedJob)
+                    .where(
+                        QueuedJob.job_id == job_id,
+                        QueuedJob.status.in_(FINISHED_STATUSES),
+                    )
+                    .values(
+                        **values,
+                        lease_owner=None,
+                        lease_expires_at=None,
+                        result=None,
+                        error=None,
+                        status_code=None,
+                    )
+                )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict | None:
+        with self.database.session_scope() as session:
+            job = session.scalars(
+                select(QueuedJob).where(QueuedJob.job_id == job_id)
+            ).first()
+            return _to_dict(job) if job is not None else None
+
+    def claim(self, owner: str, limit: int = 1) -> list:
+        """领取最多limit个可执行的任务，返回任务记录（attempts已加1）"""
+        self.requeue_expired()
+        now = datetime.now()
+        candidates = (
+            select(QueuedJob.id)
+            .where(QueuedJob.status == "queued", QueuedJob.available_at <= now)
+            .order_by(QueuedJob.id)
+        )
+        if self.skip_locked:
+            candidates = candidates.limit(limit).with_for_update(skip_locked=True)
+        else:
+            candidates = candidates.limit(limit * CLAIM_OVERSCAN)
+        with self.database.session_scope() as session:
+            claimed = []
+            for pk in session.scalars(candidates).all():
+                if len(claimed) >= limit:
+                    break
+                taken = session.execute(
+                    update(QueuedJob)
+                    .where(QueuedJob.id == pk, QueuedJob.status == "queued")
+                    .values(
+                        status="running",
+                        attempts=QueuedJob.attempts + 1,
+                        lease_owner=owner,
+                        lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                        heartbeat_at=now,
+                    )
+                )
+                if taken.rowcount == 1:
+                    claimed.append(pk)
+            if not claimed:
+                return []
+            jobs = session.scalars(
+                select(QueuedJob)
+                .where(QueuedJob.id.in_(claimed))
+                .order_by(QueuedJob.id)
+            ).all()
+            return [_to_dict(job) for job in jobs]
+
+    def heartbeat(self, job_id: str, owner: str) -> bool:
+        """续约，返回False表示租约已被收回（任务已重新排队或由其他节点持有）"""
+        now = datetime.now()
+        return self._update_owned(
+            job_id,
+            owner,
+            lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+            heartbeat_at=now,
+        )
+
+    def complete(self, job_id: str, owner: str, result: bytes | None) -> bool:
+        return self._update_owned(
+            job_id,
+            owner,
+            status="succeeded",
+            result=result,
+            error=None,
+            status_code=200,
+            lease_owner=None,
+            lease_expires_at=None,
+        )
+
+    def fail(
+        self,
+        job_id: str,
+        owner: str,
+        error: str,
+        status_code: int = 500,
+        retry: bool = True,
+    ) -> bool:
+        """提交失败；retry且未超过重试次数时按次数递增的延迟重新排队"""
+        with self.database.session_scope() as session:
+            job = session.scalars(
+                select(QueuedJob).where(
+                    QueuedJob.job_id == job_id,
+                    QueuedJob.lease_owner == owner,
+                    QueuedJob.status == "running",
+                )
+            ).first()
+            if job is None:
+                return False
+            values = {
+                "error": error,
+                "status_code": status_code,
+                "lease_owner": None,
+                "lease_expires_at": None,
+            }
+            if retry and job.attempts < job.max_attempts:
+                delay = self.retry_delay * 2 ** (job.attempts - 1)
+                values.update(
+                    status="queued",
+                    available_at=datetime.now() + timedelta(seconds=delay),
+                )
+            else:
+                values["status"] = "failed"
+            return self._update_owned(job_id, owner, session=session, **values)
+
+    def release(self, job_id: str, owner: str) -> bool:
+        """放弃租约（例如节点正常停止），任务立即重新排队且不计入重试次数"""
+        return self._update_owned(
+            job_id,
+            owner,
+            status="queued",
+            attempts=QueuedJob.attempts - 1,
+            available_at=datetime.now(),
+            lease_owner=None,
+            lease_expires_at=None,
+        )
+
+    def requeue_expired(self) -> int:
+        """租约过期的任务重新排队，已达重试次数的标记为失败，返回重新排队的数量"""
+        now = datetime.now()
+        expired = (QueuedJob.status == "running", QueuedJob.lease_expires_at < now)
+        cleared = {"lease_owner": None, "lease_expires_at": None}
+        with self.database.session_scope() as session:
+            failed = session.execute(
+                update(QueuedJob)
+                .where(*expired, QueuedJob.attempts >= QueuedJob.max_attempts)
+                .values(
+                    status="failed",
+                    error="执行节点多次失联，任务已放弃",
+                    status_code=500,
+                    **cleared,
+                )
+            ).rowcount
+            requeued = session.execute(
+                update(QueuedJob)
+                .where(*expired, QueuedJob.attempts < QueuedJob.max_attempts)
+                .values(status="queued", available_at=now, **cleared)
+            ).rowcount
+        if requeued or failed:
+            logger.warning(f"租约过期：重新排队{requeued}个任务，放弃{failed}个任务")
+        return requeued
+
+    def counts(self) -> dict:
+        """各状态的任务数"""
+        with self.database.session_scope() as session:
+            rows = session.execute(
+                select(QueuedJob.status, func.count()).group_by(QueuedJob.status)
+            ).all()
+        return dict(rows)
+
+    def prune(self, ttl_seconds: float) -> int:
+        """删除结束超过ttl_seconds秒的任务"""
+        deadline = datetime.now() - timedelta(seconds=ttl_seconds)
+        with self.database.session_scope() as session:
+            return session.execute(
+                delete(QueuedJob).where(
+                    QueuedJob.status.in_(FINISHED_STATUSES),
+                    QueuedJob.updated_at < deadline,
+                )
+            ).rowcount
+
+    def _update_owned(self, job_id: str, owner: str, session=None, **values) -> bool:
+        stmt = (
+            update(QueuedJob)
+            .where(
+                QueuedJob.job_id == job_id,
+                QueuedJob.lease_owner == owner,
+                QueuedJob.status == "running",
+            )
+            .values(**values)
+        )
+        if session is not None:
+            return session.execute(stmt).rowcount == 1
+        with self.database.session_scope() as session:
+            return session.execute(stmt).rowcount == 1
+
+
+def _to_dict(job: QueuedJob) -> dict:
+    return {
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "payload": json.loads(job.payload) if job.payload else {},
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "lease_owner": job.lease_owner,
+        "lease_expires_at": job.lease_expires_at,
+        "result": job.result,
+        "error": job.error,
+        "status_code": job.status_code,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
@@ -0,0 +1,262 @@
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from loguru import logger
+
+SEARCH_DB = os.getenv("VA_SEARCH_DB", "search.db")
+
+# 中日韩字符连续出现时按二元组切分，其他字母数字按单词切分
+_CJK = r"぀-ヿ㐀-䶿一-鿿가-힯豈-﫿"
+_TOKEN_RE = re.compile(rf"[{_CJK}]+|[^\W{_CJK}_]+")
+_CJK_RE = re.compile(rf"[{_CJK}]")
+
+
+def tokenize(text: str) -> list:
+    """切分中文（二元组）和英文数字（小写单词），建索引和查询使用同一规则"""
+    tokens = []
+    for run in _TOKEN_RE.findall(text or ""):
+        if not _CJK_RE.match(run):
+            tokens.append(run.lower())
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def cjk_chars(text: str) -> str:
+    """中日韩单字，单独建一列索引，使单字查询也能命中二元组中的字"""
+    return " ".join(_CJK_RE.findall(text or ""))
+
+
+def match_expression(query: str) -> str | None:
+    """将查询转为FTS5表达式：每个词的二元组组成短语（要求相邻），多个词取交集
+
+    单个汉字切分后仍是它本身，在单字列中命中；英文单词和二元组只出现在词列中。
+    """
+    phrases = []
+    for word in query.split():
+        tokens = tokenize(word)
+        if tokens:
+            phrases.append('"' + " ".join(tokens) + '"')
+    return " AND ".join(phrases) or None
+
+
+class SearchIndex:
+    """分镜文案、画面描述和字幕的全文索引（SQLite FTS5）
+
+    分析结果写入数据库后增量加入索引，每条记录对应一个分镜或字幕片段，
+    保存所在视频和起止时间，搜索结果可以直接定位到视频中的位置。
+    FTS5表只保存切分后的词（contentless），原文保存在docs表中：tokens列为
+    二元组和英文单词，chars列为中日韩单字。
+    """
+
+    def __init__(self, path: str = SEARCH_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS docs (
+                    id INTEGER PRIMARY KEY,
+                    video_pk INTEGER,
+                    platform TEXT,
+                    video_id TEXT,
+                    field TEXT,
+                    start_ms INTEGER,
+                    end_ms INTEGER,
+                    content TEXT
+                );
+                CREATE INDEX IF NOT EXISTS ix_docs_video_pk ON docs (video_pk);
+                """)
+            self._create_fts(conn)
+            self._create_indexed_videos(conn)
+
+    @staticmethod
+    def _create_fts(conn: sqlite3.Connection) -> None:
+        """创建FTS5表，早期版本的索引没有单字列时按docs表中的原文重建"""
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(docs_fts)")]
+        if columns == ["tokens", "chars"]:
+            return
+        if columns:
+            conn.execute("DROP TABLE docs_fts")
+        conn.execute(
+            "CREATE VIRTUAL TABLE docs_fts USING fts5("
+            "tokens, chars, content='', tokenize='unicode61')"
+        )
+        if columns:
+            rows = conn.execute("SELECT id, content FROM docs").fetchall()
+            conn.executemany(
+                "INSERT INTO docs_fts (rowid, tokens, chars) VALUES (?, ?, ?)",
+                [
+                    (doc_id, " ".join(tokenize(content)), cjk_chars(content))
+                    for doc_id, content in rows
+                ],
+            )
+            logger.info(f"全文索引已重建：{len(rows)}条记录")
+
+    @staticmethod
+    def _create_indexed_videos(conn: sqlite3.Connection) -> None:
+        """已索引的视频主键（包括没有文本的视频），早期版本的索引按docs表补齐"""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'indexed_videos'"
+        ).fetchone()
+        if exists:
+            return
+        conn.executescript("""
+            CREATE TABLE indexed_videos (video_pk INTEGER PRIMARY KEY);
+            INSERT INTO indexed_videos SELECT DISTINCT video_pk FROM docs;
+            """)
+
+    @contextmanager
+    def _connect(self):
+        """打开连接，退出时提交（异常时回滚）并关闭"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _documents(video) -> list:
+        """视频的分镜文案、画面描述和字幕片段，时间单位为毫秒"""
+        docs = []
+        for scene in video.scenes:
+            start = round(scene.start * 1000)
+            end = round((scene.start + scene.duration) * 1000)
+            docs.append(("text", start, end, scene.text))
+            docs.append(("description", start, end, scene.description))
+        for segment in video.segments:
+            docs.append(
+                (
+                    "transcript",
+                    round(segment.start * 1000),
+                    round(segment.end * 1000),
+                    segment.text,
+                )
+            )
+        return [doc for doc in docs if doc[3]]
+
+    def add_videos(self, videos: list) -> int:
+        """加入已写入数据库（已分配主键）的视频，已索引的视频跳过，返回新增记录数"""
+        added = 0
+        with self._lock, self._connect() as conn:
+            for video in videos:
+                if (
+                    video.id is None
+                    or conn.execute(
+                        "INSERT OR IGNORE INTO indexed_videos VALUES (?)", (video.id,)
+                    ).rowcount
+                    == 0
+                ):
+                    continue
+                for field, start_ms, end_ms, content in self._documents(video):
+                    cursor = conn.execute(
+                        "INSERT INTO docs (video_pk, platform, video_id, field, "
+                        "start_ms, end_ms, content) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            video.id,
+                            video.platform,
+                            video.video_id,
+                            field,
+                            start_ms,
+                            end_ms,
+                            content,
+                        ),
+                    )
+                    conn.execute(
+                        "INSERT INTO docs_fts (rowid, tokens, chars) VALUES (?, ?, ?)",
+                        (
+                            cursor.lastrowid,
+                            " ".join(tokenize(content)),
+                            cjk_chars(content),
+                        ),
+                    )
+                    added += 1
+        return added
+
+    def indexed_video_pks(self) -> set:
+        with self._connect() as conn:
+            return {pk for (pk,) in conn.execute("SELECT video_pk FROM indexed_videos")}
+
+    def sync(self, database, batch_size: int = 1000) -> int:
+        """补建索引：索引数据库中所有尚未索引的视频，返回新增记录数
+
+        按已索引的主键集合比较，而不是只取大于最大主键的视频，
+        之前写入后索引失败的视频（on_flush出错）也会补上。
+        """
+        from sqlalchemy import select
+        from sqlalchemy.orm import selectinload
+
+        from .models import Video
+
+        indexed = self.indexed_video_pks()
+        with database.session_scope() as session:
+            missing = [
+                pk
+                for pk in session.scalars(
+                    select(Video.id)
+                    .order_by(Video.id)
+                    .execution_options(stream_results=True, yield_per=batch_size)
+                )
+                if pk not in indexed
+            ]
+        added = 0
+        for i in range(0, len(missing), batch_size):
+            with database.session_scope() as session:
+                videos = session.scalars(
+                    select(Video)
+                    .where(Video.id.in_(missing[i : i + batch_size]))
+                    .options(selectinload(Video.scenes), selectinload(Video.segments))
+                ).all()
+            added += self.add_videos(videos)
+        if added:
+            logger.info(f"全文索引补建完成：新增{added}条记录")
+        return added
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        platform: str | None = None,
+        field: str | None = None,
+    ) -> list:
+        """按BM25相关度排序返回命中的分镜或字幕片段"""
+        expression = match_expression(query)
+        if expression is None:
+            return []
+        sql = (
+            "SELECT docs.video_pk, docs.platform, docs.video_id, docs.field, "
+            "docs.start_ms, docs.end_ms, docs.content, bm25(docs_fts) AS rank "
+            "FROM docs_fts JOIN docs ON docs.id = docs_fts.rowid "
+            "WHERE docs_fts MATCH ?"
+        )
+        params = [expression]
+        if platform is not None:
+            sql += " AND docs.platform = ?"
+            params.append(platform)
+        if field is not None:
+            sql += " AND docs.field = ?"
+            params.append(field)
+        sql += " ORDER BY rank LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [
+            {
+                "id": video_pk,
+                "platform": platform,
+                "video_id": video_id,
+                "field": field,
+                "start_ms": start_ms,
+                "end_ms": end_ms,
+                "content": content,
+                "score": round(-rank, 4),
+            }
+            for video_pk, platform, video_id, field, start_ms, end_ms, content, rank in rows
+        ]
@@ -0,0 +1,91 @@
+import queue
+import threading
+import time
+from loguru import logger
+
+
+class WriteBehindWriter:
+    """后台批量写入器
+
+    请求路径只把模型实例放入队列，后台线程按数量或时间攒批后调用
+    Database.insert_many，数据库写入不再阻塞事件循环。写入成功后以该批
+    记录（已分配主键）调用on_flush，例如更新全文索引。
+    """
+
+    def __init__(
+        self,
+        database,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_queue_size: int = 10000,
+        on_flush=None,
+    ):
+        self.database = database
+        self.on_flush = on_flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def pending(self) -> int:
+        """队列中等待写入的记录数"""
+        return self._queue.qsize()
+
+    def start(self):
+        """启动后台写入线程"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="db-write-behind", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """停止写入线程，并写入剩余记录"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, model_instance) -> bool:
+        """提交一条待写入记录，队列已满时丢弃并返回False"""
+        try:
+            self._queue.put_nowait(model_instance)
+            return True
+        except queue.Full:
+            logger.error("写入队列已满，丢弃记录")
+            return False
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+        self._flush(batch)
+
+    def _flush(self, batch: list):
+        if not batch:
+            return
+        try:
+            self.database.insert_many(batch)
+        except Exception as e:
+            logger.error(f"批量写入失败（{len(batch)}条）：{str(e)}")
+            return
+        if self.on_flush is not None:
+            try:
+                self.on_flush(batch)
+            except Exception as e:
+                logger.error(f"写入后处理失败（{len(batch)}条）：{str(e)}")
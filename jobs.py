@@ -0,0 +1,228 @@
+import asyncio
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable
+
+from loguru import logger
+from video_analyser import result_codec
+from video_analyser.cancellation import JobCancelled, run_cancellable
+from video_analyser.metrics import QUEUE_DEPTH
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+class JobRegistry:
+    """进程内任务登记表：提交的任务在后台执行，客户端按job_id轮询状态和结果
+
+    已结束的任务保留ttl_seconds秒后清除。服务重启后未完成的任务会丢失，
+    可用同一job_id重新提交，从工作目录中的检查点继续。任务带取消令牌执行，
+    超过timeout_seconds秒（0表示不限）或服务停止时各阶段尽快停止。
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, timeout_seconds: float = 0):
+        self.ttl_seconds = ttl_seconds
+        self.timeout_seconds = timeout_seconds
+        self._jobs = {}
+        self._tasks = {}
+        QUEUE_DEPTH.labels("registry").set_function(
+            lambda: sum(job["status"] in ACTIVE_STATUSES for job in self._jobs.values())
+        )
+
+    def submit(self, job_id: str, work: Awaitable) -> dict:
+        """登记并在后台执行任务；同一job_id的任务未结束时返回已有记录"""
+        self._prune()
+        job = self._jobs.get(job_id)
+        if job is not None and job["status"] in ACTIVE_STATUSES:
+            work.close()
+            return dict(job)
+        now = time.time()
+        self._jobs[job_id] = {
+            "job_id": job_id,
+            "status": "pending",
+            "created_at": now,
+            "updated_at": now,
+        }
+        self._tasks[job_id] = asyncio.create_task(self._run(job_id, work))
+        return dict(self._jobs[job_id])
+
+    def get(self, job_id: str) -> dict | None:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def _run(self, job_id: str, work: Awaitable) -> None:
+        job = self._jobs[job_id]
+        job.update(status="running", updated_at=time.time())
+        try:
+            job["result"] = await run_cancellable(work, self.timeout_seconds or None)
+            job["status"] = "succeeded"
+        except asyncio.CancelledError:
+            job.update(status="failed", error="任务已取消", status_code=503)
+            raise
+        except JobCancelled:
+            job.update(
+                status="failed",
+                error=f"任务超过{self.timeout_seconds:g}秒未完成，已取消",
+                status_code=504,
+            )
+            logger.error(f"后台任务{job_id}超时")
+        except Exception as e:
+            # HTTPException保留原状态码和说明，其他异常视为服务端错误
+            job.update(
+                status="failed",
+                error=getattr(e, "detail", str(e)),
+                status_code=getattr(e, "status_code", 500),
+            )
+            logger.error(f"后台任务{job_id}失败：{job['error']}")
+        finally:
+            job["updated_at"] = time.time()
+            self._tasks.pop(job_id, None)
+
+    def _prune(self) -> None:
+        deadline = time.time() - self.ttl_seconds
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job["status"] not in ACTIVE_STATUSES and job["updated_at"] < deadline
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def shutdown(self) -> None:
+        """取消所有未完成的任务"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class QueueWorker:
+    """从数据库任务队列（db.queue.JobQueue）领取任务在本进程执行
+
+    每个节点运行一个工作器，最多同时执行concurrency个任务。handlers按任务类型
+    给出执行函数handler(job_id, payload)，返回分析结果。执行期间每隔租约的
+    三分之一续约一次；续约失败说明任务已被收回，立即取消本地执行且不提交结果。
+    HTTPException的4xx错误视为请求本身不合法，不再重试。停止时未完成的任务
+    放弃租约，由其他节点立即接手。
+    """
+
+    def __init__(
+        self,
+        queue,
+        handlers: dict[str, Callable[[str, dict], Awaitable[dict]]],
+        concurrency: int = 1,
+        poll_interval: float = 1.0,
+        ttl_seconds: float = 86400,
+        owner: str | None = None,
+    ):
+        self.queue = queue
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.ttl_seconds = ttl_seconds
+        self.owner = (
+            owner or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        )[:64]
+        self._tasks = set()
+        self._poller = None
+        self._pruned_at = 0.0
+
+    @property
+    def running(self) -> int:
+        return len(self._tasks)
+
+    def start(self) -> None:
+        if self._poller is None:
+            self._poller = asyncio.create_task(self._poll())
+            logger.info(f"任务队列工作器已启动：{self.owner}，并发{self.concurrency}")
+
+    async def stop(self) -> None:
+        """停止领取任务，取消正在执行的任务并放弃其租约"""
+        tasks = [self._poller, *self._tasks] if self._poller else list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._poller = None
+
+    async def _poll(self) -> None:
+        while True:
+            jobs = []
+            free = self.concurrency - len(self._tasks)
+            if free > 0:
+                try:
+                    jobs = await asyncio.to_thread(self.queue.claim, self.owner, free)
+                except Exception as e:
+                    logger.error(f"领取任务失败：{str(e)}")
+            for job in jobs:
+                task = asyncio.create_task(self._execute(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            if time.monotonic() - self._pruned_at > 60:
+                self._pruned_at = time.monotonic()
+                try:
+                    await asyncio.to_thread(self.queue.prune, self.ttl_seconds)
+                except Exception as e:
+                    logger.error(f"清理已结束任务失败：{str(e)}")
+            if not jobs:
+                await asyncio.sleep(self.poll_interval)
+
+    async def _execute(self, job: dict) -> None:
+        job_id = job["job_id"]
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            await asyncio.to_thread(
+                self.queue.fail,
+                job_id,
+                self.owner,
+                f"不支持的任务类型：{job['kind']}",
+                400,
+                False,
+            )
+            return
+        logger.info(f"开始执行队列任务{job_id}（第{job['attempts']}次）")
+        work = asyncio.create_task(handler(job_id, job["payload"]))
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, work))
+        try:
+            result = await work
+        except asyncio.CancelledError:
+            if heartbeat.done() and not heartbeat.cancelled():
+                logger.warning(f"队列任务{job_id}的租约已被收回，停止执行")
+                return
+            await asyncio.to_thread(self.queue.release, job_id, self.owner)
+            raise
+        except Exception as e:
+            status_code = getattr(e, "status_code", 500)
+            error = getattr(e, "detail", str(e))
+            await asyncio.to_thread(
+                self.queue.fail,
+                job_id,
+                self.owner,
+                str(error),
+                status_code,
+                status_code >= 500,
+            )
+            logger.error(f"队列任务{job_id}失败：{error}")
+        else:
+            if not await asyncio.to_thread(
+                self.queue.complete, job_id, self.owner, result_codec.encode(result)
+            ):
+                logger.warning(f"队列任务{job_id}的租约已被收回，结果未提交")
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: str, work: asyncio.Task) -> None:
+        """定期续约，租约被收回时取消任务后返回"""
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                owned = await asyncio.to_thread(
+                    self.queue.heartbeat, job_id, self.owner
+                )
+            except Exception as e:
+                # 数据库暂时不可用时继续执行，租约到期前恢复即可
+                logger.error(f"队列任务{job_id}续约失败：{str(e)}")
+                continue
+            if not owned:
+                work.cancel()
+                return
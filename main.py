@@ -1,18 +1,17 @@
+import argparse
 import asyncio
 import json
 import os
 from dotenv import load_dotenv
 from api_utils import convert_to_json_data
-from video_analyser import analyse_video
-from spider import download_video
-
-load_dotenv()
-API_KEY = os.getenv("KEY")
 
 
 def download_and_analyse_video(
     url, csv_path, transcript_path, api_key, delete_temp=True
 ):
+    from spider import download_video
+    from video_analyser import analyse_video
+
     video_path, video_id = download_video(url)
     asyncio.run(
         analyse_video(
@@ -32,17 +31,85 @@ def download_and_analyse_video(
     return json_result
 
 
-if __name__ == "__main__":
+def analyse_single(video_path, csv_path, transcript_path, json_path, api_key):
+    from video_analyser import analyse_video
+    from video_analyser.resources import configure
+
+    configure()
     csv_path, transcript_path = asyncio.run(
         analyse_video(
-            video_path="test/test.mp4",
-            csv_path="results/test.csv",
-            transcript_path="results/test.txt",
-            api_key=API_KEY,
+            video_path=video_path,
+            csv_path=csv_path,
+            transcript_path=transcript_path,
+            api_key=api_key,
             debug=True,
         )
     )
     json_result = convert_to_json_data(csv_path, transcript_path)
     print(json_result)
-    with open("results/test.json", "w", encoding="utf-8") as f:
+    with open(json_path, "w", encoding="utf-8") as f:
         json.dump(json_result, f, ensure_ascii=False, indent=4)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="视频分析")
+    subparsers = parser.add_subparsers(dest="command")
+    bulk = subparsers.add_parser(
+        "bulk", help="批量分析本地视频目录或清单，可中断后续跑"
+    )
+    bulk.add_argument("source", help="视频目录（递归）或清单文件（每行一个路径）")
+    bulk.add_argument("-o", "--output", default="results/bulk.jsonl")
+    bulk.add_argument("--manifest", help="完成记录文件，默认为输出文件加.manifest后缀")
+    bulk.add_argument(
+        "--workers", type=int, default=None, help="工作进程数，默认按核数计算"
+    )
+    bulk.add_argument(
+        "--threads-per-worker", type=int, default=4, help="每个工作进程的线程预算"
+    )
+    bulk.add_argument("--batch-size", type=int, default=50, help="每批写入的结果数")
+    bulk.add_argument("--base-url", default="https://api.bltcy.ai/v1")
+    bulk.add_argument("--min-scene-duration", type=float, default=3.0)
+    bulk.add_argument("--max-duration", type=int, default=300)
+    bulk.add_argument("--max-concurrent", type=int, default=8)
+    bulk.add_argument("--detect-mode", choices=["dense", "keyframe"], default="dense")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    API_KEY = os.getenv("KEY")
+    args = parse_args()
+    if args.command == "bulk":
+        from bulk import BulkOptions, run_bulk
+        from video_analyser.resources import available_cores
+
+        threads = max(1, args.threads_per_worker)
+        workers = args.workers or max(1, available_cores() // threads)
+        output_dir = os.path.dirname(args.output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        stats = run_bulk(
+            args.source,
+            args.output,
+            BulkOptions(
+                api_key=API_KEY,
+                base_url=args.base_url,
+                min_scene_duration_seconds=args.min_scene_duration,
+                max_duration_seconds=args.max_duration,
+                max_concurrent=args.max_concurrent,
+                detect_mode=args.detect_mode,
+                threads_per_worker=threads,
+            ),
+            workers=workers,
+            manifest_path=args.manifest,
+            batch_size=args.batch_size,
+        )
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+    else:
+        analyse_single(
+            "test/test.mp4",
+            "results/test.csv",
+            "results/test.txt",
+            "results/test.json",
+            API_KEY,
+        )
@@ -0,0 +1,170 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, List
+
+from loguru import logger
+from api_utils import check_admission, convert_to_json_data
+from video_analyser import detect_scenes_stage, transcribe_stage, describe_stage
+from video_analyser.cancellation import CancelToken
+from video_analyser.metrics import QUEUE_DEPTH, stage_timer
+from video_analyser.transcriber import get_shared_recognizer
+from video_analyser.utils import check_ffmpeg, check_video_duration
+from video_analyser.workspace import new_job_id, job_dir, remove_job_dir
+
+
+@dataclass
+class StageLimits:
+    """各阶段的最大并发数"""
+
+    download: int = 4
+    detect: int = 2
+    asr: int = 2
+    describe: int = 4
+
+
+class BatchPipeline:
+    """多URL分阶段流水线：下载 -> 分镜检测 -> 语音识别 -> 画面描述
+
+    每个阶段有独立的并发上限，第N+1个视频下载时第N个视频可以在做语音识别，
+    第N-1个视频在等待画面描述。识别模型在整个批次内共享。
+    """
+
+    def __init__(
+        self,
+        resolve: Callable[[str], dict],
+        fetch: Callable[[str, str, dict], tuple],
+        api_key: str,
+        base_url: str = "https://api.bltcy.ai/v1",
+        min_scene_duration_seconds: float = 3.0,
+        max_duration_seconds: int = 300,
+        max_size_mb: float | None = None,
+        max_concurrent: int = 8,
+        limits: StageLimits | None = None,
+        detect_mode: str = "dense",
+        debug: bool = False,
+    ):
+        self.resolve = resolve
+        self.fetch = fetch
+        self.api_key = api_key
+        self.base_url = base_url
+        self.min_scene_duration_seconds = min_scene_duration_seconds
+        self.max_duration_seconds = max_duration_seconds
+        self.max_size_mb = max_size_mb
+        self.max_concurrent = max_concurrent
+        self.limits = limits or StageLimits()
+        self.detect_mode = detect_mode
+        self.debug = debug
+
+    async def run(self, urls: List[str]) -> AsyncIterator[dict]:
+        """按完成顺序逐个产出每个URL的结果或错误"""
+        if not check_ffmpeg():
+            raise RuntimeError("FFmpeg未安装，无法进行分析！")
+
+        semaphores = {
+            "download": asyncio.Semaphore(self.limits.download),
+            "detect": asyncio.Semaphore(self.limits.detect),
+            "asr": asyncio.Semaphore(self.limits.asr),
+            "describe": asyncio.Semaphore(self.limits.describe),
+        }
+        recognizer_task = asyncio.create_task(get_shared_recognizer(self.debug))
+        # 整个批次共用一个取消令牌，输出流提前关闭（客户端断开）时线程中的阶段也停止
+        token = CancelToken()
+        tasks = [
+            token.start(self._process(index, url, semaphores, recognizer_task))
+            for index, url in enumerate(urls)
+        ]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            if not all(task.done() for task in tasks):
+                token.cancel("client_disconnect")
+            for task in tasks + [recognizer_task]:
+                task.cancel()
+
+    @staticmethod
+    @asynccontextmanager
+    async def _stage(semaphores: dict, stage: str):
+        """占用阶段并发名额，等待期间计入该阶段的队列深度"""
+        QUEUE_DEPTH.labels(f"batch_{stage}").inc()
+        try:
+            await semaphores[stage].acquire()
+        finally:
+            QUEUE_DEPTH.labels(f"batch_{stage}").dec()
+        try:
+            yield
+        finally:
+            semaphores[stage].release()
+
+    async def _process(
+        self,
+        index: int,
+        url: str,
+        semaphores: dict,
+        recognizer_task: asyncio.Task,
+    ) -> dict:
+        job_id = new_job_id()
+        work_dir = job_dir(job_id)
+        csv_path = os.path.join(work_dir, "scenes.csv")
+        transcript_path = os.path.join(work_dir, "transcript.txt")
+        srt_path = os.path.join(work_dir, "subtitle.srt")
+        try:
+            async with self._stage(semaphores, "download"), stage_timer("download"):
+                # 先用平台元数据做准入检查，不符合条件的视频不下载
+                video_info = await asyncio.to_thread(self.resolve, url)
+                if video_info is None:
+                    raise ValueError("不支持的链接")
+                reason = check_admission(
+                    video_info, self.max_duration_seconds, self.max_size_mb
+                )
+                if reason is not None:
+                    raise ValueError(reason)
+                video_path, video_id = await asyncio.to_thread(
+                    self.fetch, url, os.path.join(work_dir, "video.mp4"), video_info
+                )
+
+            if not check_video_duration(video_path, self.max_duration_seconds):
+                raise ValueError(f"视频时长超过限制({self.max_duration_seconds}秒)")
+
+            async with self._stage(semaphores, "detect"):
+                frames = await asyncio.to_thread(
+                    detect_scenes_stage,
+                    video_path,
+                    csv_path,
+                    os.path.join(work_dir, "frames"),
+                    self.min_scene_duration_seconds,
+                    self.debug,
+                    None,
+                    self.detect_mode,
+                )
+
+            recognizer = await asyncio.shield(recognizer_task)
+            async with self._stage(semaphores, "asr"):
+                await asyncio.to_thread(
+                    transcribe_stage,
+                    recognizer,
+                    video_path,
+                    csv_path,
+                    transcript_path,
+                    srt_path,
+                )
+
+            async with self._stage(semaphores, "describe"):
+                await describe_stage(
+                    frames,
+                    csv_path,
+                    self.api_key,
+                    self.base_url,
+                    self.max_concurrent,
+                    self.debug,
+                )
+
+            result = convert_to_json_data(csv_path, transcript_path, video_id, srt_path)
+            return {"index": index, "url": url, "result": result}
+        except Exception as e:
+            logger.error(f"批量任务失败：{url}，{str(e)}")
+            return {"index": index, "url": url, "error": str(e)}
+        finally:
+            remove_job_dir(job_id)
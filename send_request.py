@@ -1,21 +1,19 @@
 import os
 
-import requests
 from dotenv import load_dotenv
+from client import VideoAnalyserClient
 
 load_dotenv()
 API_KEY = os.getenv("KEY")
+SERVER_URL = os.getenv("VA_SERVER_URL", "http://vanalyser.hgwl633.com:6688")
 
 
-def send_request(data):
-    url = "http://vanalyser.hgwl633.com:6688/download-and-analyse"
-    response = requests.post(url, json=data)
-    print(response)
-    result = response.json()
-    return result
+def send_request(url: str) -> dict:
+    with VideoAnalyserClient(SERVER_URL, api_key=API_KEY) as client:
+        job = client.submit(url)
+        return client.wait(job["job_id"])
 
 
 url = "8.94 V@l.pD 10/04 teb:/ ChatGPT实时视频通话功能实测 对事物的辨别能力惊人  https://v.douyin.com/iUmYDHqP/ 复制此链接，打开Dou音搜索，直接观看视频！"
-data = {"url": url, "api_key": API_KEY}
-result = send_request(data)
-print(result)  # 输出：{"result": "processed: test_data"}
+result = send_request(url)
+print(result)
@@ -1,3 +1,18 @@
-from .spider import download_video
+import importlib
 
-__all__ = ["download_video"]
+# 按需导入：requests在首次使用爬虫时才加载
+_LAZY_ATTRS = {
+    "download_video": ".spider",
+    "get_platform": ".spider",
+    "get_video_info": ".spider",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        module = importlib.import_module(_LAZY_ATTRS[name], __name__)
+        value = globals()[name] = getattr(module, name)
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from video_analyser.metrics import SPIDER_CACHE
+
+
+class TTLCache:
+    """线程安全的LRU缓存，条目超过ttl秒后失效
+
+    get_or_compute对同一个键只允许一个线程计算，热门链接同时被多个任务
+    解析时只请求一次平台接口，其余线程等待并复用结果。
+    """
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 10000):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """返回缓存值，缺失时调用compute()计算并缓存（结果为None时不缓存）"""
+        value = self.get(key)
+        if value is not None:
+            SPIDER_CACHE.labels(self.name, "hit").inc()
+            return value
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # 等待期间其他线程可能已经算好
+            value = self.get(key)
+            if value is not None:
+                SPIDER_CACHE.labels(self.name, "hit").inc()
+                return value
+            SPIDER_CACHE.labels(self.name, "miss").inc()
+            try:
+                value = compute()
+                if value is not None:
+                    self.set(key, value)
+            finally:
+                # 先写入缓存再移除键锁，之后到达的线程直接命中缓存，不会重复计算
+                with self._lock:
+                    self._key_locks.pop(key, None)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# 短链接跳转得到的视频ID不会变化，缓存较久；视频元数据中的播放地址会过期，缓存较短
+redirect_cache = TTLCache(
+    "redirect", float(os.getenv("VA_SPIDER_REDIRECT_TTL", "86400"))
+)
+info_cache = TTLCache("info", float(os.getenv("VA_SPIDER_INFO_TTL", "600")))
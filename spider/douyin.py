@@ -1,16 +1,29 @@
 import json
-import re
-import requests
-from .utils import extract_douyin_video_id, DOUYIN_MOBILE_HEADERS
+from .cache import info_cache
+from .utils import (
+    extract_douyin_video_id,
+    read_json_blob,
+    session,
+    video_meta,
+    DOUYIN_MOBILE_HEADERS,
+)
 
 
 def get_douyin_info(url):
     video_id = extract_douyin_video_id(url)
-    response = requests.get(
+    info = info_cache.get_or_compute(
+        ("douyin", video_id), lambda: fetch_douyin_info(video_id)
+    )
+    return dict(info)
+
+
+def fetch_douyin_info(video_id):
+    response = session.get(
         f"https://www.iesdouyin.com/share/video/{video_id}/",
         headers=DOUYIN_MOBILE_HEADERS,
+        stream=True,
     )
-    data = re.search(r"_ROUTER_DATA\s*=\s*(\{.*?});", response.text)[1]
+    data = read_json_blob(response, "_ROUTER_DATA", "douyin")
     json_data = json.loads(data)
     item_list = json_data["loaderData"]["video_(id)/page"]["videoInfoRes"]["item_list"][
         0
@@ -26,10 +39,18 @@ def get_douyin_info(url):
     video_url = item_list["video"]["play_addr"]["url_list"][0]
     # print(video_url)
     cover = item_list["video"]["cover"]["url_list"][0]
+    video = item_list["video"]
+    duration_ms = video.get("duration") or item_list.get("duration")
     return {
         "title": title,
         "cover": cover,
         "url": video_url,
         "type": "douyin",
         "id": video_id,
+        **video_meta(
+            duration=duration_ms / 1000 if duration_ms else None,
+            width=video.get("width"),
+            height=video.get("height"),
+            size=video["play_addr"].get("data_size"),
+        ),
     }
@@ -1,20 +1,31 @@
 import json
-import re
-import requests
+from .cache import info_cache
+from .utils import extract_url, read_json_blob, session, video_meta
 
 
 def get_kuaishou_info(url):
-    matches = re.findall(
-        r"(http|https)://([\w\d\-_]+[\.\w\d\-_]+)[:\d+]?([\/]?[\w\/\.]+)", url
+    # 视频ID要解析页面后才知道，按分享链接缓存
+    url = extract_url(url)
+    return dict(info_cache.get_or_compute(url, lambda: fetch_kuaishou_info(url)))
+
+
+def fetch_kuaishou_info(url):
+    response = session.get(
+        url, headers={"Referer": "https://v.kuaishou.com"}, stream=True
     )
-    url = matches[0][0]
-    response = requests.get(url, headers={"Referer": "https://v.kuaishou.com"})
-    video_data = json.loads(
-        response.text.split("window.pageData=")[1].split("</script>")[0]
-    )["video"]
+    video_data = json.loads(read_json_blob(response, "window.pageData=", "kuaishou"))[
+        "video"
+    ]
+    duration_ms = video_data.get("duration")
     return {
         "url": video_data["srcNoMark"],
         "cover": video_data["poster"],
         "title": video_data["caption"],
         "type": "kuaishou",
+        "id": video_data.get("id"),
+        **video_meta(
+            duration=duration_ms / 1000 if duration_ms else None,
+            width=video_data.get("width"),
+            height=video_data.get("height"),
+        ),
     }
@@ -1,13 +1,25 @@
 import re
-import requests
-from .utils import HEADERS
+from .cache import info_cache, redirect_cache
+from .utils import HEADERS, session, video_meta
+
+
+def resolve_pipix_item_id(url):
+    response = session.get(url, headers=HEADERS, stream=True)
+    # 只需要跳转后的地址，不读取页面内容
+    response.close()
+    return re.search(r"/item/(.*?)\?app_id", response.url)[1]
 
 
 def get_pipix_info(url):
-    response = requests.get(url, headers=HEADERS)
-    id_url = response.url
-    item_id = re.search(r"/item/(.*?)\?app_id", id_url)[1]
-    url_data = requests.get(
+    item_id = redirect_cache.get_or_compute(url, lambda: resolve_pipix_item_id(url))
+    info = info_cache.get_or_compute(
+        ("pipix", item_id), lambda: fetch_pipix_info(item_id)
+    )
+    return dict(info)
+
+
+def fetch_pipix_info(item_id):
+    url_data = session.get(
         f"http://h5.pipix.com/bds/webapi/item/detail/?item_id={item_id}"
     ).json()
     new_url = url_data["data"]["item"]["origin_video_download"]["url_list"][0]["url"]
@@ -15,4 +27,16 @@ def get_pipix_info(url):
     img = url_data["data"]["item"]["video"]["video_download"]["cover_image"][
         "url_list"
     ][0]["url"]
-    return {"url": new_url, "cover": img, "title": title, "type": "pipix"}
+    video = url_data["data"]["item"]["video"]
+    return {
+        "url": new_url,
+        "cover": img,
+        "title": title,
+        "type": "pipix",
+        "id": item_id,
+        **video_meta(
+            duration=video.get("duration"),
+            width=video.get("video_width"),
+            height=video.get("video_height"),
+        ),
+    }
@@ -2,6 +2,7 @@ import os
 import time
 import requests
 from loguru import logger
+from video_analyser.cancellation import check_cancelled, on_cancel
 from .utils import HEADERS
 from .douyin import get_douyin_info
 from .weishi import get_weishi_info
@@ -9,31 +10,55 @@ from .pipix import get_pipix_info
 from .kuaishou import get_kuaishou_info
 
 
-def get_video_info(url):
+def get_platform(url):
     if any(domain in url for domain in ["douyin", "aweme", "iesdouyin", "365yg"]):
-        return get_douyin_info(url)
+        return "douyin"
     elif "weishi" in url:
-        return get_weishi_info(url)
+        return "weishi"
     elif "pipix" in url:
-        return get_pipix_info(url)
+        return "pipix"
     elif any(domain in url for domain in ["chenzhongtech", "kuaishou"]):
+        return "kuaishou"
+    else:
+        return None
+
+
+def get_video_info(url):
+    platform = get_platform(url)
+    if platform == "douyin":
+        return get_douyin_info(url)
+    elif platform == "weishi":
+        return get_weishi_info(url)
+    elif platform == "pipix":
+        return get_pipix_info(url)
+    elif platform == "kuaishou":
         return get_kuaishou_info(url)
     else:
         return None
 
 
-def download_video(url, save_path=None):
+def download_video(url, save_path=None, video_info=None):
     start_time = time.time()
-    video_info = get_video_info(url)
+    if video_info is None:
+        video_info = get_video_info(url)
     video_url = video_info["url"]
-    video_id = video_info["id"]
+    video_id = video_info.get("id")
     response = requests.get(video_url, headers=HEADERS, stream=True)
 
     if save_path is None:
         save_path = os.path.join(os.getcwd(), f"{video_info['title']}.mp4")
-    with open(save_path, "wb") as f:
-        for chunk in response.iter_content(chunk_size=1024):
-            f.write(chunk)
+    # 任务取消时关闭连接，阻塞中的读取随即返回
+    with open(save_path, "wb") as f, on_cancel(response.close):
+        try:
+            for chunk in response.iter_content(chunk_size=1024):
+                check_cancelled()
+                f.write(chunk)
+        except Exception:
+            # 连接被关闭时读取抛出的异常按取消处理
+            check_cancelled()
+            raise
+    # 连接被关闭时读取也可能正常结束，文件不完整
+    check_cancelled()
 
     duration = time.time() - start_time
     size_mb = os.path.getsize(save_path) / 1024 / 1024
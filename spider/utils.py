@@ -1,5 +1,8 @@
+import codecs
 import re
 import requests
+from video_analyser.metrics import SPIDER_PAGE_BYTES
+from .cache import redirect_cache
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/55.0.2883.87 Safari/537.36"
@@ -10,18 +13,108 @@ DOUYIN_MOBILE_HEADERS = {
 }
 
 
+def video_meta(duration=None, width=None, height=None, size=None):
+    """统一各平台的视频元数据：时长（秒）、分辨率和文件大小（字节），缺失为None"""
+    return {
+        "duration": float(duration) if duration else None,
+        "width": int(width) if width else None,
+        "height": int(height) if height else None,
+        "size": int(size) if size else None,
+    }
+
+
+# 复用连接，同一平台的多次请求不再重复握手
+session = requests.Session()
+
+
 def get_redirected_url(url):
-    response = requests.get(
+    response = session.get(
         url,
         headers=HEADERS,
         allow_redirects=False,
     )
+    response.close()
     return response.headers.get("Location", url)
 
 
+def extract_url(text):
+    """从分享文案中提取链接"""
+    return re.search(r"https?://[^\s]+", text)[0]
+
+
 def extract_douyin_video_id(url):
     if url.isdigit():
         return url
-    video_url = re.search(r"https?://[^\s]+", url)[0]
-    redirected_url = get_redirected_url(video_url)
-    return re.search(r"\d+", redirected_url)[0]
+    video_url = extract_url(url)
+    return redirect_cache.get_or_compute(
+        video_url, lambda: re.search(r"\d+", get_redirected_url(video_url))[0]
+    )
+
+
+_JSON_TOKENS = re.compile(r'["\\{}]')
+
+
+def _json_end(text, start, state):
+    """从start开始扫描JSON对象，返回对象结束后的位置，未结束时返回None
+
+    state为[深度, 是否在字符串中, 上一块是否以转义符结尾]，跨数据块保留。
+    """
+    depth, in_string, escaped = state
+    i = start
+    if escaped:
+        i, escaped = i + 1, False
+    while (match := _JSON_TOKENS.search(text, i)) is not None:
+        char, i = match.group(), match.end()
+        if in_string:
+            if char == "\\":
+                if i == len(text):
+                    escaped = True
+                    break
+                i += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+    state[:] = [depth, in_string, escaped]
+    return None
+
+
+def read_json_blob(response, marker, platform, chunk_size=16384):
+    """流式读取页面中marker之后的JSON对象，对象完整后立即停止读取
+
+    分享页中的数据JSON通常位于页面前部，不必下载和搜索整个页面。
+    response需以stream=True请求；返回JSON文本，未找到时抛出ValueError。
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(
+        errors="replace"
+    )
+    text, found, scanned, bytes_read = "", False, 0, 0
+    state = [0, False, False]
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            bytes_read += len(chunk)
+            text += decoder.decode(chunk)
+            if not found:
+                position = text.find(marker)
+                if position < 0:
+                    # 只保留可能包含marker开头的尾部
+                    text = text[-len(marker) :]
+                    continue
+                brace = text.find("{", position + len(marker))
+                if brace < 0:
+                    continue
+                text, found = text[brace:], True
+            end = _json_end(text, scanned, state)
+            if end is not None:
+                return text[:end]
+            scanned = len(text)
+    finally:
+        response.close()
+        SPIDER_PAGE_BYTES.labels(platform).inc(bytes_read)
+    raise ValueError(f"页面中未找到{marker}")
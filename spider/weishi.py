@@ -1,11 +1,18 @@
 import re
-import requests
-from .utils import HEADERS
+from .cache import info_cache
+from .utils import HEADERS, session, video_meta
 
 
 def get_weishi_info(url):
     feed_id = re.search(r"feed/(.*?)/", url)[1]
-    response = requests.get(
+    info = info_cache.get_or_compute(
+        ("weishi", feed_id), lambda: fetch_weishi_info(feed_id)
+    )
+    return dict(info)
+
+
+def fetch_weishi_info(feed_id):
+    response = session.get(
         f"https://h5.weishi.qq.com/webapp/json/weishi/WSH5GetPlayPage?feedid={feed_id}",
         headers=HEADERS,
     )
@@ -13,4 +20,18 @@ def get_weishi_info(url):
     new_url = data["video_url"]
     cover = data["images"][0]["url"]
     title = data["feed_desc"] if data["feed_desc"] else "速来围观有趣的视频"
-    return {"url": new_url, "cover": cover, "title": title, "type": "weishi"}
+    video = data.get("video") or {}
+    duration_ms = video.get("duration")
+    return {
+        "url": new_url,
+        "cover": cover,
+        "title": title,
+        "type": "weishi",
+        "id": feed_id,
+        **video_meta(
+            duration=duration_ms / 1000 if duration_ms else None,
+            width=video.get("width"),
+            height=video.get("height"),
+            size=video.get("file_size"),
+        ),
+    }
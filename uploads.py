@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import os
+from dataclasses import dataclass
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+# 上传大小上限（MB），请求可以指定更小的限制
+UPLOAD_MAX_MB = float(os.getenv("VA_UPLOAD_MAX_MB", "500"))
+# 攒够该大小再写盘和计算哈希，减少线程切换
+WRITE_CHUNK_SIZE = 4 * 1024 * 1024
+# multipart边界和各部分头部的额外字节，Content-Length检查时留出余量
+MULTIPART_OVERHEAD = 64 * 1024
+UPLOAD_EXTENSIONS = (".mp4", ".mov", ".mkv", ".webm", ".flv", ".avi", ".m4v")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadError(ValueError):
+    pass
+
+
+@dataclass
+class Upload:
+    path: str
+    size: int
+    sha256: str
+    filename: str | None = None
+
+
+class _HashingWriter:
+    """边接收边写入文件并计算sha256，缓冲到WRITE_CHUNK_SIZE后在线程中写盘"""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.buffer = bytearray()
+        self.file = open(path, "wb")
+
+    def feed(self, data) -> None:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge()
+        self.buffer += data
+
+    def _write(self, data: bytes) -> None:
+        self.digest.update(data)
+        self.file.write(data)
+
+    async def flush(self, force: bool = False) -> None:
+        if self.buffer and (force or len(self.buffer) >= WRITE_CHUNK_SIZE):
+            data, self.buffer = bytes(self.buffer), bytearray()
+            await asyncio.to_thread(self._write, data)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class _FilePartParser:
+    """从multipart请求体中取出指定字段的文件内容，其他字段丢弃"""
+
+    def __init__(self, boundary: bytes, field: str, writer: _HashingWriter):
+        self.field = field
+        self.writer = writer
+        self.filename = None
+        self.found = False
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+        self._in_file = False
+        self.parser = MultipartParser(
+            boundary,
+            {
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field, self._header_value = b"", b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        # 只接收第一个同名文件字段
+        self._in_file = name == self.field and not self.found
+        if self._in_file:
+            self.found = True
+            filename = options.get(b"filename")
+            self.filename = filename.decode("utf-8", "replace") if filename else None
+
+    def _on_part_data(self, data, start, end):
+        if self._in_file:
+            self.writer.feed(data[start:end])
+
+    def _on_part_end(self):
+        self._in_file = False
+
+    def write(self, chunk: bytes) -> None:
+        self.parser.write(chunk)
+
+    def finalize(self) -> None:
+        self.parser.finalize()
+        if not self.found:
+            raise UploadError(f"请求中没有{self.field}字段")
+
+
+async def receive_upload(
+    request, work_dir: str, max_bytes: int, field: str = "file"
+) -> Upload:
+    """把请求体中的视频流式写入任务工作目录，同时计算sha256
+
+    支持multipart/form-data（取field字段的文件）和直接上传的请求体
+    （Content-Type为video/*或application/octet-stream）。Content-Length超过
+    限制时不读取请求体直接拒绝；分块传输时在累计超过限制的那一块拒绝。
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type"))
+    multipart = content_type == b"multipart/form-data"
+    if multipart and not params.get(b"boundary"):
+        raise UploadError("multipart请求缺少boundary")
+    length = request.headers.get("content-length")
+    if length is not None:
+        try:
+            length = int(length)
+        except ValueError:
+            raise UploadError("Content-Length不合法")
+        if length > max_bytes + (MULTIPART_OVERHEAD if multipart else 0):
+            raise UploadTooLarge()
+
+    # 文件名在multipart头部中，先写入临时文件，接收完成后再按扩展名改名
+    part_path = os.path.join(work_dir, "upload.part")
+    writer = _HashingWriter(part_path, max_bytes)
+    parser = None
+    try:
+        if multipart:
+            parser = _FilePartParser(params[b"boundary"], field, writer)
+        async for chunk in request.stream():
+            if parser is not None:
+                parser.write(chunk)
+            else:
+                writer.feed(chunk)
+            await writer.flush()
+        if parser is not None:
+            parser.finalize()
+        await writer.flush(force=True)
+    except MultipartParseError as e:
+        raise UploadError(f"multipart请求体不合法：{e}")
+    finally:
+        writer.close()
+    if writer.size == 0:
+        raise UploadError("上传的文件为空")
+    filename = parser.filename if parser is not None else None
+    path = upload_path(work_dir, filename)
+    os.replace(part_path, path)
+    return Upload(path, writer.size, writer.digest.hexdigest(), filename)
+
+
+def upload_path(work_dir: str, filename: str | None) -> str:
+    """上传视频在工作目录中的路径，保留常见视频扩展名"""
+    ext = os.path.splitext(filename or "")[1].lower()
+    return os.path.join(
+        work_dir, "video" + (ext if ext in UPLOAD_EXTENSIONS else ".mp4")
+    )
@@ -1,3 +1,22 @@
-from .video_analyser import analyse_video
+import importlib
 
-__all__ = ["analyse_video"]
+# 按需导入：cv2、sherpa_onnx、openai等重量级依赖在首次使用时才加载
+_LAZY_ATTRS = {
+    "analyse_video": ".video_analyser",
+    "detect_scenes_stage": ".video_analyser",
+    "transcribe_stage": ".video_analyser",
+    "describe_stage": ".video_analyser",
+    "resegment": ".scene_detector",
+    "warmup": ".warmup",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        module = importlib.import_module(_LAZY_ATTRS[name], __name__)
+        # 缓存到包上，同时覆盖导入子模块时设置的同名属性（如warmup）
+        value = globals()[name] = getattr(module, name)
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,153 @@
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Coroutine
+
+from loguru import logger
+
+from .metrics import CANCELLATIONS
+
+# 当前任务的取消令牌，asyncio.to_thread会把它带到线程池中的阶段
+current_token: contextvars.ContextVar["CancelToken | None"] = contextvars.ContextVar(
+    "va_cancel_token", default=None
+)
+
+
+class JobCancelled(Exception):
+    """任务已取消（客户端断开、超时或服务停止），reason为取消原因"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"任务已取消：{reason}")
+        self.reason = reason
+
+
+class CancelToken:
+    """协作式取消令牌
+
+    事件循环中的阶段由asyncio取消；线程中的阶段（分镜检测、语音识别、下载）
+    无法被asyncio中断，需要在循环中调用check_cancelled，阻塞在外部进程或网络
+    读取上的代码用on_cancel注册回调（结束进程、关闭连接）。
+    """
+
+    def __init__(self):
+        self.reason = None
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """取消并执行已注册的回调，只有第一次调用生效"""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        CANCELLATIONS.labels(reason).inc()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"取消回调执行失败：{str(e)}")
+        return True
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise JobCancelled(self.reason)
+
+    @contextmanager
+    def on_cancel(self, callback: Callable[[], None]):
+        """在with块内取消时调用callback；已取消时立即调用"""
+        with self._lock:
+            registered = not self._event.is_set()
+            if registered:
+                self._callbacks.append(callback)
+        if not registered:
+            callback()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+    def start(self, work: Coroutine) -> asyncio.Task:
+        """在持有该令牌的上下文中启动任务"""
+        context = contextvars.copy_context()
+        context.run(current_token.set, self)
+        return asyncio.create_task(work, context=context)
+
+
+def check_cancelled() -> None:
+    """当前任务已取消时抛出JobCancelled，不在可取消任务中时不做任何处理"""
+    token = current_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def is_cancelled() -> bool:
+    token = current_token.get()
+    return token is not None and token.cancelled
+
+
+def on_cancel(callback: Callable[[], None]):
+    """当前任务取消时调用callback，不在可取消任务中时不做任何处理"""
+    token = current_token.get()
+    if token is None:
+        return _noop()
+    return token.on_cancel(callback)
+
+
+@contextmanager
+def _noop():
+    yield
+
+
+async def run_cancellable(
+    work: Coroutine,
+    timeout: float | None = None,
+    is_disconnected: Callable[[], Awaitable[bool]] | None = None,
+    poll_interval: float = 1.0,
+):
+    """带取消令牌执行work，超时或客户端断开时取消并抛出JobCancelled
+
+    is_disconnected每隔poll_interval秒检查一次。调用方本身被取消（服务停止、
+    租约被收回）时同样取消令牌，使线程中的阶段尽快停止。
+    """
+    token = CancelToken()
+    task = token.start(work)
+    deadline = time.monotonic() + timeout if timeout else None
+    reason = "cancelled"
+    try:
+        while True:
+            wait = poll_interval if is_disconnected is not None else None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+                wait = remaining if wait is None else min(wait, remaining)
+            done, _ = await asyncio.wait({task}, timeout=wait)
+            if done:
+                return task.result()
+            if deadline is not None and time.monotonic() >= deadline:
+                reason = "timeout"
+                break
+            if is_disconnected is not None and await is_disconnected():
+                reason = "client_disconnect"
+                break
+    except asyncio.CancelledError:
+        await _cancel(token, task, reason)
+        raise
+    logger.warning(f"任务已取消：{reason}")
+    await _cancel(token, task, reason)
+    raise JobCancelled(reason)
+
+
+async def _cancel(token: CancelToken, task: asyncio.Task, reason: str) -> None:
+    token.cancel(reason)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
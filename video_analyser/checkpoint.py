@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+
+
+def fingerprint_file(path: str) -> dict:
+    """文件标识：路径、大小和修改时间，文件变化后检查点失效"""
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def file_digest(path: str) -> str:
+    """文件内容的sha1，用于按关键帧内容缓存描述"""
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def params_hash(params: dict) -> str:
+    data = json.dumps(params, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+class JobCheckpoint:
+    """任务工作目录中的阶段检查点
+
+    每个阶段的结果连同其参数的哈希保存在checkpoints/<stage>.json，
+    读取时参数不一致即视为失效。逐项结果（如每帧的描述）追加写入
+    checkpoints/<stage>.jsonl，中断后可从最后完成的一项继续。
+    """
+
+    def __init__(self, work_dir: str):
+        self.dir = os.path.join(work_dir, "checkpoints")
+        os.makedirs(self.dir, exist_ok=True)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def load(self, stage: str, params: dict) -> dict | None:
+        """返回阶段结果，没有检查点或参数已变化时返回None"""
+        try:
+            with open(self.path(f"{stage}.json"), encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("params_hash") != params_hash(params):
+            return None
+        return record["data"]
+
+    def save(self, stage: str, params: dict, data: dict) -> None:
+        # 先写临时文件再替换，中途崩溃不会留下不完整的检查点
+        path = self.path(f"{stage}.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {"params_hash": params_hash(params), "data": data},
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(f"{path}.tmp", path)
+
+    def load_items(self, stage: str, params: dict) -> dict:
+        """返回参数一致的逐项结果{key: value}"""
+        digest = params_hash(params)
+        items = {}
+        try:
+            with open(self.path(f"{stage}.jsonl"), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 最后一行可能在写入时中断
+                        continue
+                    if record.get("params_hash") == digest:
+                        items[record["key"]] = record["value"]
+        except OSError:
+            pass
+        return items
+
+    def append_item(self, stage: str, params: dict, key: str, value) -> None:
+        record = {"params_hash": params_hash(params), "key": key, "value": value}
+        with open(self.path(f"{stage}.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
@@ -0,0 +1,174 @@
+import json
+import math
+import os
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from loguru import logger
+
+# 估算耗时不超过期限的该比例，为估算误差留出余量
+SAFETY_FACTOR = 0.8
+# 分镜检测的降级步骤，按对结果影响从小到大排列
+DETECT_STEPS = (
+    ("analysis_width", 640),
+    ("stride", 2),
+    ("analysis_width", 320),
+    ("stride", 3),
+    ("analysis_width", 160),
+    ("stride", 5),
+)
+
+
+@dataclass(frozen=True)
+class CostModel:
+    """各阶段耗时的估算参数
+
+    解码和特征计算按每帧百万像素计（毫秒），语音识别按实时率计，
+    画面描述按单次请求耗时计。默认值在单核上测得，
+    可用 python -m benchmarks.deadline --calibrate 生成本机参数，
+    通过环境变量VA_COST_MODEL指定JSON文件路径。
+    """
+
+    grab_ms_per_mp: float = 1.2
+    retrieve_ms_per_mp: float = 1.3
+    features_ms_per_mp: float = 13.0
+    resize_ms_per_mp: float = 1.2
+    prescan_rtf: float = 0.01
+    asr_rtf: float = 0.05
+    vision_latency: float = 4.0
+    overhead_seconds: float = 1.0
+
+    @classmethod
+    def from_env(cls) -> "CostModel":
+        path = os.getenv("VA_COST_MODEL")
+        if not path or not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+    def detect_seconds(self, info: dict, stride: int, analysis_width: int | None):
+        frames = info["frame_count"]
+        width, height = info["width"] or 1280, info["height"] or 720
+        source_mp = width * height / 1e6
+        per_analysed = self.retrieve_ms_per_mp * source_mp
+        if analysis_width and width > analysis_width:
+            scale = analysis_width / width
+            per_analysed += self.resize_ms_per_mp * source_mp
+            per_analysed += self.features_ms_per_mp * source_mp * scale * scale
+        else:
+            per_analysed += self.features_ms_per_mp * source_mp
+        per_frame = self.grab_ms_per_mp * source_mp + per_analysed / stride
+        return frames * per_frame / 1000
+
+    def asr_seconds(self, info: dict, single_pass: bool) -> float:
+        passes = 1 if single_pass else 2
+        return info["duration"] * (self.prescan_rtf + self.asr_rtf * passes)
+
+
+@dataclass
+class DegradePlan:
+    """限时分析的降级方案，执行过程中记录实际采用的降级措施"""
+
+    deadline_seconds: float
+    started_at: float = field(default_factory=time.monotonic)
+    stride: int = 1
+    analysis_width: int | None = None
+    single_pass_asr: bool = False
+    estimated_seconds: float = 0.0
+    described_scenes: int | None = None
+    total_scenes: int | None = None
+    shortcuts: list = field(default_factory=list)
+    cost: CostModel = field(default_factory=CostModel, repr=False)
+
+    @property
+    def deadline_at(self) -> float:
+        return self.started_at + self.deadline_seconds
+
+    def remaining(self) -> float:
+        return self.deadline_at - time.monotonic()
+
+    def describe_limit(self, frames: int, max_concurrent: int) -> int:
+        """按剩余时间计算最多能描述的关键帧数"""
+        remaining = self.remaining() * SAFETY_FACTOR - self.cost.overhead_seconds
+        batches = max(0, math.floor(remaining / self.cost.vision_latency))
+        return min(frames, batches * max_concurrent)
+
+    def report(self) -> dict:
+        """降级报告：采用了哪些降级措施以及是否在期限内完成"""
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "deadline_seconds": round(self.deadline_seconds, 3),
+            "elapsed_seconds": round(elapsed, 3),
+            "met": elapsed <= self.deadline_seconds,
+            "estimated_seconds": round(self.estimated_seconds, 3),
+            "degraded": bool(self.shortcuts),
+            "shortcuts": list(self.shortcuts),
+            "detect_stride": self.stride,
+            "analysis_width": self.analysis_width,
+            "asr_passes": 1 if self.single_pass_asr else 2,
+            "described_scenes": self.described_scenes,
+            "total_scenes": self.total_scenes,
+        }
+
+
+def plan_for_deadline(
+    info: dict,
+    deadline_seconds: float,
+    cost: CostModel | None = None,
+) -> DegradePlan:
+    """按视频参数和耗时模型选择降级方案
+
+    语音识别与分镜检测、画面描述并发执行，分别估算两条路径：识别路径超出
+    预算时改为单遍识别；画面路径超出预算时依次加大检测步长、降低分析分辨率。
+    画面描述的数量在分镜检测完成后按剩余时间决定。
+    """
+    cost = cost or CostModel.from_env()
+    plan = DegradePlan(deadline_seconds, cost=cost)
+    budget = deadline_seconds * SAFETY_FACTOR - cost.overhead_seconds
+
+    if cost.asr_seconds(info, False) > budget:
+        plan.single_pass_asr = True
+        plan.shortcuts.append("single_pass_asr")
+
+    # 至少留出一轮画面描述的时间；期限连一轮描述都不够时只保证分镜检测
+    reserve = cost.vision_latency if budget > cost.vision_latency else 0.0
+
+    def visual_seconds():
+        return cost.detect_seconds(info, plan.stride, plan.analysis_width) + reserve
+
+    for name, value in DETECT_STEPS:
+        if visual_seconds() <= budget:
+            break
+        if name == "analysis_width" and (info.get("width") or 0) <= value:
+            # 原始画面不比该宽度大，缩小没有效果
+            continue
+        setattr(plan, name, value)
+        shortcut = f"detect_{name}"
+        if shortcut not in plan.shortcuts:
+            plan.shortcuts.append(shortcut)
+
+    plan.estimated_seconds = (
+        max(visual_seconds(), cost.asr_seconds(info, plan.single_pass_asr))
+        + cost.overhead_seconds
+    )
+    if plan.estimated_seconds > deadline_seconds:
+        logger.warning(
+            f"预计耗时{plan.estimated_seconds:.1f}秒，降级后仍可能超过期限"
+            f"{deadline_seconds}秒"
+        )
+    logger.info(
+        f"限时分析方案：期限{deadline_seconds}秒，预计{plan.estimated_seconds:.1f}秒，"
+        f"检测步长{plan.stride}，分析宽度{plan.analysis_width or '原始'}，"
+        f"{'单遍' if plan.single_pass_asr else '两遍'}识别"
+    )
+    return plan
+
+
+def select_evenly(count: int, limit: int) -> list:
+    """从count项中均匀选出limit项的序号"""
+    if limit >= count:
+        return list(range(count))
+    if limit <= 0:
+        return []
+    return sorted(set(np.linspace(0, count - 1, limit).round().astype(int).tolist()))
@@ -0,0 +1,298 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from loguru import logger
+from . import result_codec
+from .metrics import FINGERPRINT_LOOKUPS, stage_timer
+
+FINGERPRINT_DB = os.getenv("VA_FINGERPRINT_DB", "fingerprints.db")
+
+# 指纹向量：沿归一化时间取TIME_SAMPLES个采样点，每点取所在分镜的HIST_BINS级灰度直方图
+TIME_SAMPLES = 16
+HIST_BINS = 16
+VECTOR_SIZE = TIME_SAMPLES * HIST_BINS
+# SimHash位数与LSH分段：8段×8位，相关系数0.95左右的近重复视频命中概率约99%
+SIMHASH_BITS = 64
+LSH_BANDS = 8
+_PLANES = np.random.default_rng(20241001).standard_normal((SIMHASH_BITS, VECTOR_SIZE))
+
+# 判定为重复的阈值
+MIN_CORRELATION = 0.9
+MIN_CUT_SCORE = 0.8
+CUT_TOLERANCE_SECONDS = 0.5
+
+
+def compute_fingerprint(
+    video_path: str, mode: str = "dense", signal_dir: str | None = None
+) -> dict:
+    """计算视频指纹：分镜时长序列和按分镜采样的直方图时间轮廓
+
+    复用SceneDetector.calculate_features的灰度直方图。切点和直方图只取决于
+    画面内容，与编码时的关键帧间隔无关；关键帧模式只解码部分帧，同一视频的
+    两种模式的指纹也能互相命中。裁剪、加水印不改变切点位置，对直方图影响也较小。
+
+    指定signal_dir时保存差异信号，之后以同样的detect_mode分析该视频时
+    直接复用，不必再解码一遍。
+    """
+    from .scene_detector import SceneDetector
+    from .utils import probe_video
+
+    with stage_timer("fingerprint"), tempfile.TemporaryDirectory() as tmp:
+        detector = SceneDetector(video_path, debug=False)
+        cuts = detector.detect_scenes(
+            min_scene_duration=1.0,
+            csv_path=os.path.join(tmp, "scenes.csv"),
+            save_frames=False,
+            frames_dir=tmp,
+            signal_dir=signal_dir,
+            mode=mode,
+        )
+        detector.cap.release()
+
+    fps = detector.fps or 25.0
+    # 关键帧模式不解码最后一个关键帧窗口之后的帧，时长按视频总帧数计算
+    total = detector.total_frames
+    if total <= 0:
+        total = round(probe_video(video_path)["duration"] * fps)
+    hists = detector.features[:, :256].astype(np.float32)
+    hists = hists.reshape(len(hists), HIST_BINS, 256 // HIST_BINS).sum(axis=2)
+    decoded = np.flatnonzero(hists.any(axis=1))
+
+    bounds = [c for c in cuts if c < total] + [total]
+    scene_hists = []
+    for start, end in zip(bounds, bounds[1:]):
+        rows = decoded[(decoded >= start) & (decoded < end)]
+        hist = hists[rows].mean(axis=0) if len(rows) else np.zeros(HIST_BINS)
+        scene_hists.append(hist / (hist.sum() or 1))
+
+    # 每个时间采样点取所在分镜的直方图
+    sample_frames = (np.arange(TIME_SAMPLES) + 0.5) * total / TIME_SAMPLES
+    scene_index = np.searchsorted(bounds, sample_frames, side="right") - 1
+    vector = np.concatenate([scene_hists[i] for i in scene_index]).astype(np.float32)
+    return {
+        "duration": total / fps,
+        "durations": [
+            round((end - start) / fps, 3) for start, end in zip(bounds, bounds[1:])
+        ],
+        "vector": vector,
+    }
+
+
+def _centered(vector: np.ndarray) -> np.ndarray:
+    centered = vector - vector.mean()
+    norm = np.linalg.norm(centered)
+    return centered / norm if norm else centered
+
+
+def correlation(a: np.ndarray, b: np.ndarray) -> float:
+    """两个指纹向量的相关系数"""
+    return float(np.dot(_centered(a), _centered(b)))
+
+
+def cut_score(durations_a: list, durations_b: list) -> float:
+    """切点对齐程度（F1）：在容差范围内能互相对应的切点比例"""
+    cuts_a = np.cumsum(durations_a)[:-1]
+    cuts_b = np.cumsum(durations_b)[:-1]
+    if len(cuts_a) == 0 and len(cuts_b) == 0:
+        return 1.0
+    if len(cuts_a) == 0 or len(cuts_b) == 0:
+        return 0.0
+    distance = np.abs(cuts_a[:, None] - cuts_b[None, :])
+    precision = (distance.min(axis=1) <= CUT_TOLERANCE_SECONDS).mean()
+    recall = (distance.min(axis=0) <= CUT_TOLERANCE_SECONDS).mean()
+    return float(2 * precision * recall / (precision + recall or 1))
+
+
+def lsh_buckets(vector: np.ndarray) -> list:
+    """SimHash分段，返回每段的桶编号"""
+    bits = (_PLANES @ _centered(vector)) > 0
+    band_bits = SIMHASH_BITS // LSH_BANDS
+    weights = 1 << np.arange(band_bits)
+    return [
+        int(bits[i * band_bits : (i + 1) * band_bits] @ weights)
+        for i in range(LSH_BANDS)
+    ]
+
+
+class FingerprintIndex:
+    """视频指纹的磁盘索引（SQLite）
+
+    指纹按SimHash分段写入LSH桶，查找时只比较至少有一段同桶的候选，
+    再用时长、直方图相关系数和切点对齐程度确认。命中时返回保存的分析结果。
+    已知文件内容哈希（上传的视频）时另外记录，完全相同的文件不必解码即可命中。
+    """
+
+    def __init__(self, path: str = FINGERPRINT_DB):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    id INTEGER PRIMARY KEY,
+                    video_key TEXT,
+                    duration REAL,
+                    durations TEXT,
+                    vector BLOB,
+                    result BLOB,
+                    created_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS lsh (
+                    band INTEGER,
+                    bucket INTEGER,
+                    fingerprint_id INTEGER,
+                    PRIMARY KEY (band, bucket, fingerprint_id)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS content_hashes (
+                    sha256 TEXT PRIMARY KEY,
+                    fingerprint_id INTEGER
+                );
+                """)
+
+    @contextmanager
+    def _connect(self):
+        """打开连接，退出时提交（异常时回滚）并关闭"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add(
+        self,
+        fingerprint: dict,
+        result: dict,
+        video_key: str | None = None,
+        content_hash: str | None = None,
+    ) -> int:
+        """保存指纹和对应的分析结果，返回指纹ID"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO fingerprints "
+                "(video_key, duration, durations, vector, result, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    video_key,
+                    fingerprint["duration"],
+                    json.dumps(fingerprint["durations"]),
+                    fingerprint["vector"].astype(np.float32).tobytes(),
+                    result_codec.encode(result),
+                    time.time(),
+                ),
+            )
+            fingerprint_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT OR IGNORE INTO lsh VALUES (?, ?, ?)",
+                [
+                    (band, bucket, fingerprint_id)
+                    for band, bucket in enumerate(lsh_buckets(fingerprint["vector"]))
+                ],
+            )
+            if content_hash is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO content_hashes VALUES (?, ?)",
+                    (content_hash, fingerprint_id),
+                )
+        return fingerprint_id
+
+    def lookup_hash(self, content_hash: str) -> dict | None:
+        """按文件内容哈希查找完全相同的视频，返回格式与lookup相同"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT f.id, f.video_key, f.result FROM content_hashes h "
+                "JOIN fingerprints f ON f.id = h.fingerprint_id WHERE h.sha256 = ?",
+                (content_hash,),
+            ).fetchone()
+        if row is None:
+            return None
+        fingerprint_id, video_key, result = row
+        return {
+            "id": fingerprint_id,
+            "video_key": video_key,
+            "correlation": 1.0,
+            "cut_score": 1.0,
+            "result": _load_result(result),
+        }
+
+    def lookup(self, fingerprint: dict) -> dict | None:
+        """查找近重复视频，返回相似度最高的{id, video_key, correlation, cut_score, result}"""
+        buckets = lsh_buckets(fingerprint["vector"])
+        condition = " OR ".join(["(band = ? AND bucket = ?)"] * len(buckets))
+        params = [value for pair in enumerate(buckets) for value in pair]
+        duration = fingerprint["duration"]
+        tolerance = max(1.0, duration * 0.05)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, video_key, durations, vector, result FROM fingerprints "
+                f"WHERE id IN (SELECT fingerprint_id FROM lsh WHERE {condition}) "
+                "AND duration BETWEEN ? AND ?",
+                params + [duration - tolerance, duration + tolerance],
+            ).fetchall()
+
+        best = None
+        for fingerprint_id, video_key, durations, vector, result in rows:
+            corr = correlation(
+                fingerprint["vector"], np.frombuffer(vector, dtype=np.float32)
+            )
+            cuts = cut_score(fingerprint["durations"], json.loads(durations))
+            if corr < MIN_CORRELATION or cuts < MIN_CUT_SCORE:
+                continue
+            if best is None or corr + cuts > best["correlation"] + best["cut_score"]:
+                best = {
+                    "id": fingerprint_id,
+                    "video_key": video_key,
+                    "correlation": round(corr, 4),
+                    "cut_score": round(cuts, 4),
+                    "result": _load_result(result),
+                }
+        return best
+
+
+def _load_result(data) -> dict:
+    # 早期版本以JSON文本保存结果
+    if result_codec.is_encoded(data):
+        return result_codec.decode(data)
+    return json.loads(data)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_fingerprint_index() -> FingerprintIndex:
+    """进程内共享的指纹索引"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FingerprintIndex()
+        return _index
+
+
+def find_duplicate(fingerprint: dict) -> dict | None:
+    """在指纹索引中查找近重复视频，记录命中率"""
+    match = get_fingerprint_index().lookup(fingerprint)
+    FINGERPRINT_LOOKUPS.labels("hit" if match else "miss").inc()
+    if match is not None:
+        logger.info(
+            f"发现重复视频：{match['video_key']}（相关系数{match['correlation']}，"
+            f"切点对齐{match['cut_score']}），复用已有分析结果"
+        )
+    return match
+
+
+def reuse_result(match: dict, video_id: str | None) -> dict:
+    """将重复视频的分析结果改为当前视频，并注明来源"""
+    result = dict(match["result"])
+    result["video_id"] = video_id
+    result["duplicate_of"] = {
+        "video_key": match["video_key"],
+        "correlation": match["correlation"],
+        "cut_score": match["cut_score"],
+    }
+    return result
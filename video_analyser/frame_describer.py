@@ -1,15 +1,38 @@
 import asyncio
 import base64
-from typing import List
-import aiohttp
+import time
+from typing import Callable, List
 from loguru import logger
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError, InternalServerError, RateLimitError
+from .metrics import VISION_BYTES, VISION_LATENCY, VISION_REQUESTS, VISION_RETRIES
+from .vision_scheduler import estimate_tokens, get_executor, get_scheduler
+
+RETRYABLE_ERRORS = (APIConnectionError, InternalServerError, RateLimitError)
+
+
+def retry_after_seconds(error: RateLimitError) -> float | None:
+    """读取429响应的Retry-After头（秒）"""
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
 
 
 class FrameDescriber:
-    def __init__(self, api_key=None, base_url="https://api.bltcy.ai/v1", debug=False):
-        self.client = OpenAI(base_url=base_url, api_key=api_key)
+    def __init__(
+        self,
+        api_key=None,
+        base_url="https://api.bltcy.ai/v1",
+        debug=False,
+        max_retries=2,
+        use_scheduler=True,
+    ):
+        # 由describe_image自行重试，以便统计重试次数
+        self.client = OpenAI(base_url=base_url, api_key=api_key, max_retries=0)
         self.debug = debug
+        self.max_retries = max_retries
+        # 同一API密钥的请求经进程内全局调度器限速，每个实例作为一个任务公平排队
+        self.scheduler = get_scheduler(api_key, base_url) if use_scheduler else None
 
     async def describe_image(
         self,
@@ -21,47 +44,104 @@ class FrameDescriber:
     ):
         with open(image_path, "rb") as image_file:
             base64_image = base64.b64encode(image_file.read()).decode("utf-8")
-        response = await asyncio.get_event_loop().run_in_executor(
-            None,
-            lambda: self.client.chat.completions.create(
-                model=model,
-                messages=[
+        VISION_BYTES.inc(len(base64_image))
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt,
+                    },
                     {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt,
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}",
-                                    "detail": detail,
-                                },
-                            },
-                        ],
-                    }
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{base64_image}",
+                            "detail": detail,
+                        },
+                    },
                 ],
-                max_tokens=max_tokens,
-            ),
-        )
+            }
+        ]
+
+        tokens = estimate_tokens(prompt, max_tokens, detail)
+        for attempt in range(self.max_retries + 1):
+            lease = None
+            if self.scheduler is not None:
+                lease = await self.scheduler.acquire(self, tokens)
+            start = time.perf_counter()
+            try:
+                response = await asyncio.get_event_loop().run_in_executor(
+                    get_executor(),
+                    lambda: self.client.chat.completions.create(
+                        model=model, messages=messages, max_tokens=max_tokens
+                    ),
+                )
+                VISION_LATENCY.observe(time.perf_counter() - start)
+                VISION_REQUESTS.labels("ok").inc()
+                if lease is not None:
+                    usage = getattr(response, "usage", None)
+                    lease.release("ok", getattr(usage, "total_tokens", None))
+                break
+            except asyncio.CancelledError:
+                # 任务取消时请求已发出，线程中的请求无法中断，结果直接丢弃
+                VISION_REQUESTS.labels("cancelled").inc()
+                raise
+            except RETRYABLE_ERRORS as e:
+                rate_limited = isinstance(e, RateLimitError)
+                VISION_REQUESTS.labels(
+                    "rate_limited" if rate_limited else "error"
+                ).inc()
+                if lease is not None:
+                    if rate_limited:
+                        lease.release(
+                            "rate_limited", retry_after=retry_after_seconds(e)
+                        )
+                    else:
+                        lease.release("error")
+                if attempt == self.max_retries:
+                    raise
+                VISION_RETRIES.inc()
+                logger.warning(f"画面描述请求失败，第{attempt + 1}次重试：{str(e)}")
+                # 429由调度器统一暂停该密钥的请求，其他错误各自退避
+                if lease is None or not rate_limited:
+                    await asyncio.sleep(min(2**attempt, 8))
+            finally:
+                if lease is not None:
+                    lease.release("error")
 
         if self.debug:
             logger.debug(response.choices[0].message.content)
         return response.choices[0].message.content
 
     async def describe_images_concurrent(
-        self, frames: List[str], max_concurrent: int = 5
+        self,
+        frames: List[str],
+        max_concurrent: int = 5,
+        on_result: Callable[[int, str], None] | None = None,
     ) -> List[str]:
-        async with aiohttp.ClientSession():
-            # 将frames分成大小为max_concurrent的批次
-            results = []
-            for i in range(0, len(frames), max_concurrent):
-                batch = frames[i : i + max_concurrent]
-                # 为每个批次创建任务
-                tasks = [self.describe_image(frame) for frame in batch]
-                # 并发执行批次中的任务
-                batch_results = await asyncio.gather(*tasks)
-                results.extend(batch_results)
-            return results
+        """并发描述多帧，on_result在每帧完成时以(序号, 描述)调用
+
+        max_concurrent是本任务的并发上限，所有任务合计的并发和速率由全局调度器控制。
+        任一帧失败或调用方被取消时取消其余尚未完成的帧，不再占用调度名额。
+        """
+        semaphore = asyncio.Semaphore(max_concurrent)
+
+        async def describe(index, frame):
+            async with semaphore:
+                description = await self.describe_image(frame)
+            if on_result is not None:
+                on_result(index, description)
+            return description
+
+        tasks = [
+            asyncio.create_task(describe(index, frame))
+            for index, frame in enumerate(frames)
+        ]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
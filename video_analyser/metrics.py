@@ -0,0 +1,112 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+from .profiling import current_profiler
+
+STAGE_LATENCY = Histogram(
+    "va_stage_latency_seconds",
+    "各处理阶段耗时（秒）",
+    ["stage"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160, 320, 640),
+)
+FRAMES_DECODED = Counter("va_frames_decoded_total", "分镜检测解码的帧数")
+DECODE_FPS = Histogram(
+    "va_decode_frames_per_second",
+    "分镜检测解码速度（帧/秒）",
+    buckets=(25, 50, 100, 200, 400, 800, 1600, 3200),
+)
+AUDIO_RTF = Histogram(
+    "va_audio_real_time_factor",
+    "语音识别实时率（处理耗时/音频时长）",
+    ["stage"],
+    buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2),
+)
+SPEECH_RATIO = Histogram(
+    "va_speech_ratio",
+    "音频预扫描得到的语音时长占比",
+    buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.4, 0.6, 0.8, 1),
+)
+ASR_SKIPPED = Counter(
+    "va_asr_skipped_total", "预扫描后跳过语音识别的视频数", ["reason"]
+)
+ASR_SKIPPED_SECONDS = Counter(
+    "va_asr_skipped_audio_seconds_total", "预扫描后未做语音识别的音频时长（秒）"
+)
+VISION_LATENCY = Histogram(
+    "va_vision_request_latency_seconds",
+    "画面描述API单次请求耗时（秒）",
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64),
+)
+VISION_REQUESTS = Counter("va_vision_requests_total", "画面描述API请求数", ["status"])
+VISION_RETRIES = Counter("va_vision_retries_total", "画面描述API重试次数")
+VISION_BYTES = Counter("va_vision_request_bytes_total", "画面描述API上传的图片字节数")
+VISION_QUEUE_WAIT = Histogram(
+    "va_vision_queue_wait_seconds",
+    "画面描述请求在全局调度器中等待的时间（秒）",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32),
+)
+VISION_CONCURRENCY = Gauge(
+    "va_vision_concurrency_limit", "画面描述按API密钥的自适应并发上限", ["key"]
+)
+QUEUE_DEPTH = Gauge("va_queue_depth", "各队列中等待的任务数", ["queue"])
+MODEL_POOL_SIZE = Gauge("va_model_pool_size", "已加载的模型实例数", ["model"])
+MODEL_POOL_IN_USE = Gauge("va_model_pool_in_use", "正在使用的模型实例数", ["model"])
+UPLOADS = Counter(
+    "va_uploads_total", "上传的视频数（cached/queued/too_large/invalid）", ["result"]
+)
+UPLOAD_BYTES = Counter("va_upload_bytes_total", "接收的上传视频字节数")
+FINGERPRINT_LOOKUPS = Counter(
+    "va_fingerprint_lookups_total", "视频指纹查重次数", ["result"]
+)
+SPIDER_CACHE = Counter(
+    "va_spider_cache_total", "链接解析缓存命中情况", ["cache", "result"]
+)
+SPIDER_PAGE_BYTES = Counter(
+    "va_spider_page_bytes_total", "解析分享页读取的字节数", ["platform"]
+)
+CANCELLATIONS = Counter(
+    "va_cancellations_total",
+    "取消的任务数（client_disconnect/timeout/cancelled）",
+    ["reason"],
+)
+STAGE_CANCELLATIONS = Counter(
+    "va_stage_cancellations_total", "任务取消时被中断的阶段", ["stage"]
+)
+CRITICAL_PATH = Histogram(
+    "va_critical_path_stage_seconds",
+    "单个视频分析关键路径上各阶段的耗时（秒）",
+    ["stage"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160, 320, 640),
+)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """记录阶段耗时到va_stage_latency_seconds，任务开启剖析时同时记入剖析结果"""
+    profiler = current_profiler.get()
+    start = time.perf_counter()
+    try:
+        if profiler is None:
+            yield
+        else:
+            with profiler.stage(stage):
+                yield
+    except BaseException:
+        from .cancellation import is_cancelled
+
+        if is_cancelled():
+            STAGE_CANCELLATIONS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def model_in_use(model: str):
+    """统计模型实例的使用情况"""
+    MODEL_POOL_IN_USE.labels(model).inc()
+    try:
+        yield
+    finally:
+        MODEL_POOL_IN_USE.labels(model).dec()
@@ -0,0 +1,170 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .workspace import is_valid_job_id
+
+PROFILE_ROOT = os.getenv("VA_PROFILE_DIR", "profiles")
+ARTIFACTS = ("summary.json", "profile.pstats", "stacks.collapsed")
+
+# 当前任务的剖析器，未开启剖析时为None
+current_profiler: ContextVar["JobProfiler | None"] = ContextVar(
+    "va_job_profiler", default=None
+)
+
+# Python 3.12起cProfile基于sys.monitoring，同一时刻只能有一个实例启用，
+# 且统计整个进程的所有线程
+_cprofile_lock = threading.Lock()
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return 0.0
+
+
+def _collapse(frame) -> str:
+    """将调用栈转换为flamegraph折叠格式（外层在前，分号分隔）"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class JobProfiler:
+    """单个任务的性能剖析
+
+    - cProfile确定性剖析，导出pstats
+    - 定时采样执行阶段的线程调用栈，导出flamegraph折叠栈
+    - 分阶段统计墙钟时间、CPU时间和峰值内存
+
+    cProfile统计的是整个进程：剖析期间并发执行的其他任务（以及事件循环上的
+    其他请求）也会计入pstats，需要干净的数据时应在没有其他任务时剖析。
+    同时剖析多个任务时只有最先开始的任务启用cProfile，其余任务的摘要中
+    deterministic_profile为false。调用栈采样只覆盖执行本任务阶段的线程。
+    """
+
+    def __init__(self, job_id: str, sample_interval: float = 0.005):
+        self.job_id = job_id
+        self.output_dir = os.path.join(PROFILE_ROOT, job_id)
+        self.sample_interval = sample_interval
+        self.stages = {}
+        self._threads = Counter()
+        self._active_stages = Counter()
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._sampler = None
+        self._cprofile = None
+        self._peak_rss_mb = 0.0
+        # 阶段调度报告（各阶段起止时间和关键路径），由analyse_video填写
+        self.schedule = None
+
+    def start(self):
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        if _cprofile_lock.acquire(blocking=False):
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._sampler = threading.Thread(
+            target=self._sample, name=f"profiler-{self.job_id}", daemon=True
+        )
+        self._sampler.start()
+
+    def stop(self) -> dict:
+        """停止剖析并写出全部产物，返回摘要"""
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            _cprofile_lock.release()
+        self._stop_event.set()
+        self._sampler.join()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(os.path.join(self.output_dir, "profile.pstats"))
+        with open(os.path.join(self.output_dir, "stacks.collapsed"), "w") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        summary = {
+            "job_id": self.job_id,
+            "wall_seconds": round(time.perf_counter() - self._start_wall, 3),
+            "process_cpu_seconds": round(time.process_time() - self._start_cpu, 3),
+            "peak_rss_mb": round(self._peak_rss_mb, 1),
+            "deterministic_profile": self._cprofile is not None,
+            "samples": sum(self._stacks.values()),
+            "stages": self.stages,
+            "schedule": self.schedule,
+        }
+        with open(os.path.join(self.output_dir, "summary.json"), "w") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return summary
+
+    @contextmanager
+    def stage(self, name: str):
+        """统计一个阶段，并在阶段执行期间采样当前线程"""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] += 1
+            self._active_stages[name] += 1
+            stats = self.stages.setdefault(
+                name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_mb": 0.0}
+            )
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                stats["wall_seconds"] += round(time.perf_counter() - wall_start, 3)
+                stats["cpu_seconds"] += round(time.thread_time() - cpu_start, 3)
+                self._threads[ident] -= 1
+                self._active_stages[name] -= 1
+
+    def _sample(self):
+        while not self._stop_event.wait(self.sample_interval):
+            rss = _rss_mb()
+            frames = sys._current_frames()
+            with self._lock:
+                self._peak_rss_mb = max(self._peak_rss_mb, rss)
+                for name, count in self._active_stages.items():
+                    if count > 0:
+                        stats = self.stages[name]
+                        stats["peak_rss_mb"] = max(stats["peak_rss_mb"], round(rss, 1))
+                idents = [ident for ident, count in self._threads.items() if count]
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self._stacks[_collapse(frame)] += 1
+
+
+@contextmanager
+def profile_job(job_id: str):
+    """在该上下文内运行的任务（含其创建的子任务和线程）都会被剖析"""
+    profiler = JobProfiler(job_id)
+    token = current_profiler.set(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        current_profiler.reset(token)
+        profiler.stop()
+
+
+def artifact_path(job_id: str, artifact: str) -> str | None:
+    """返回剖析产物路径，不存在时返回None"""
+    if artifact not in ARTIFACTS or not is_valid_job_id(job_id):
+        return None
+    path = os.path.join(PROFILE_ROOT, job_id, artifact)
+    return path if os.path.exists(path) else None
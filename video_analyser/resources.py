@@ -0,0 +1,144 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from loguru import logger
+from .metrics import QUEUE_DEPTH
+
+# 未设置VA_MAX_JOBS时每个并发任务分到的核数（识别和OpenCV各一半）
+DEFAULT_CORES_PER_JOB = 4
+
+
+def available_cores() -> int:
+    """当前进程可用的CPU核数（考虑CPU亲和性）"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+@dataclass(frozen=True)
+class ThreadBudget:
+    """单机CPU线程预算：把cores个核分给jobs个并发任务
+
+    每个任务内分镜检测（OpenCV）和语音识别（ONNX Runtime）并发执行，
+    按asr_share划分该任务的核数。OpenCV线程数和识别器线程数是进程级设置，
+    每个任务使用相同的份额，总线程数不超过预算。
+    """
+
+    cores: int
+    jobs: int = 1
+    asr_share: float = 0.5
+    # 下载等阻塞I/O在线程池中等待网络，不占用CPU预算；
+    # 画面描述请求使用单独的线程池（vision_scheduler.get_executor）
+    io_workers: int = 16
+
+    @property
+    def threads_per_job(self) -> int:
+        return max(1, self.cores // self.jobs)
+
+    @property
+    def asr_threads(self) -> int:
+        return max(1, round(self.threads_per_job * self.asr_share))
+
+    @property
+    def opencv_threads(self) -> int:
+        return max(1, self.threads_per_job - self.asr_threads)
+
+    @property
+    def executor_workers(self) -> int:
+        # 每个任务最多同时有分镜检测、语音识别两个CPU阶段在线程池中执行
+        return self.jobs * 2 + self.io_workers
+
+    @classmethod
+    def from_env(cls) -> "ThreadBudget":
+        """从VA_CPU_BUDGET、VA_MAX_JOBS、VA_ASR_SHARE读取预算
+
+        默认使用全部核，并发任务数为核数除以DEFAULT_CORES_PER_JOB（至少1个），
+        可用benchmarks.autotune按实际负载测出更合适的值。
+        """
+        cores = int(os.getenv("VA_CPU_BUDGET") or available_cores())
+        return cls(
+            cores=cores,
+            jobs=int(
+                os.getenv("VA_MAX_JOBS") or max(1, cores // DEFAULT_CORES_PER_JOB)
+            ),
+            asr_share=float(os.getenv("VA_ASR_SHARE", "0.5")),
+        )
+
+
+_budget = None
+_job_slots = None
+# configure设置、尚未应用到cv2的OpenCV线程数
+_pending_opencv_threads = None
+
+
+def get_budget() -> ThreadBudget:
+    """返回当前生效的线程预算，未配置时从环境变量读取"""
+    global _budget
+    if _budget is None:
+        _budget = ThreadBudget.from_env()
+    return _budget
+
+
+def configure(budget: ThreadBudget | None = None) -> ThreadBudget:
+    """应用线程预算：设置OpenCV线程数和FFmpeg解码线程数
+
+    需在创建共享识别器之前调用，识别器按asr_threads创建。OpenCV线程数
+    在首次创建SceneDetector时才设置，启动时不导入cv2。
+    """
+    global _budget, _job_slots, _pending_opencv_threads
+    _budget = budget or ThreadBudget.from_env()
+    _job_slots = None
+    _pending_opencv_threads = _budget.opencv_threads
+    # FFmpeg解码线程数在打开VideoCapture时读取，用户已设置时不覆盖
+    os.environ.setdefault(
+        "OPENCV_FFMPEG_CAPTURE_OPTIONS", f"threads;{_budget.opencv_threads}"
+    )
+    logger.info(
+        f"线程预算：{_budget.cores}核，{_budget.jobs}个并发任务，"
+        f"识别{_budget.asr_threads}线程，OpenCV{_budget.opencv_threads}线程，"
+        f"线程池{_budget.executor_workers}线程"
+    )
+    return _budget
+
+
+def apply_opencv_threads() -> None:
+    """将configure设置的OpenCV线程数应用到cv2，未调用configure时不改变"""
+    global _pending_opencv_threads
+    threads = _pending_opencv_threads
+    if threads is None:
+        return
+    _pending_opencv_threads = None
+    import cv2
+
+    cv2.setNumThreads(threads)
+
+
+def install_executor(loop: asyncio.AbstractEventLoop | None = None) -> None:
+    """按预算设置事件循环的默认线程池（asyncio.to_thread和run_in_executor使用）"""
+    loop = loop or asyncio.get_running_loop()
+    loop.set_default_executor(
+        ThreadPoolExecutor(
+            max_workers=get_budget().executor_workers, thread_name_prefix="va-worker"
+        )
+    )
+
+
+@asynccontextmanager
+async def job_slot():
+    """限制同时分析的任务数不超过预算中的jobs，排队的任务计入va_queue_depth"""
+    global _job_slots
+    if _job_slots is None:
+        _job_slots = asyncio.Semaphore(get_budget().jobs)
+    QUEUE_DEPTH.labels("jobs").inc()
+    try:
+        await _job_slots.acquire()
+    finally:
+        QUEUE_DEPTH.labels("jobs").dec()
+    try:
+        yield
+    finally:
+        _job_slots.release()
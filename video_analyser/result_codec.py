@@ -0,0 +1,230 @@
+"""分析结果的紧凑二进制格式
+
+用于指纹缓存（fingerprint.py）和持久任务队列（jobs.py）中保存的结果。
+结果按部分（meta、scenes、segments、transcript）分别列式编码、独立压缩，
+读取方可以只解码需要的部分，例如只取分镜列表或只取全文。
+
+格式（版本1，整数均为小端）:
+    b"VAR" | 版本(u8) | 压缩方式(u8) | 保留(u32，恒为0) | 部分数(u8)
+    每部分: 部分ID(u8) | 偏移(u32) | 长度(u32)
+    各部分压缩后的数据
+
+scenes和segments中的数值列为float64数组，文本列为u32长度数组加UTF-8拼接；
+分镜编号为默认的"分镜 i"时不保存，全文与字幕片段拼接结果相同时只保存标记。
+各部分用zlib压缩。
+"""
+
+import json
+import struct
+import zlib
+
+MAGIC = b"VAR"
+VERSION = 1
+SECTIONS = ("meta", "scenes", "segments", "transcript")
+COMPRESSION_NONE, COMPRESSION_ZLIB = 0, 1
+
+_HEADER = struct.Struct("<3sBBIB")
+_ENTRY = struct.Struct("<BII")
+# 全文与字幕片段拼接相同（只保存标记）/保存原文
+_TRANSCRIPT_FROM_SEGMENTS, _TRANSCRIPT_LITERAL = 1, 0
+
+
+def is_encoded(data) -> bool:
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:3]) == MAGIC
+
+
+class _Writer:
+    def __init__(self):
+        self.parts = []
+
+    def u32(self, value: int):
+        self.parts.append(struct.pack("<I", value))
+
+    def floats(self, values: list):
+        self.parts.append(struct.pack(f"<{len(values)}d", *values))
+
+    def strings(self, values: list):
+        encoded = [(value or "").encode("utf-8") for value in values]
+        self.parts.append(struct.pack(f"<{len(encoded)}I", *map(len, encoded)))
+        self.parts.extend(encoded)
+
+    def getvalue(self) -> bytes:
+        return b"".join(self.parts)
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def u32(self) -> int:
+        (value,) = struct.unpack_from("<I", self.data, self.pos)
+        self.pos += 4
+        return value
+
+    def floats(self, count: int) -> list:
+        values = struct.unpack_from(f"<{count}d", self.data, self.pos)
+        self.pos += 8 * count
+        return list(values)
+
+    def strings(self, count: int) -> list:
+        lengths = struct.unpack_from(f"<{count}I", self.data, self.pos)
+        self.pos += 4 * count
+        values = []
+        for length in lengths:
+            values.append(str(self.data[self.pos : self.pos + length], "utf-8"))
+            self.pos += length
+        return values
+
+
+def _encode_scenes(scenes: list) -> bytes:
+    writer = _Writer()
+    numbers = [scene.get("scene_number") for scene in scenes]
+    default_numbers = numbers == [f"分镜 {i}" for i in range(1, len(scenes) + 1)]
+    writer.u32(len(scenes))
+    writer.u32(int(default_numbers))
+    writer.floats([scene["duration"] for scene in scenes])
+    writer.strings([scene.get("text") for scene in scenes])
+    writer.strings([scene.get("description") for scene in scenes])
+    if not default_numbers:
+        writer.strings(numbers)
+    return writer.getvalue()
+
+
+def _decode_scenes(data: bytes) -> list:
+    reader = _Reader(data)
+    count = reader.u32()
+    default_numbers = reader.u32()
+    durations = reader.floats(count)
+    texts = reader.strings(count)
+    descriptions = reader.strings(count)
+    if default_numbers:
+        numbers = [f"分镜 {i}" for i in range(1, count + 1)]
+    else:
+        numbers = reader.strings(count)
+    return [
+        {
+            "scene_number": number,
+            "duration": duration,
+            "text": text,
+            "description": description,
+        }
+        for number, duration, text, description in zip(
+            numbers, durations, texts, descriptions
+        )
+    ]
+
+
+def _encode_segments(segments: list) -> bytes:
+    writer = _Writer()
+    writer.u32(len(segments))
+    writer.floats([segment["start"] for segment in segments])
+    writer.floats([segment["end"] for segment in segments])
+    writer.strings([segment["text"] for segment in segments])
+    return writer.getvalue()
+
+
+def _decode_segments(data: bytes) -> list:
+    reader = _Reader(data)
+    count = reader.u32()
+    starts = reader.floats(count)
+    ends = reader.floats(count)
+    texts = reader.strings(count)
+    return [
+        {"start": start, "end": end, "text": text}
+        for start, end, text in zip(starts, ends, texts)
+    ]
+
+
+def _segments_text(segments: list) -> str:
+    return "".join(segment["text"] for segment in segments)
+
+
+def _compress(data: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compress(data, 9)
+    return data
+
+
+def _decompress(data: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(data)
+    return data
+
+
+def encode(result: dict, compression: int = COMPRESSION_ZLIB) -> bytes:
+    """将convert_to_json_data格式的结果编码为紧凑格式"""
+    meta = {
+        key: value
+        for key, value in result.items()
+        if key not in ("scenes", "segments", "transcript")
+    }
+    payloads = {
+        "meta": json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        ),
+        "scenes": _encode_scenes(result.get("scenes", [])),
+    }
+    segments = result.get("segments")
+    if segments is not None:
+        payloads["segments"] = _encode_segments(segments)
+    transcript = result.get("transcript")
+    if transcript is not None:
+        if segments and transcript == _segments_text(segments):
+            payloads["transcript"] = bytes([_TRANSCRIPT_FROM_SEGMENTS])
+        else:
+            payloads["transcript"] = bytes([_TRANSCRIPT_LITERAL]) + transcript.encode(
+                "utf-8"
+            )
+
+    blobs = [
+        (SECTIONS.index(name), _compress(data, compression))
+        for name, data in payloads.items()
+    ]
+    offset = _HEADER.size + _ENTRY.size * len(blobs)
+    header = [_HEADER.pack(MAGIC, VERSION, compression, 0, len(blobs))]
+    for section_id, blob in blobs:
+        header.append(_ENTRY.pack(section_id, offset, len(blob)))
+        offset += len(blob)
+    return b"".join(header + [blob for _, blob in blobs])
+
+
+def decode(data: bytes, sections=None) -> dict:
+    """解码紧凑格式，sections指定只解码其中几部分（默认全部）"""
+    magic, version, compression, _, count = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("不是分析结果的紧凑格式")
+    if version != VERSION:
+        raise ValueError(f"不支持的格式版本：{version}")
+    if compression not in (COMPRESSION_NONE, COMPRESSION_ZLIB):
+        raise ValueError(f"不支持的压缩方式：{compression}")
+
+    entries = {}
+    for i in range(count):
+        section_id, offset, length = _ENTRY.unpack_from(
+            data, _HEADER.size + _ENTRY.size * i
+        )
+        entries[SECTIONS[section_id]] = (offset, length)
+
+    def section(name):
+        offset, length = entries[name]
+        return _decompress(bytes(data[offset : offset + length]), compression)
+
+    wanted = SECTIONS if sections is None else sections
+    result = {}
+    if "meta" in wanted:
+        result.update(json.loads(section("meta")))
+    if "scenes" in wanted:
+        result["scenes"] = _decode_scenes(section("scenes"))
+    segments = None
+    if "segments" in entries and ("segments" in wanted or "transcript" in wanted):
+        segments = _decode_segments(section("segments"))
+        if "segments" in wanted:
+            result["segments"] = segments
+    if "transcript" in wanted and "transcript" in entries:
+        payload = section("transcript")
+        if payload[0] == _TRANSCRIPT_FROM_SEGMENTS:
+            result["transcript"] = _segments_text(segments)
+        else:
+            result["transcript"] = payload[1:].decode("utf-8")
+    return result
@@ -1,11 +1,24 @@
 from loguru import logger
 import cv2
 import csv
+import json
 from tqdm import tqdm
 import os
+import time
 from dataclasses import dataclass
 from typing import List
 import numpy as np
+from .cancellation import check_cancelled
+from .checkpoint import fingerprint_file
+from .metrics import FRAMES_DECODED, DECODE_FPS
+from .resources import apply_opencv_threads
+from .utils import probe_keyframes
+
+# 差异信号缓存：逐帧差异值、逐帧特征向量（灰度直方图+边缘直方图）和视频参数
+SIGNAL_FILES = ("diffs.npy", "features.npy", "meta.json")
+FEATURE_SIZE = 512
+# 每解码这么多帧检查一次任务是否已取消
+CANCEL_CHECK_FRAMES = 8
 
 
 @dataclass
@@ -14,12 +27,92 @@ class VideoFeatures:
     edge_hist: np.ndarray
 
 
+def segment_signal(
+    diffs: np.ndarray,
+    fps: float,
+    total_frames: int,
+    threshold: float = 2.0,
+    min_scene_duration: float = 1.0,
+    window_size: int = 5,
+) -> List[int]:
+    """根据逐帧差异信号计算分镜点（含第0帧和结束帧）
+
+    diffs[i]为第i帧与前一帧的特征差异，diffs[0]不使用。
+    """
+    min_frames = int(min_scene_duration * fps)
+    scene_changes = [0]
+    if len(diffs) > window_size:
+        # 滑动窗口平均：第f帧的窗口为diffs[f-window_size+1 : f+1]
+        cumsum = np.cumsum(diffs, dtype=np.float64)
+        avg_diff = (cumsum[window_size:] - cumsum[:-window_size]) / window_size
+        candidates = np.flatnonzero(avg_diff > threshold / 100.0) + window_size
+        for frame_num in candidates.tolist():
+            if frame_num - scene_changes[-1] >= min_frames:
+                scene_changes.append(frame_num)
+
+    if total_frames - scene_changes[-1] <= 3:
+        scene_changes.pop()
+    scene_changes.append(total_frames)
+    return SceneDetector._merge_close_scenes(scene_changes, int(fps * 0.5))
+
+
+def load_signal(signal_dir: str, mmap: bool = True) -> tuple:
+    """读取差异信号缓存，返回(diffs, features, meta)，默认以内存映射方式打开"""
+    mmap_mode = "r" if mmap else None
+    with open(os.path.join(signal_dir, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    frames = meta["frames_read"]
+    diffs = np.load(os.path.join(signal_dir, "diffs.npy"), mmap_mode=mmap_mode)
+    features = np.load(os.path.join(signal_dir, "features.npy"), mmap_mode=mmap_mode)
+    return diffs[:frames], features[:frames], meta
+
+
+def resegment(
+    signal_dir: str,
+    threshold: float = 2.0,
+    min_scene_duration: float = 1.0,
+    window_size: int = 5,
+    csv_path: str | None = None,
+) -> List[int]:
+    """用缓存的差异信号按新参数重新计算分镜，无需重新解码视频
+
+    返回分镜起始帧，指定csv_path时同时写入分镜CSV。
+    """
+    diffs, _, meta = load_signal(signal_dir)
+    scene_changes = segment_signal(
+        diffs,
+        meta["fps"],
+        meta["total_frames"],
+        threshold,
+        min_scene_duration,
+        window_size,
+    )
+    if csv_path is not None:
+        write_scene_csv(scene_changes, meta["fps"], csv_path)
+    return scene_changes[:-1]
+
+
+def write_scene_csv(scene_changes: List[int], fps: float, output_path: str) -> None:
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["分镜", "时长（秒）"])
+
+        for i in range(len(scene_changes) - 1):
+            duration = round((scene_changes[i + 1] - scene_changes[i]) / fps, 2)
+            writer.writerow([f"分镜 {i + 1}", duration, "", ""])
+
+
 class SceneDetector:
     def __init__(self, video_path: str, debug: bool = True):
+        apply_opencv_threads()
+        self.video_path = video_path
         self.cap = cv2.VideoCapture(video_path)
         self.fps = self.cap.get(cv2.CAP_PROP_FPS)
         self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
         self.saved_frames = []
+        self.frames_decoded = 0
+        # 检测后为逐帧特征（未解码的帧为0），供计算视频指纹使用
+        self.features = None
         self.debug = debug
 
     @staticmethod
@@ -50,49 +143,56 @@ class SceneDetector:
         csv_path: str = "scene_detection.csv",
         save_frames: bool = True,
         frames_dir: str = "scene_frames",
+        signal_dir: str | None = None,
+        mode: str = "dense",
+        keyframe_window: float = 0.5,
+        max_gop_seconds: float = 5.0,
+        stride: int = 1,
+        analysis_width: int | None = None,
     ) -> List[int]:
-        os.makedirs(frames_dir, exist_ok=True)
+        """检测分镜，返回分镜起始帧
 
-        min_frames = int(min_scene_duration * self.fps)
-        scene_changes = [0]
-        diff_buffer = []
-        prev_features = None
+        mode为"dense"时逐帧解码整个视频；为"keyframe"时先读取关键帧索引，
+        只解码每个关键帧之后keyframe_window秒，关键帧间隔超过max_gop_seconds
+        的片段仍逐帧解码。读取不到关键帧索引时退化为逐帧解码。
+
+        stride大于1时每stride帧计算一次特征（其余帧只解码不转换），
+        analysis_width指定时先将画面缩小到该宽度再计算特征，用于限时分析。
 
+        指定signal_dir时将逐帧差异信号和特征向量保存为可内存映射的.npy文件，
+        之后可用resegment按新参数重新计算分镜。signal_dir中已有同一视频、
+        同样检测参数的信号（例如查重时保存的）时直接复用，不再解码。
+        """
+        os.makedirs(frames_dir, exist_ok=True)
+        # 单帧差异达到该值的一半才可能在滑动窗口中形成切点，需要确认
+        confirm_diff = threshold / 100.0 * window_size / 2
+        params = {
+            "video": fingerprint_file(self.video_path),
+            "mode": mode,
+            "keyframe_window": keyframe_window,
+            "max_gop_seconds": max_gop_seconds,
+            "stride": stride,
+            "analysis_width": analysis_width,
+            "confirm_diff": confirm_diff,
+        }
+        cached = self._load_cached_signal(signal_dir, params)
+        if cached is not None:
+            diffs, self.features = cached
+            logger.info("复用已保存的差异信号，跳过解码")
+        else:
+            diffs = self._compute_signal(signal_dir, params)
+
+        scene_changes = segment_signal(
+            diffs,
+            self.fps,
+            self.total_frames,
+            threshold,
+            min_scene_duration,
+            window_size,
+        )
+        write_scene_csv(scene_changes, self.fps, csv_path)
         if save_frames:
-            self._save_frame(0, frames_dir)
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-
-        with tqdm(total=self.total_frames, desc="检测分镜") as pbar:
-            for frame_num in range(self.total_frames):
-                ret, frame = self.cap.read()
-                if not ret:
-                    break
-
-                curr_features = self.calculate_features(frame)
-                if prev_features:
-                    diff = self.compare_features(prev_features, curr_features)
-                    diff_buffer.append(diff)
-                    diff_buffer = diff_buffer[-window_size:]
-
-                    if len(diff_buffer) == window_size:
-                        avg_diff = sum(diff_buffer) / window_size
-                        if (
-                            avg_diff > threshold / 100.0
-                            and (frame_num - scene_changes[-1]) >= min_frames
-                        ):
-                            scene_changes.append(frame_num)
-                            if self.debug:
-                                logger.debug(
-                                    f"检测到分镜：第{frame_num}帧，差异值：{avg_diff:.4f}"
-                                )
-                            if save_frames:
-                                self._save_frame(frame_num, frames_dir)
-
-                prev_features = curr_features
-                pbar.update(1)
-
-        scene_changes = self._finalize_scenes(scene_changes)
-        self._write_csv(scene_changes, csv_path)
+            self.save_frames(scene_changes[:-1], frames_dir)
 
         if self.debug:
             logger.debug(f"分镜数：{len(scene_changes) - 1}")
@@ -100,19 +200,234 @@ class SceneDetector:
 
         return scene_changes[:-1]
 
+    def _compute_signal(self, signal_dir: str | None, params: dict) -> np.ndarray:
+        """按params解码视频计算逐帧差异信号，返回diffs，特征保存在self.features"""
+        mode = params["mode"]
+        diffs, features = self._allocate_signal(signal_dir)
+
+        runs = None
+        if mode == "keyframe":
+            runs = self._keyframe_runs(
+                params["keyframe_window"], params["max_gop_seconds"]
+            )
+            if runs is None:
+                logger.warning("无法读取关键帧索引，改为逐帧检测")
+        elif mode != "dense":
+            raise ValueError(f"不支持的分镜检测模式：{mode}")
+        if runs is None:
+            runs = [(0, self.total_frames)]
+
+        decode_start = time.perf_counter()
+        frames_read = self._decode_runs(
+            runs,
+            diffs,
+            features,
+            params["stride"],
+            params["analysis_width"],
+            params["confirm_diff"],
+        )
+        decode_seconds = time.perf_counter() - decode_start
+        FRAMES_DECODED.inc(self.frames_decoded)
+        if decode_seconds > 0:
+            DECODE_FPS.observe(self.frames_decoded / decode_seconds)
+        if self.debug:
+            logger.debug(f"解码帧数：{self.frames_decoded}/{self.total_frames}")
+
+        self.features = features[:frames_read]
+        if signal_dir is not None:
+            self._save_signal(signal_dir, diffs, features, frames_read, params)
+        return diffs[:frames_read]
+
+    def _keyframe_runs(self, window_seconds: float, max_gop_seconds: float):
+        """根据关键帧索引生成需要解码的帧区间[start, stop)
+
+        区间从关键帧开始，区间之间的帧不解码。关键帧与上一个已解码帧相隔较远，
+        二者差异明显时由_decode_runs再解码关键帧的前一帧确认是否为切点。
+        """
+        times = probe_keyframes(self.video_path)
+        if not times or not self.fps or self.total_frames <= 0:
+            return None
+        last = self.total_frames - 1
+        keyframes = sorted({0} | {min(int(round(t * self.fps)), last) for t in times})
+        window = max(int(window_seconds * self.fps), 1)
+        max_gop = int(max_gop_seconds * self.fps)
+
+        runs = []
+        for keyframe, next_keyframe in zip(
+            keyframes, keyframes[1:] + [self.total_frames]
+        ):
+            if next_keyframe - keyframe > max_gop:
+                stop = next_keyframe
+            else:
+                stop = min(keyframe + window, next_keyframe)
+            if runs and runs[-1][1] == keyframe:
+                runs[-1] = (runs[-1][0], stop)
+            else:
+                runs.append((keyframe, stop))
+        return runs
+
+    def _decode_runs(
+        self,
+        runs: list,
+        diffs,
+        features,
+        stride: int = 1,
+        analysis_width: int | None = None,
+        confirm_diff: float = 0.0,
+    ) -> int:
+        """解码各区间并写入差异信号和特征，返回信号覆盖的帧数
+
+        差异值总是相邻两帧（或相隔stride帧）之间的差异。区间之间有未解码的帧时，
+        区间首帧与上一个已解码帧相隔可能长达一个GOP，运动画面的差异会被误判为
+        切点：差异不小于confirm_diff时解码首帧的前一帧重新比较，否则记为0。
+        """
+        prev_features = None
+        position = 0
+        with tqdm(
+            total=sum(stop - start for start, stop in runs), desc="检测分镜"
+        ) as pbar:
+            for start, stop in runs:
+                gap_features = None
+                if start != position:
+                    gap_features, prev_features = prev_features, None
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+                for frame_num in range(start, stop):
+                    if (frame_num - start) % CANCEL_CHECK_FRAMES == 0:
+                        check_cancelled()
+                    if (frame_num - start) % stride:
+                        # 跳过的帧只解码，不做颜色转换和特征计算
+                        if not self.cap.grab():
+                            return position
+                        self.frames_decoded += 1
+                        position = frame_num + 1
+                        pbar.update(1)
+                        continue
+                    ret, frame = self.cap.read()
+                    if not ret:
+                        return position
+                    self.frames_decoded += 1
+
+                    curr_features = self._frame_features(frame, analysis_width)
+                    features[frame_num, :256] = curr_features.hist.ravel()
+                    features[frame_num, 256:] = curr_features.edge_hist.ravel()
+                    if prev_features:
+                        diffs[frame_num] = self.compare_features(
+                            prev_features, curr_features
+                        )
+                    elif gap_features is not None and frame_num == start:
+                        diffs[frame_num] = self._confirm_cut(
+                            start,
+                            position,
+                            gap_features,
+                            curr_features,
+                            analysis_width,
+                            confirm_diff,
+                        )
+
+                    prev_features = curr_features
+                    position = frame_num + 1
+                    pbar.update(1)
+        return position
+
+    def _frame_features(
+        self, frame: np.ndarray, analysis_width: int | None
+    ) -> VideoFeatures:
+        if analysis_width and frame.shape[1] > analysis_width:
+            height = round(frame.shape[0] * analysis_width / frame.shape[1])
+            frame = cv2.resize(
+                frame, (analysis_width, height), interpolation=cv2.INTER_AREA
+            )
+        return self.calculate_features(frame)
+
+    def _confirm_cut(
+        self,
+        start: int,
+        position: int,
+        gap_features: VideoFeatures,
+        start_features: VideoFeatures,
+        analysis_width: int | None,
+        confirm_diff: float,
+    ) -> float:
+        """区间首帧start的差异值：与间隔前的帧差异明显时改为与前一帧比较
+
+        解码前一帧需要从上一个关键帧解码起，之后重新读取start帧，
+        使读取位置回到start之后。
+        """
+        diff = self.compare_features(gap_features, start_features)
+        if diff < confirm_diff:
+            return 0.0
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, start - 1)
+        ret, frame = self.cap.read()
+        if not ret or not self.cap.grab():
+            # 无法解码前一帧时保守地保留间隔两侧的差异
+            return diff
+        # 至少解码了间隔中的帧
+        self.frames_decoded += start - position + 1
+        before = self._frame_features(frame, analysis_width)
+        return self.compare_features(before, start_features)
+
+    def _allocate_signal(self, signal_dir: str | None) -> tuple:
+        """分配差异信号和特征数组，指定signal_dir时直接写入内存映射文件"""
+        frames = max(self.total_frames, 1)
+        if signal_dir is None:
+            return (
+                np.zeros(frames, dtype=np.float32),
+                np.zeros((frames, FEATURE_SIZE), dtype=np.float16),
+            )
+        os.makedirs(signal_dir, exist_ok=True)
+        diffs = np.lib.format.open_memmap(
+            os.path.join(signal_dir, "diffs.npy"), "w+", np.float32, (frames,)
+        )
+        features = np.lib.format.open_memmap(
+            os.path.join(signal_dir, "features.npy"),
+            "w+",
+            np.float16,
+            (frames, FEATURE_SIZE),
+        )
+        return diffs, features
+
+    @staticmethod
+    def _load_cached_signal(signal_dir: str | None, params: dict):
+        """signal_dir中已有按params检测的信号时返回(diffs, features)，否则返回None"""
+        if signal_dir is None:
+            return None
+        try:
+            with open(os.path.join(signal_dir, "meta.json"), encoding="utf-8") as f:
+                if json.load(f).get("params") != params:
+                    return None
+        except (OSError, ValueError):
+            return None
+        diffs, features, _ = load_signal(signal_dir)
+        return diffs, features
+
+    def _save_signal(self, signal_dir, diffs, features, frames_read, params) -> None:
+        diffs.flush()
+        features.flush()
+        meta = {
+            "fps": self.fps,
+            "total_frames": self.total_frames,
+            "frames_read": frames_read,
+            "frames_decoded": self.frames_decoded,
+            "params": params,
+        }
+        with open(os.path.join(signal_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    def save_frames(self, frame_nums: List[int], output_dir: str) -> None:
+        """保存指定帧为关键帧图片"""
+        os.makedirs(output_dir, exist_ok=True)
+        for frame_num in frame_nums:
+            check_cancelled()
+            self._save_frame(frame_num, output_dir)
+
     def _save_frame(self, frame_num: int, output_dir: str) -> None:
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
         ret, frame = self.cap.read()
         if ret:
             saved_frame_name = os.path.join(output_dir, f"frame_{frame_num}.jpg")
             cv2.imwrite(saved_frame_name, frame)
             self.saved_frames.append(saved_frame_name)
 
-    def _finalize_scenes(self, scene_changes: List[int]) -> List[int]:
-        if self.total_frames - scene_changes[-1] <= 3:
-            scene_changes.pop()
-        scene_changes.append(self.total_frames)
-        return self._merge_close_scenes(scene_changes, int(self.fps * 0.5))
-
     @staticmethod
     def _merge_close_scenes(scene_changes: List[int], min_gap: int) -> List[int]:
         if len(scene_changes) <= 2:
@@ -125,14 +440,3 @@ class SceneDetector:
         merged.append(scene_changes[-1])
 
         return merged
-
-    def _write_csv(self, scene_changes: List[int], output_path: str) -> None:
-        with open(output_path, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["分镜", "时长（秒）"])
-
-            for i in range(len(scene_changes) - 1):
-                duration = round(
-                    (scene_changes[i + 1] - scene_changes[i]) / self.fps, 2
-                )
-                writer.writerow([f"分镜 {i + 1}", duration, "", ""])
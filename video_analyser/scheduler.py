@@ -0,0 +1,93 @@
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass
+from typing import Callable, Tuple
+
+from .metrics import CRITICAL_PATH
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable
+    inputs: Tuple[str, ...] = ()
+
+
+class StageGraph:
+    """按依赖关系调度的阶段图
+
+    每个阶段声明所依赖的阶段，依赖的输出按声明顺序作为位置参数传入，
+    阶段的返回值即为其输出。阶段只等待自己的依赖，互不依赖的阶段并发执行；
+    同步函数放到线程池执行，异步函数在事件循环中执行。
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.timings = {}
+
+    def add(self, name: str, fn: Callable, inputs: Tuple[str, ...] = ()) -> None:
+        # 只能依赖已添加的阶段，保证无环
+        unknown = [i for i in inputs if i not in self.stages]
+        if unknown:
+            raise ValueError(f"阶段{name}依赖未定义的阶段：{unknown}")
+        if name in self.stages:
+            raise ValueError(f"阶段{name}重复定义")
+        self.stages[name] = Stage(name, fn, tuple(inputs))
+
+    async def run(self) -> dict:
+        """执行所有阶段，返回{阶段名: 输出}；任一阶段失败时取消其余阶段"""
+        origin = time.perf_counter()
+        tasks = {}
+
+        async def run_stage(stage: Stage):
+            args = [await tasks[name] for name in stage.inputs]
+            start = time.perf_counter()
+            if inspect.iscoroutinefunction(stage.fn):
+                result = await stage.fn(*args)
+            else:
+                result = await asyncio.to_thread(stage.fn, *args)
+            self.timings[stage.name] = (start - origin, time.perf_counter() - origin)
+            return result
+
+        for stage in self.stages.values():
+            tasks[stage.name] = asyncio.create_task(run_stage(stage))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return {name: task.result() for name, task in tasks.items()}
+
+    def critical_path(self) -> list:
+        """从最后完成的阶段沿最晚完成的依赖回溯，返回关键路径上的阶段名"""
+        if not self.timings:
+            return []
+        name = max(self.timings, key=lambda n: self.timings[n][1])
+        path = [name]
+        while self.stages[name].inputs:
+            name = max(self.stages[name].inputs, key=lambda n: self.timings[n][1])
+            path.append(name)
+        return path[::-1]
+
+    def report(self) -> dict:
+        """各阶段的起止时间（相对图开始执行，秒）及关键路径，并记录关键路径指标"""
+        path = self.critical_path()
+        for name in path:
+            start, end = self.timings[name]
+            CRITICAL_PATH.labels(name).observe(end - start)
+        return {
+            "total_seconds": round(max(end for _, end in self.timings.values()), 3),
+            "critical_path": path,
+            "stages": {
+                name: {
+                    "start": round(start, 3),
+                    "end": round(end, 3),
+                    "seconds": round(end - start, 3),
+                    "critical": name in path,
+                }
+                for name, (start, end) in self.timings.items()
+            },
+        }
@@ -1,19 +1,31 @@
 import asyncio
 import os
+import threading
 import time
 import subprocess
 import sherpa_onnx
 import numpy as np
+from dataclasses import dataclass, field
 from loguru import logger
 from tempfile import NamedTemporaryFile
+from .cancellation import JobCancelled, check_cancelled, on_cancel
+from .metrics import AUDIO_RTF, MODEL_POOL_SIZE, SPEECH_RATIO, stage_timer
+from .resources import get_budget
 from .utils import Segment, correct_srt_with_transcript
 
+SILERO_VAD_MODEL = "weights/asr/silero_vad.onnx"
+# 响度超过该值（相对满幅，dB）的音频帧视为有声
+ENERGY_THRESHOLD_DB = float(os.getenv("VA_ENERGY_THRESHOLD_DB", "-45"))
+# 语音占比低于该值时不做语音识别，直接输出空字幕
+MIN_SPEECH_RATIO = float(os.getenv("VA_MIN_SPEECH_RATIO", "0.02"))
+MIN_SPEECH_SECONDS = 0.5
+
 
 async def init_recognizer(
     model: str = "weights/asr/sensevoice.onnx",
     tokens: str = "weights/asr/tokens.txt",
     debug: bool = False,
-    num_threads: int = 8,
+    num_threads: int | None = None,
 ) -> sherpa_onnx.OfflineRecognizer:
     """初始化语音识别器
 
@@ -21,7 +33,7 @@ async def init_recognizer(
         model: 模型路径
         tokens: tokens文件路径
         debug: 是否启用调试日志
-        num_threads: 使用的线程数
+        num_threads: 使用的线程数，默认按线程预算
 
     Returns:
         sherpa_onnx.OfflineRecognizer: 初始化好的识别器实例
@@ -32,19 +44,14 @@ async def init_recognizer(
 
     if not os.path.exists(model) or not os.path.exists(tokens):
         logger.error(f"模型文件不存在: {model}, {tokens}")
+    if num_threads is None:
+        num_threads = get_budget().asr_threads
 
     # 使用默认的线程池执行CPU密集型操作
-    recognizer = await asyncio.get_event_loop().run_in_executor(
-        None,
-        lambda: sherpa_onnx.OfflineRecognizer.from_sense_voice(
-            model=model,
-            tokens=tokens,
-            use_itn=True,
-            debug=False,
-            num_threads=num_threads,
-            language="auto",
-        ),
-    )
+    with stage_timer("recognizer_init"):
+        recognizer = await asyncio.get_event_loop().run_in_executor(
+            None, lambda: create_recognizer(model, tokens, num_threads)
+        )
 
     if debug:
         logger.debug(f"SenseVoice初始化用时：{time.time() - start_time:.2f}秒")
@@ -52,6 +59,52 @@ async def init_recognizer(
     return recognizer
 
 
+def create_recognizer(
+    model: str, tokens: str, num_threads: int
+) -> sherpa_onnx.OfflineRecognizer:
+    """同步创建SenseVoice识别器"""
+    return sherpa_onnx.OfflineRecognizer.from_sense_voice(
+        model=model,
+        tokens=tokens,
+        use_itn=True,
+        debug=False,
+        num_threads=num_threads,
+        language="auto",
+    )
+
+
+_shared_recognizer = None
+_shared_recognizer_lock = threading.Lock()
+
+
+def _load_shared_recognizer(debug: bool) -> sherpa_onnx.OfflineRecognizer:
+    global _shared_recognizer
+    with _shared_recognizer_lock:
+        if _shared_recognizer is None:
+            start_time = time.time()
+            with stage_timer("recognizer_init"):
+                _shared_recognizer = create_recognizer(
+                    "weights/asr/sensevoice.onnx",
+                    "weights/asr/tokens.txt",
+                    get_budget().asr_threads,
+                )
+            MODEL_POOL_SIZE.labels("sensevoice").set(1)
+            if debug:
+                logger.debug(
+                    f"共享SenseVoice初始化用时：{time.time() - start_time:.2f}秒"
+                )
+        return _shared_recognizer
+
+
+async def get_shared_recognizer(debug: bool = False) -> sherpa_onnx.OfflineRecognizer:
+    """获取进程内共享的识别器，首次调用时加载
+
+    识别器的decode_stream可在多个线程中并发调用，多个任务共用同一实例，
+    避免每个视频重复加载模型。
+    """
+    return await asyncio.to_thread(_load_shared_recognizer, debug)
+
+
 def create_ffmpeg_command(
     audio_path, sample_rate=16000, format="f32le", codec="pcm_f32le"
 ):
@@ -81,24 +134,148 @@ def load_audio(
         process = subprocess.Popen(
             command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
         )
-        audio_data, _ = process.communicate()
+        # 任务取消时结束ffmpeg，communicate随即返回
+        with on_cancel(process.kill):
+            audio_data, _ = process.communicate()
+        check_cancelled()
         samples = np.frombuffer(audio_data, dtype=dtype)
         if dtype == np.int16:
             samples = samples.astype(np.float32) / 32768
         return samples, sample_rate
+    except JobCancelled:
+        raise
     except Exception as e:
         raise RuntimeError(f"音频加载失败: {str(e)}")
 
 
-def transcribe_sensevoice(audio, recognizer, debug=False):
-    """音频转录为文本"""
+@dataclass
+class AudioScan:
+    """语音识别前的音频预扫描结果
+
+    audio为16kHz单声道波形，spans为VAD切出的语音片段[(起始秒, 样本)]，
+    skip为跳过语音识别的原因（"silent"无声、"no_speech"语音过少），需要识别时为None。
+    VAD模型不可用时spans为None，按原流程对整段音频识别。
+    """
+
+    audio: np.ndarray
+    sample_rate: int
+    energy_ratio: float
+    speech_ratio: float | None = None
+    spans: list | None = None
+    skip: str | None = None
+    elapsed: float = field(default=0.0, repr=False)
+
+    @property
+    def duration(self) -> float:
+        return len(self.audio) / self.sample_rate
+
+
+def energy_ratio(
+    audio: np.ndarray,
+    sample_rate: int,
+    threshold_db: float = ENERGY_THRESHOLD_DB,
+    frame_seconds: float = 0.03,
+) -> float:
+    """响度超过threshold_db的30毫秒音频帧所占比例"""
+    frame = int(sample_rate * frame_seconds)
+    count = len(audio) // frame
+    if count == 0:
+        return 0.0
+    frames = audio[: count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    return float(np.mean(rms > 10 ** (threshold_db / 20)))
+
+
+def create_vad(silero_vad_model, sample_rate=16000):
+    config = sherpa_onnx.VadModelConfig()
+    config.silero_vad.model = silero_vad_model
+    config.silero_vad.threshold = 0.2
+    config.silero_vad.min_silence_duration = 0.15
+    config.silero_vad.min_speech_duration = 0.05
+    config.silero_vad.max_speech_duration = 5
+    config.sample_rate = sample_rate
+    vad = sherpa_onnx.VoiceActivityDetector(config, buffer_size_in_seconds=100)
+    return vad, config.silero_vad.window_size
+
+
+def detect_speech(audio, silero_vad_model, sample_rate=16000) -> list:
+    """用Silero VAD切分语音片段，返回[(起始秒, 样本)]"""
+    vad, window_size = create_vad(silero_vad_model, sample_rate)
+    spans = []
+    for i in range(0, len(audio) - window_size + 1, window_size):
+        vad.accept_waveform(audio[i : i + window_size])
+        while not vad.empty():
+            spans.append((vad.front.start / sample_rate, np.array(vad.front.samples)))
+            vad.pop()
+    vad.flush()
+    while not vad.empty():
+        spans.append((vad.front.start / sample_rate, np.array(vad.front.samples)))
+        vad.pop()
+    return spans
+
+
+def prescan_audio(
+    video_path,
+    silero_vad_model=SILERO_VAD_MODEL,
+    sample_rate=16000,
+    min_speech_ratio=MIN_SPEECH_RATIO,
+) -> AudioScan:
+    """解码音频并判断是否需要语音识别
+
+    先用响度门限排除无声视频（不运行VAD），再用Silero VAD计算语音占比，
+    语音过少（纯音乐、环境声）时跳过识别，不需要加载SenseVoice模型。
+    """
+    start_time = time.time()
+    with stage_timer("audio_prescan"):
+        audio, _ = load_audio(
+            video_path,
+            sample_rate=sample_rate,
+            format="s16le",
+            codec="pcm_s16le",
+            dtype=np.int16,
+        )
+        scan = AudioScan(audio, sample_rate, energy_ratio(audio, sample_rate))
+        if scan.energy_ratio < min_speech_ratio:
+            scan.speech_ratio, scan.spans, scan.skip = 0.0, [], "silent"
+        elif os.path.exists(silero_vad_model):
+            scan.spans = detect_speech(audio, silero_vad_model, sample_rate)
+            speech_seconds = sum(len(s) for _, s in scan.spans) / sample_rate
+            scan.speech_ratio = speech_seconds / scan.duration if scan.duration else 0.0
+            if (
+                scan.speech_ratio < min_speech_ratio
+                or speech_seconds < MIN_SPEECH_SECONDS
+            ):
+                scan.skip = "no_speech"
+        else:
+            logger.warning(f"VAD模型不存在，跳过语音预扫描：{silero_vad_model}")
+    scan.elapsed = time.time() - start_time
+    if scan.speech_ratio is not None:
+        SPEECH_RATIO.observe(scan.speech_ratio)
+    logger.info(
+        f"音频预扫描：时长{scan.duration:.1f}秒，有声{scan.energy_ratio:.0%}，"
+        + (
+            f"语音{scan.speech_ratio:.0%}"
+            if scan.speech_ratio is not None
+            else "语音占比未知"
+        )
+        + (f"，跳过语音识别（{scan.skip}）" if scan.skip else "")
+        + f"，用时{scan.elapsed:.2f}秒"
+    )
+    return scan
+
+
+def transcribe_sensevoice(audio, recognizer, debug=False, sample_rate=16000):
+    """音频转录为文本，audio为文件路径或已解码的波形"""
     start_time = time.time()
-    audio, sample_rate = load_audio(audio)
+    if isinstance(audio, str):
+        audio, sample_rate = load_audio(audio)
     stream = recognizer.create_stream()
     stream.accept_waveform(sample_rate, audio)
     recognizer.decode_stream(stream)
     result_text = stream.result.text
     duration = time.time() - start_time
+    if len(audio) > 0:
+        AUDIO_RTF.labels("transcribe").observe(duration / (len(audio) / sample_rate))
 
     word_count = len(result_text)
     logger.debug(
@@ -116,30 +293,19 @@ def generate_subtitles(
     sample_rate=16000,
     srt_path="subtitle.srt",
     debug=False,
+    scan: AudioScan | None = None,
 ):
-    audio, _ = load_audio(
-        sound_file,
-        sample_rate=sample_rate,
-        format="s16le",
-        codec="pcm_s16le",
-        dtype=np.int16,
-    )
-
-    frames_per_read = int(sample_rate * 100)  # 100 second
-
-    recognizer.create_stream()
-    config = sherpa_onnx.VadModelConfig()
-    config.silero_vad.model = silero_vad_model
-    config.silero_vad.threshold = 0.2
-    config.silero_vad.min_silence_duration = 0.15
-    config.silero_vad.min_speech_duration = 0.05
-    config.silero_vad.max_speech_duration = 5
-    config.sample_rate = sample_rate
-
-    window_size = config.silero_vad.window_size
-
-    buffer = []
-    vad = sherpa_onnx.VoiceActivityDetector(config, buffer_size_in_seconds=100)
+    """生成字幕；传入预扫描结果时复用其波形和VAD语音片段"""
+    if scan is not None:
+        audio = scan.audio
+    else:
+        audio, _ = load_audio(
+            sound_file,
+            sample_rate=sample_rate,
+            format="s16le",
+            codec="pcm_s16le",
+            dtype=np.int16,
+        )
 
     segment_list = []
 
@@ -147,35 +313,23 @@ def generate_subtitles(
         logger.debug("生成字幕中...")
     start_time = time.time()
 
-    # 处理音频数据
-    for i in range(0, len(audio), frames_per_read):
-        samples = audio[i : i + frames_per_read]
-        if len(samples) == 0:
-            break
-
-        buffer = np.concatenate([buffer, samples])
-        while len(buffer) > window_size:
-            vad.accept_waveform(buffer[:window_size])
-            buffer = buffer[window_size:]
-
-    vad.flush()
+    if scan is not None and scan.spans is not None:
+        spans = scan.spans
+    else:
+        spans = detect_speech(audio, silero_vad_model, sample_rate)
 
-    # VAD处理和识别部分
-    while not vad.empty():
-        segment = Segment(
-            start=vad.front.start / sample_rate,
-            duration=len(vad.front.samples) / sample_rate,
-        )
+    # 识别每个语音片段
+    for start, samples in spans:
+        check_cancelled()
+        segment = Segment(start=start, duration=len(samples) / sample_rate)
 
         stream = recognizer.create_stream()
-        stream.accept_waveform(sample_rate, vad.front.samples)
+        stream.accept_waveform(sample_rate, samples)
         recognizer.decode_stream(stream)
 
         segment.text = stream.result.text
         segment_list.append(segment)
 
-        vad.pop()
-
     # 写入SRT文件
     with open(srt_path, "w", encoding="utf-8") as f:
         counter = 1
@@ -187,32 +341,50 @@ def generate_subtitles(
                 print("", file=f)
                 counter += 1
 
+    duration = len(audio) / sample_rate
+    elapsed_seconds = time.time() - start_time
+    if duration > 0:
+        AUDIO_RTF.labels("subtitles").observe(elapsed_seconds / duration)
     if debug:
-        duration = len(audio) / sample_rate
-        elapsed_seconds = time.time() - start_time
         logger.debug(
             f"字幕生成成功：{srt_path}（{elapsed_seconds:.2f}秒，音频时长：{duration:.2f}秒）"
         )
+    return segment_list
 
 
 def get_transcript_and_corrected_subtitles(
-    recognizer, video_path: str, srt_path: str = None
+    recognizer,
+    video_path: str,
+    srt_path: str = None,
+    scan: AudioScan | None = None,
+    single_pass: bool = False,
 ) -> tuple:
+    """生成字幕并返回（转录文本, 字幕路径）
+
+    默认再对整段音频识别一遍，用全文校对字幕；single_pass时只识别一遍，
+    转录文本由各语音片段拼接而成。
+    """
     srt_path = (
         NamedTemporaryFile(suffix=".srt", dir="temp").name
         if srt_path is None
         else srt_path
     )
-    generate_subtitles(
+    segment_list = generate_subtitles(
         recognizer=recognizer,
         sound_file=video_path,
-        silero_vad_model="weights/asr/silero_vad.onnx",
+        silero_vad_model=SILERO_VAD_MODEL,
         srt_path=srt_path,
+        scan=scan,
     )
+    if single_pass:
+        return "".join(seg.text for seg in segment_list), srt_path
 
+    check_cancelled()
     # 转录文本
     transcript = transcribe_sensevoice(
-        audio=video_path, recognizer=recognizer, debug=True
+        audio=video_path if scan is None else scan.audio,
+        recognizer=recognizer,
+        debug=True,
     )
 
     # 校对SRT文件内容
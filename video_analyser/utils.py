@@ -1,15 +1,19 @@
 import csv
+import json
 import os.path
 import shutil
 import subprocess
 from dataclasses import dataclass
 from datetime import timedelta
-import cv2
-import pysrt
+from functools import lru_cache
+from typing import TYPE_CHECKING
 from difflib import SequenceMatcher
 import re
 from loguru import logger
 
+if TYPE_CHECKING:
+    import pysrt
+
 
 def normalize_text(text: str) -> str:
     """规范化文本：处理空格和标点"""
@@ -31,6 +35,8 @@ def normalize_text(text: str) -> str:
 
 def correct_srt_with_transcript(srt_path: str, transcript: str):
     """使用transcript校对srt文件内容"""
+    import pysrt
+
     # 读取SRT文件
     subs = pysrt.open(srt_path)
 
@@ -76,13 +82,153 @@ def save_csv(csv_path: str, header: list, rows: list):
         writer.writerows(rows)
 
 
-def check_video_duration(video_path: str, max_duration_seconds: int = 300) -> bool:
-    video = cv2.VideoCapture(video_path)
-    total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = video.get(cv2.CAP_PROP_FPS)
-    duration = total_frames / fps
+@lru_cache(maxsize=256)
+def _probe_video(video_path: str, mtime_ns: int, size: int) -> dict:
+    if shutil.which("ffprobe") is None:
+        # 没有ffprobe时退化为OpenCV读取容器信息
+        import cv2
+
+        video = cv2.VideoCapture(video_path)
+        fps = video.get(cv2.CAP_PROP_FPS)
+        frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        info = {
+            "duration": frame_count / fps if fps else 0.0,
+            "width": int(video.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(video.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": fps,
+            "frame_count": frame_count,
+            "size": size,
+        }
+        video.release()
+        return info
+
+    result = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            "stream=width,height,avg_frame_rate,nb_frames,duration:format=duration",
+            "-of",
+            "json",
+            video_path,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    data = json.loads(result.stdout)
+    stream = data["streams"][0] if data.get("streams") else {}
+    num, _, den = stream.get("avg_frame_rate", "0/1").partition("/")
+    fps = float(num) / float(den) if float(den or 0) else 0.0
+    duration = float(stream.get("duration") or data["format"].get("duration") or 0)
+    frame_count = int(stream.get("nb_frames") or round(duration * fps))
+    return {
+        "duration": duration,
+        "width": int(stream.get("width", 0)),
+        "height": int(stream.get("height", 0)),
+        "fps": fps,
+        "frame_count": frame_count,
+        "size": size,
+    }
+
+
+def probe_video(video_path: str) -> dict:
+    """读取视频时长、分辨率、帧率和帧数，同一文件只调用一次ffprobe"""
+    stat = os.stat(video_path)
+    return dict(
+        _probe_video(os.path.abspath(video_path), stat.st_mtime_ns, stat.st_size)
+    )
+
+
+def _packet_times_ffprobe(video_path: str) -> list:
+    result = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            "packet=pts_time,flags",
+            "-of",
+            "csv=p=0",
+            video_path,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    packets = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if pts_time and pts_time != "N/A":
+            packets.append((float(pts_time), "K" in flags))
+    return packets
+
+
+def _packet_times_ffmpeg(video_path: str) -> list:
+    # framecrc只复制数据包不解码，非关键帧数据包带有F=标志
+    result = subprocess.run(
+        [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-i",
+            video_path,
+            "-map",
+            "0:v:0",
+            "-c",
+            "copy",
+            "-f",
+            "framecrc",
+            "-",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    time_base = 1.0
+    packets = []
+    for line in result.stdout.splitlines():
+        if line.startswith("#tb"):
+            num, _, den = line.split(":")[1].strip().partition("/")
+            time_base = int(num) / int(den)
+        elif line and not line.startswith("#"):
+            fields = [field.strip() for field in line.split(",")]
+            flags = [f for f in fields[6:] if f.startswith("F=")]
+            key = not flags or bool(int(flags[0][2:], 16) & 1)
+            packets.append((int(fields[2]) * time_base, key))
+    return packets
+
+
+def probe_keyframes(video_path: str) -> list | None:
+    """读取视频流的关键帧时间（秒，相对首帧），只读取数据包索引不解码
+
+    优先使用ffprobe，没有时使用ffmpeg的framecrc输出，都不可用时返回None。
+    """
+    try:
+        if shutil.which("ffprobe") is not None:
+            packets = _packet_times_ffprobe(video_path)
+        elif shutil.which("ffmpeg") is not None:
+            packets = _packet_times_ffmpeg(video_path)
+        else:
+            return None
+    except (subprocess.CalledProcessError, ValueError, IndexError) as e:
+        logger.warning(f"读取关键帧索引失败：{str(e)}")
+        return None
+    if not packets:
+        return None
+    origin = min(pts for pts, _ in packets)
+    return sorted(pts - origin for pts, key in packets if key)
+
 
-    video.release()
+def check_video_duration(video_path: str, max_duration_seconds: int = 300) -> bool:
+    duration = probe_video(video_path)["duration"]
 
     if duration > max_duration_seconds:
         logger.error(
@@ -191,7 +337,7 @@ def save_transcript(transcript_path: str, transcript: str) -> None:
         f.write(transcript)
 
 
-def get_subtitle_start_seconds(sub: pysrt.SubRipItem) -> float:
+def get_subtitle_start_seconds(sub: "pysrt.SubRipItem") -> float:
     """计算字幕的开始时间（以秒为单位）"""
     return sub.start.seconds + sub.start.minutes * 60 + sub.start.hours * 3600
 
@@ -212,7 +358,7 @@ def calculate_scene_times(rows: list) -> list:
     return scene_times
 
 
-def organize_subtitles_by_scene(subs: pysrt.SubRipFile, scene_times: list) -> list:
+def organize_subtitles_by_scene(subs: "pysrt.SubRipFile", scene_times: list) -> list:
     """将字幕按分镜组织"""
     scene_transcripts = [[] for _ in range(len(scene_times))]
     for sub in subs:
@@ -224,7 +370,9 @@ def organize_subtitles_by_scene(subs: pysrt.SubRipFile, scene_times: list) -> li
     return scene_transcripts
 
 
+@lru_cache(maxsize=1)
 def check_ffmpeg():
+    """检查FFmpeg是否可用，结果在进程内缓存，只在首次调用时检查"""
     try:
         # 检查方法1: 使用shutil查找可执行文件
         check1 = shutil.which("ffmpeg") is not None
@@ -2,11 +2,29 @@ import asyncio
 import os
 import shutil
 import time
+from functools import partial
 import pysrt
 from loguru import logger
+from .checkpoint import JobCheckpoint, file_digest, fingerprint_file
+from .deadline import DegradePlan, plan_for_deadline, select_evenly
 from .scene_detector import SceneDetector
 from .frame_describer import FrameDescriber
-from .transcriber import get_transcript_and_corrected_subtitles, init_recognizer
+from .metrics import (
+    ASR_SKIPPED,
+    ASR_SKIPPED_SECONDS,
+    STAGE_LATENCY,
+    stage_timer,
+    model_in_use,
+)
+from .profiling import current_profiler
+from .scheduler import StageGraph
+from .transcriber import (
+    AudioScan,
+    get_transcript_and_corrected_subtitles,
+    get_shared_recognizer,
+    prescan_audio,
+)
+from .workspace import new_job_id, job_dir, remove_job_dir
 from .utils import (
     save_csv,
     check_video_duration,
@@ -17,9 +35,218 @@ from .utils import (
     calculate_scene_times,
     organize_subtitles_by_scene,
     check_ffmpeg,
+    probe_video,
 )
 
 
+def detect_scenes_stage(
+    video_path: str,
+    csv_path: str,
+    frames_dir: str,
+    min_scene_duration_seconds: float = 3.0,
+    debug: bool = True,
+    signal_dir: str | None = None,
+    detect_mode: str = "dense",
+    checkpoint: JobCheckpoint | None = None,
+    plan: DegradePlan | None = None,
+) -> list:
+    """分镜检测阶段：写入分镜CSV并返回关键帧路径"""
+    params = {
+        "video": fingerprint_file(video_path),
+        "min_scene_duration_seconds": min_scene_duration_seconds,
+        "detect_mode": detect_mode,
+    }
+    stride, analysis_width = 1, None
+    if plan is not None and (plan.stride > 1 or plan.analysis_width):
+        # 降级检测的结果只用于同样降级的重试
+        stride, analysis_width = plan.stride, plan.analysis_width
+        params.update(stride=stride, analysis_width=analysis_width)
+    if checkpoint is not None:
+        data = checkpoint.load("detect_scenes", params)
+        if data is not None and all(os.path.exists(f) for f in data["frames"]):
+            shutil.copyfile(checkpoint.path("scenes.csv"), csv_path)
+            logger.info("从检查点恢复分镜检测结果")
+            return data["frames"]
+
+    with stage_timer("detect_scenes"):
+        scene_detector = SceneDetector(video_path, debug)
+        scene_detector.detect_scenes(
+            threshold=2.0,
+            min_scene_duration=min_scene_duration_seconds,
+            window_size=5,
+            csv_path=csv_path,
+            save_frames=True,
+            frames_dir=frames_dir,
+            signal_dir=signal_dir,
+            mode=detect_mode,
+            stride=stride,
+            analysis_width=analysis_width,
+        )
+    if checkpoint is not None:
+        shutil.copyfile(csv_path, checkpoint.path("scenes.csv"))
+        checkpoint.save(
+            "detect_scenes", params, {"frames": scene_detector.saved_frames}
+        )
+    return scene_detector.saved_frames
+
+
+def asr_params(video_path: str, single_pass: bool = False) -> dict:
+    """语音识别检查点的参数，视频或识别方式变化后检查点失效"""
+    params = {"video": fingerprint_file(video_path)}
+    if single_pass:
+        params["single_pass"] = True
+    return params
+
+
+def transcribe_audio(
+    recognizer,
+    video_path: str,
+    transcript_path: str,
+    srt_path: str,
+    checkpoint: JobCheckpoint | None = None,
+    scan: AudioScan | None = None,
+    single_pass: bool = False,
+) -> str:
+    """语音识别：生成校对后的字幕，保存并返回转录文本（不依赖分镜结果）
+
+    未传入预扫描结果时先扫描音频；无声或语音过少时输出空字幕和空文本，
+    不运行识别模型（此时recognizer可以为None）。single_pass时只识别VAD片段，
+    不再对整段音频识别和校对字幕。
+    """
+    params = asr_params(video_path, single_pass)
+    data = checkpoint.load("asr", params) if checkpoint is not None else None
+    if data is not None:
+        logger.info("从检查点恢复语音识别结果")
+        transcript = data["transcript"]
+        with open(srt_path, "w", encoding="utf-8") as f:
+            f.write(data["srt"])
+    else:
+        if scan is None:
+            scan = prescan_audio(video_path)
+        if scan.skip is not None:
+            ASR_SKIPPED.labels(scan.skip).inc()
+            ASR_SKIPPED_SECONDS.inc(scan.duration)
+            transcript = ""
+            open(srt_path, "w", encoding="utf-8").close()
+        else:
+            with stage_timer("asr"), model_in_use("sensevoice"):
+                transcript, srt_path = get_transcript_and_corrected_subtitles(
+                    recognizer, video_path, srt_path, scan, single_pass
+                )
+        if checkpoint is not None:
+            with open(srt_path, encoding="utf-8") as f:
+                checkpoint.save(
+                    "asr", params, {"transcript": transcript, "srt": f.read()}
+                )
+    save_transcript(transcript_path, transcript)
+    return transcript
+
+
+def scene_scripts(csv_path: str, srt_path: str) -> list:
+    """按分镜时间划分字幕，返回每个分镜的文案"""
+    subs = pysrt.open(srt_path)
+    scene_times = calculate_scene_times(read_csv_rows(csv_path))
+    scene_transcripts = organize_subtitles_by_scene(subs, scene_times)
+    return prepare_script_values(scene_transcripts)
+
+
+def write_columns(csv_path: str, columns: dict) -> None:
+    """按顺序将{列名: 值}追加到分镜CSV"""
+    for column_name, values in columns.items():
+        header, rows = update_csv_column(csv_path, column_name, values)
+        save_csv(csv_path, header, rows)
+
+
+def transcribe_stage(
+    recognizer,
+    video_path: str,
+    csv_path: str,
+    transcript_path: str,
+    srt_path: str,
+    checkpoint: JobCheckpoint | None = None,
+) -> str:
+    """语音识别阶段：保存转录文本并写入CSV文案列"""
+    transcript = transcribe_audio(
+        recognizer, video_path, transcript_path, srt_path, checkpoint
+    )
+    write_columns(csv_path, {"文案": scene_scripts(csv_path, srt_path)})
+    return transcript
+
+
+async def describe_frames(
+    frames: list,
+    api_key: str,
+    base_url: str = "https://api.bltcy.ai/v1",
+    max_concurrent: int = 8,
+    debug: bool = True,
+    checkpoint: JobCheckpoint | None = None,
+    plan: DegradePlan | None = None,
+) -> list:
+    """描述关键帧，返回每帧的描述
+
+    指定checkpoint时每完成一帧即保存，重试时只描述尚未完成的帧。
+    指定限时方案时按剩余时间均匀选取部分关键帧描述，期限前未完成的帧描述为空。
+    """
+    # 描述按关键帧内容缓存，分镜结果变化后旧的描述自然不再命中
+    params = {"base_url": base_url}
+    keys = [file_digest(frame) for frame in frames]
+    done = checkpoint.load_items("describe", params) if checkpoint else {}
+    frames_description = [done.get(key) for key in keys]
+    pending = [i for i, key in enumerate(keys) if key not in done]
+    if len(pending) < len(frames):
+        logger.info(f"从检查点恢复{len(frames) - len(pending)}帧描述")
+    timeout = None
+    if plan is not None:
+        limit = plan.describe_limit(len(pending), max_concurrent)
+        if limit < len(pending):
+            pending = [pending[i] for i in select_evenly(len(pending), limit)]
+            plan.shortcuts.append("limit_described_scenes")
+        timeout = max(0.0, plan.remaining() - plan.cost.overhead_seconds)
+
+    def on_result(index, description):
+        frames_description[pending[index]] = description
+        if checkpoint is not None:
+            checkpoint.append_item(
+                "describe", params, keys[pending[index]], description
+            )
+
+    if pending:
+        frame_describer = FrameDescriber(api_key, base_url, debug)
+        with stage_timer("describe"):
+            try:
+                await asyncio.wait_for(
+                    frame_describer.describe_images_concurrent(
+                        [frames[i] for i in pending], max_concurrent, on_result
+                    ),
+                    timeout,
+                )
+            except asyncio.TimeoutError:
+                logger.warning("画面描述未在期限内完成，其余关键帧不再描述")
+                plan.shortcuts.append("describe_timeout")
+    if plan is not None:
+        plan.total_scenes = len(frames)
+        plan.described_scenes = sum(d is not None for d in frames_description)
+        frames_description = [d or "" for d in frames_description]
+    return frames_description
+
+
+async def describe_stage(
+    frames: list,
+    csv_path: str,
+    api_key: str,
+    base_url: str = "https://api.bltcy.ai/v1",
+    max_concurrent: int = 8,
+    debug: bool = True,
+    checkpoint: JobCheckpoint | None = None,
+) -> list:
+    """画面描述阶段：写入CSV描述列"""
+    frames_description = await describe_frames(
+        frames, api_key, base_url, max_concurrent, debug, checkpoint
+    )
+    write_columns(csv_path, {"描述": frames_description})
+    return frames_description
+
+
 async def analyse_video(
     video_path: str,
     csv_path: str,
@@ -30,6 +257,12 @@ async def analyse_video(
     max_duration_seconds: int = 300,
     max_concurrent: int = 8,
     debug: bool = True,
+    work_dir: str | None = None,
+    signal_dir: str | None = None,
+    detect_mode: str = "dense",
+    job_id: str | None = None,
+    deadline_seconds: float | None = None,
+    fidelity: dict | None = None,
 ) -> tuple | None:
     """
     分析视频主函数
@@ -45,59 +278,135 @@ async def analyse_video(
         max_duration_seconds (int): 最大视频时长（秒）。
         max_concurrent (int): 最大并发描述任务数。
         debug (bool): 是否启用调试模式。
+        work_dir (str | None): 任务工作目录，为空时按job_id创建，成功后删除。
+        signal_dir (str | None): 保存分镜差异信号的目录，可用于之后重新分镜；
+            其中已有同一视频、同样检测参数的信号时直接复用。
+        detect_mode (str): 分镜检测模式，"dense"逐帧解码，"keyframe"按关键帧索引解码。
+        job_id (str | None): 任务ID。指定时失败后保留工作目录中的检查点，
+            用同一job_id重试会从最后完成的阶段继续。
+        deadline_seconds (float | None): 分析期限（秒）。指定时按视频参数估算耗时，
+            必要时加大检测步长、降低分析分辨率、单遍识别并只描述部分分镜。
+        fidelity (dict | None): 指定期限时写入降级报告（采用的降级措施、是否按期完成）。
 
     返回:
         tuple | None: 返回CSV和转录文件路径，或在出错时返回None。
     """
     start_time = time.time()
-    temp_dir = "temp"
-    os.makedirs(temp_dir, exist_ok=True)
+    owned_job_id = None
+    if work_dir is None:
+        owned_job_id = job_id or new_job_id()
+        work_dir = job_dir(owned_job_id)
+    frames_dir = os.path.join(work_dir, "frames")
+    checkpoint = JobCheckpoint(work_dir)
+    succeeded = False
 
-    if not check_ffmpeg():
-        return
+    try:
+        if not check_ffmpeg():
+            return
 
-    if not check_video_duration(video_path, max_duration_seconds):
-        return
+        if not check_video_duration(video_path, max_duration_seconds):
+            return
 
-    scene_detector = SceneDetector(video_path, debug)
-    recognizer_task = asyncio.create_task(init_recognizer(debug=debug))
-    scene_detect_task = asyncio.create_task(
-        asyncio.to_thread(
-            scene_detector.detect_scenes,
-            threshold=2.0,
-            min_scene_duration=min_scene_duration_seconds,
-            window_size=5,
-            csv_path=csv_path,
-            save_frames=True,
-            frames_dir=temp_dir,
+        plan = None
+        if deadline_seconds is not None:
+            plan = plan_for_deadline(probe_video(video_path), deadline_seconds)
+
+        srt_path = os.path.join(work_dir, "subtitle.srt")
+        # 语音识别只依赖识别模型，画面描述只依赖关键帧，二者与分镜检测并发执行；
+        # 按分镜划分文案需要等分镜和字幕都完成，最后统一写入CSV
+        graph = StageGraph()
+        single_pass_asr = plan is not None and plan.single_pass_asr
+        # 重试时已有语音识别检查点，不再解码音频预扫描，也不加载识别模型
+        asr_restored = (
+            checkpoint.load("asr", asr_params(video_path, single_pass_asr)) is not None
         )
-    )
 
-    # 第一步：检测分镜
-    recognizer, _ = await asyncio.gather(recognizer_task, scene_detect_task)
+        def prescan():
+            return None if asr_restored else prescan_audio(video_path)
 
-    # 第二步：写入csv文案列
-    transcript, temp_srt = get_transcript_and_corrected_subtitles(
-        recognizer, video_path
-    )
-    save_transcript(transcript_path, transcript)
-    subs = pysrt.open(temp_srt)
-    rows = read_csv_rows(csv_path)
-    scene_times = calculate_scene_times(rows)
-    scene_transcripts = organize_subtitles_by_scene(subs, scene_times)
-    scripts = prepare_script_values(scene_transcripts)
-    header, rows = update_csv_column(csv_path, "文案", scripts)
-    save_csv(csv_path, header, rows)
-
-    # 第三步: 写入csv描述列
-    frame_describer = FrameDescriber(api_key, base_url, debug)
-    frames_description = await frame_describer.describe_images_concurrent(
-        scene_detector.saved_frames, max_concurrent
-    )
-    header, rows = update_csv_column(csv_path, "描述", frames_description)
-    save_csv(csv_path, header, rows)
+        graph.add("prescan", prescan)
+
+        async def load_recognizer(scan):
+            # 已恢复识别结果或无需识别的视频不加载SenseVoice
+            if scan is None or scan.skip:
+                return None
+            return await get_shared_recognizer(debug)
+
+        graph.add("recognizer", load_recognizer, ("prescan",))
+        graph.add(
+            "detect",
+            partial(
+                detect_scenes_stage,
+                video_path,
+                csv_path,
+                frames_dir,
+                min_scene_duration_seconds,
+                debug,
+                signal_dir,
+                detect_mode,
+                checkpoint,
+                plan,
+            ),
+        )
+        graph.add(
+            "asr",
+            lambda recognizer, scan: transcribe_audio(
+                recognizer,
+                video_path,
+                transcript_path,
+                srt_path,
+                checkpoint,
+                scan,
+                single_pass_asr,
+            ),
+            ("recognizer", "prescan"),
+        )
+        graph.add(
+            "describe",
+            partial(
+                describe_frames,
+                api_key=api_key,
+                base_url=base_url,
+                max_concurrent=max_concurrent,
+                debug=debug,
+                checkpoint=checkpoint,
+                plan=plan,
+            ),
+            ("detect",),
+        )
+        graph.add(
+            "scripts",
+            lambda frames, transcript: scene_scripts(csv_path, srt_path),
+            ("detect", "asr"),
+        )
+        graph.add(
+            "write_csv",
+            lambda scripts, descriptions: write_columns(
+                csv_path, {"文案": scripts, "描述": descriptions}
+            ),
+            ("scripts", "describe"),
+        )
+        await graph.run()
+        report = graph.report()
+        profiler = current_profiler.get()
+        if profiler is not None:
+            profiler.schedule = report
+        logger.info(
+            "关键路径："
+            + " -> ".join(
+                f"{name}({report['stages'][name]['seconds']:.2f}秒)"
+                for name in report["critical_path"]
+            )
+        )
+        if plan is not None and fidelity is not None:
+            fidelity.update(plan.report())
+        succeeded = True
+    finally:
+        # 调用方指定了job_id时保留失败任务的检查点，以便重试
+        if owned_job_id is not None and (succeeded or job_id is None):
+            remove_job_dir(owned_job_id)
 
-    shutil.rmtree(temp_dir)
     duration = time.time() - start_time
+    STAGE_LATENCY.labels("total").observe(duration)
     logger.info(f"视频分析完成！用时：{duration:.2f}秒")
     return csv_path, transcript_path
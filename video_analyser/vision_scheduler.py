@@ -0,0 +1,301 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from loguru import logger
+
+from .metrics import VISION_CONCURRENCY, VISION_QUEUE_WAIT
+
+# 每分钟请求数、每分钟token数上限，0表示不限（只靠429自适应）
+VISION_RPM = float(os.getenv("VA_VISION_RPM", "0"))
+VISION_TPM = float(os.getenv("VA_VISION_TPM", "0"))
+# 令牌桶容量（秒数的额度），服务商通常在比一分钟更短的窗口内执行限额
+VISION_BURST_SECONDS = float(os.getenv("VA_VISION_BURST_SECONDS", "10"))
+# 每个API密钥的并发上限范围，实际上限在两者之间自适应调整
+VISION_MAX_CONCURRENCY = int(os.getenv("VA_VISION_MAX_CONCURRENCY", "32"))
+VISION_MIN_CONCURRENCY = int(os.getenv("VA_VISION_MIN_CONCURRENCY", "1"))
+# 平均延迟超过最低延迟的该倍数时认为服务端开始排队，减小并发
+LATENCY_TOLERANCE = 2.0
+# 低清晰度图片固定按85个token计费
+IMAGE_TOKENS_LOW = 85
+
+
+def estimate_tokens(prompt: str, max_tokens: int, detail: str = "low") -> int:
+    """估算一次画面描述请求消耗的token数（提示词按每字一个token，加上最大输出）"""
+    image_tokens = IMAGE_TOKENS_LOW if detail == "low" else IMAGE_TOKENS_LOW * 9
+    return len(prompt) + image_tokens + max_tokens
+
+
+class TokenBucket:
+    """按速率补充的令牌桶，容量为burst_seconds秒的额度
+
+    补充速率取per_minute / (60 + burst_seconds)，桶满时突发的额度加上之后
+    一分钟内补充的额度恰好等于per_minute，任意一分钟内取出的总量不超过限额。
+    允许先扣减再按实际用量修正，余额可能短暂为负，之后的请求相应等待更久。
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = VISION_BURST_SECONDS):
+        self.rate = per_minute / (60 + burst_seconds)
+        # 容量至少为1，保证单个请求能够放行
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated_at = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self, now: float) -> None:
+        self.level = min(
+            self.capacity, self.level + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """取出amount还需等待的秒数，0表示可以立即取出"""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        # 单次超过容量的请求在桶满时放行，避免永远等待
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float, now: float) -> None:
+        if not self.unlimited:
+            self._refill(now)
+            self.level -= amount
+
+
+@dataclass
+class _Waiter:
+    loop: asyncio.AbstractEventLoop
+    future: asyncio.Future
+    tokens: int
+    queued_at: float
+    granted: bool = False
+
+
+class Lease:
+    """一次请求占用的调度名额，请求结束后用release归还并反馈结果"""
+
+    def __init__(self, scheduler: "KeyScheduler", tokens: int):
+        self.scheduler = scheduler
+        self.tokens = tokens
+        self.started_at = time.monotonic()
+        self.released = False
+
+    def release(
+        self,
+        status: str = "ok",
+        tokens_used: int | None = None,
+        retry_after: float | None = None,
+    ) -> None:
+        """status为"ok"、"rate_limited"或"error"；tokens_used为实际用量，用于修正估算"""
+        if not self.released:
+            self.released = True
+            self.scheduler._release(self, status, tokens_used, retry_after)
+
+
+class KeyScheduler:
+    """单个API密钥的全局调度器
+
+    所有任务的画面描述请求在这里排队：每个任务一个队列，轮流放行（公平排队，
+    帧多的任务不会挤占帧少的任务）。放行前检查请求数和token两个令牌桶；
+    并发上限按AIMD调整：成功且延迟正常时缓慢增加，收到429或延迟明显升高时减半。
+    状态用线程锁保护，可以被多个事件循环同时使用。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rpm: float = VISION_RPM,
+        tpm: float = VISION_TPM,
+        max_concurrency: int = VISION_MAX_CONCURRENCY,
+        min_concurrency: int = VISION_MIN_CONCURRENCY,
+        burst_seconds: float = VISION_BURST_SECONDS,
+    ):
+        self.name = name
+        self.requests = TokenBucket(rpm, burst_seconds)
+        self.tokens = TokenBucket(tpm, burst_seconds)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        # 从较小的并发开始，按结果逐步增加
+        self.limit = float(min(max_concurrency, max(min_concurrency, 4)))
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.latency_ewma = None
+        self.latency_min = None
+        self.last_decrease = 0.0
+        self._queues = {}
+        self._order = deque()
+        self._lock = threading.Lock()
+        self._timer = None
+        VISION_CONCURRENCY.labels(name).set(self.limit)
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    async def acquire(self, job, tokens: int) -> Lease:
+        """排队等待放行，job标识请求所属的任务"""
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop, loop.create_future(), tokens, time.monotonic())
+        with self._lock:
+            if job not in self._queues:
+                self._queues[job] = deque()
+                self._order.append(job)
+            self._queues[job].append(waiter)
+            self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                queue = self._queues.get(job)
+                if queue is not None and waiter in queue:
+                    queue.remove(waiter)
+                    if not queue:
+                        self._remove_job(job)
+                elif waiter.granted:
+                    # 已经放行但调用方被取消，归还名额
+                    self.in_flight -= 1
+                self._dispatch()
+            raise
+        VISION_QUEUE_WAIT.observe(time.monotonic() - waiter.queued_at)
+        return Lease(self, tokens)
+
+    def _remove_job(self, job) -> None:
+        del self._queues[job]
+        self._order.remove(job)
+
+    def _dispatch(self) -> None:
+        """在持有锁时调用：按任务轮流放行，直到并发或令牌桶不允许"""
+        while self._order and self.in_flight < int(self.limit):
+            job = self._order[0]
+            queue = self._queues[job]
+            waiter = queue[0]
+            if waiter.future.done():
+                queue.popleft()
+                if not queue:
+                    self._remove_job(job)
+                continue
+            now = time.monotonic()
+            wait = max(
+                self.paused_until - now,
+                self.requests.wait_time(1, now),
+                self.tokens.wait_time(waiter.tokens, now),
+            )
+            if wait > 0:
+                self._schedule_wakeup(wait)
+                return
+            self.requests.take(1, now)
+            self.tokens.take(waiter.tokens, now)
+            self.in_flight += 1
+            waiter.granted = True
+            queue.popleft()
+            # 放行后该任务排到最后
+            self._order.rotate(-1)
+            if not queue:
+                self._remove_job(job)
+            try:
+                waiter.loop.call_soon_threadsafe(_grant, waiter.future)
+            except RuntimeError:
+                # 等待方的事件循环已关闭
+                self.in_flight -= 1
+
+    def _schedule_wakeup(self, delay: float) -> None:
+        if self._timer is not None:
+            return
+        self._timer = threading.Timer(delay, self._wakeup)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _wakeup(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _release(self, lease: Lease, status, tokens_used, retry_after) -> None:
+        now = time.monotonic()
+        latency = now - lease.started_at
+        with self._lock:
+            self.in_flight -= 1
+            if tokens_used is not None:
+                # 按实际用量修正估算
+                self.tokens.take(tokens_used - lease.tokens, now)
+            if status == "rate_limited":
+                self.paused_until = max(
+                    self.paused_until, now + (retry_after or min(1.0, latency))
+                )
+                self._decrease(now, "收到429")
+            elif status == "ok":
+                self._observe_latency(latency)
+                if self.latency_ewma > self.latency_min * LATENCY_TOLERANCE:
+                    self._decrease(now, "延迟升高")
+                elif self.in_flight + 1 >= int(self.limit):
+                    # 只有用满并发时才增加，避免空闲时上限无意义地增长
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            VISION_CONCURRENCY.labels(self.name).set(self.limit)
+            self._dispatch()
+
+    def _observe_latency(self, latency: float) -> None:
+        if self.latency_ewma is None:
+            self.latency_ewma = self.latency_min = latency
+        else:
+            self.latency_ewma = 0.8 * self.latency_ewma + 0.2 * latency
+            self.latency_min = min(self.latency_min, latency)
+
+    def _decrease(self, now: float, reason: str) -> None:
+        # 同一批在途请求的反馈只减一次
+        if now - self.last_decrease < (self.latency_ewma or 1.0):
+            return
+        self.last_decrease = now
+        old = self.limit
+        self.limit = max(self.min_concurrency, self.limit / 2)
+        if self.latency_ewma is not None:
+            # 重新测量延迟基线
+            self.latency_min = self.latency_ewma
+        logger.warning(
+            f"画面描述{reason}，并发上限{old:.1f} -> {self.limit:.1f}（{self.name}）"
+        )
+
+
+def _grant(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+_executor = None
+
+
+def get_scheduler(api_key: str | None, base_url: str) -> KeyScheduler:
+    """返回该API密钥（和服务地址）共享的调度器，进程内所有任务共用"""
+    key = (base_url, api_key)
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            # 指标标签不暴露密钥本身
+            digest = hashlib.sha256(f"{base_url}|{api_key}".encode()).hexdigest()
+            scheduler = _schedulers[key] = KeyScheduler(digest[:8])
+        return scheduler
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """画面描述请求专用的线程池，大小为并发上限
+
+    请求在线程中阻塞等待网络，与分镜检测、语音识别共用默认线程池时，
+    并发升高后会占满线程，使其他任务的CPU阶段排队。
+    """
+    global _executor
+    with _schedulers_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=VISION_MAX_CONCURRENCY, thread_name_prefix="va-vision"
+            )
+        return _executor
@@ -0,0 +1,32 @@
+import importlib
+import time
+from loguru import logger
+
+HEAVY_MODULES = (
+    "video_analyser.scene_detector",
+    "video_analyser.transcriber",
+    "video_analyser.frame_describer",
+    "video_analyser.video_analyser",
+)
+
+
+def warmup(load_models: bool = True) -> dict:
+    """预先导入重量级依赖并加载模型，返回各步骤耗时（秒）
+
+    在服务启动时调用，可以让第一个请求不必承担导入和模型加载的开销。
+    """
+    timings = {}
+    for name in HEAVY_MODULES:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = round(time.perf_counter() - start, 3)
+
+    if load_models:
+        from .transcriber import _load_shared_recognizer
+
+        start = time.perf_counter()
+        _load_shared_recognizer(debug=False)
+        timings["sensevoice"] = round(time.perf_counter() - start, 3)
+
+    logger.info(f"预热完成：{timings}")
+    return timings
@@ -0,0 +1,51 @@
+import os
+import re
+import shutil
+import time
+import uuid
+
+WORKSPACE_ROOT = os.getenv("VA_WORKSPACE", "temp")
+# 分镜差异信号缓存，任务目录删除后仍保留，供重新分镜使用
+SIGNAL_ROOT = os.getenv("VA_SIGNAL_DIR", "signals")
+
+
+def new_job_id() -> str:
+    """生成任务ID"""
+    return uuid.uuid4().hex
+
+
+def is_valid_job_id(job_id: str) -> bool:
+    """任务ID只能包含字母、数字、下划线和短横线"""
+    return re.fullmatch(r"[A-Za-z0-9_-]{1,64}", job_id) is not None
+
+
+def job_dir(job_id: str) -> str:
+    """返回任务工作目录，不存在时创建"""
+    path = os.path.join(WORKSPACE_ROOT, job_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def signal_dir(job_id: str) -> str | None:
+    """返回任务的差异信号缓存目录，任务ID不合法时返回None"""
+    if not is_valid_job_id(job_id):
+        return None
+    return os.path.join(SIGNAL_ROOT, job_id)
+
+
+def remove_job_dir(job_id: str) -> None:
+    """删除任务工作目录"""
+    shutil.rmtree(os.path.join(WORKSPACE_ROOT, job_id), ignore_errors=True)
+
+
+def remove_stale_job_dirs(max_age_seconds: float) -> int:
+    """删除超过保留时间的任务目录（失败后未重试的任务），返回删除数量"""
+    if not os.path.isdir(WORKSPACE_ROOT):
+        return 0
+    removed = 0
+    deadline = time.time() - max_age_seconds
+    for entry in os.scandir(WORKSPACE_ROOT):
+        if entry.is_dir() and entry.stat().st_mtime < deadline:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed